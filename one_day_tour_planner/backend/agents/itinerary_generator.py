@@ -1,52 +1,134 @@
-from typing import List, Dict
+import logging
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta
+from utils.deadline import Deadline
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 # Sample database of attractions for demonstration
 # In a real application, this could be replaced with a dynamic database query or API call
 attractions_db = {
     "Rome": [
-        {"name": "Colosseum", "category": "historical", "duration": 90, "cost": 15},
-        {"name": "Roman Forum", "category": "historical", "duration": 75, "cost": 12},
-        {"name": "Pantheon", "category": "historical", "duration": 45, "cost": 0},
-        {"name": "Piazza Navona", "category": "food", "duration": 60, "cost": 0},
-        {"name": "Trevi Fountain", "category": "relaxing", "duration": 30, "cost": 0},
-        {"name": "Spanish Steps", "category": "relaxing", "duration": 45, "cost": 0}
+        {"name": "Colosseum", "category": "historical", "duration": 90, "cost": 15, "outdoor": True, "latitude": 41.8902, "longitude": 12.4922},
+        {"name": "Roman Forum", "category": "historical", "duration": 75, "cost": 12, "outdoor": True, "latitude": 41.8925, "longitude": 12.4853},
+        {"name": "Pantheon", "category": "historical", "duration": 45, "cost": 0, "outdoor": False, "latitude": 41.8986, "longitude": 12.4769},
+        {"name": "Piazza Navona", "category": "food", "duration": 60, "cost": 0, "outdoor": True, "latitude": 41.8992, "longitude": 12.4731},
+        {"name": "Trevi Fountain", "category": "relaxing", "duration": 30, "cost": 0, "outdoor": True, "latitude": 41.9009, "longitude": 12.4833},
+        {"name": "Spanish Steps", "category": "relaxing", "duration": 45, "cost": 0, "outdoor": True, "latitude": 41.906, "longitude": 12.4828}
     ],
     "Paris": [
-        {"name": "Eiffel Tower", "category": "historical", "duration": 120, "cost": 25},
-        {"name": "Louvre Museum", "category": "historical", "duration": 180, "cost": 20},
-        {"name": "Montmartre", "category": "shopping", "duration": 60, "cost": 0},
-        {"name": "Notre Dame", "category": "historical", "duration": 60, "cost": 0},
-        {"name": "Seine River Cruise", "category": "relaxing", "duration": 90, "cost": 15}
+        {"name": "Eiffel Tower", "category": "historical", "duration": 120, "cost": 25, "outdoor": True, "latitude": 48.8584, "longitude": 2.2945},
+        {"name": "Louvre Museum", "category": "historical", "duration": 180, "cost": 20, "outdoor": False, "latitude": 48.8606, "longitude": 2.3376},
+        {"name": "Montmartre", "category": "shopping", "duration": 60, "cost": 0, "outdoor": True, "latitude": 48.8867, "longitude": 2.3431},
+        {"name": "Notre Dame", "category": "historical", "duration": 60, "cost": 0, "outdoor": False, "latitude": 48.853, "longitude": 2.3499},
+        {"name": "Seine River Cruise", "category": "relaxing", "duration": 90, "cost": 15, "outdoor": True, "latitude": 48.86, "longitude": 2.295}
     ]
 }
 
 class ItineraryGenerator:
-    def generate_itinerary(self, city: str, interests: List[str], start_time: str) -> List[Dict]:
+    def __init__(self, interest_matcher=None, catalog=None, covisitation=None, profiles=None):
+        # Optional utils.embeddings.InterestMatcher; without it interests must equal a category exactly
+        self.interest_matcher = interest_matcher
+        # Attractions per city: attractions_db, or a utils.shared_catalog.SharedCatalog shared by all workers
+        self.catalog = attractions_db if catalog is None else catalog
+        # Optional utils.covisitation.CoVisitationIndex; without it attractions keep their catalog order
+        self.covisitation = covisitation
+        # Optional agents.memory_agent.MemoryAgent; the user's interest profile puts their favorite categories first
+        self.profiles = profiles
+        # Set once a failure of the interest matcher has been logged, so a broken encoder does not flood the log
+        self._matcher_failure_logged = False
+
+    @traced
+    def generate_itinerary(self, city: str, interests: List[str], start_time: str, user_id: Optional[str] = None,
+                           deadline: Optional[Deadline] = None) -> List[Dict]:
         """
         Generates an itinerary based on the selected city, user interests, and start time.
+        With a user_id, the attractions of the categories the user chose most often come first.
         """
-        if city not in attractions_db:
+        if city not in self.catalog:
             return [{"error": f"No data available for city: {city}"}]
 
         # Filter attractions by user interests
-        relevant_attractions = self.filter_attractions(city, interests)
+        relevant_attractions = self.rank_attractions(city, self.filter_attractions(city, interests, deadline),
+                                                     category_weights=self.category_weights(user_id, deadline))
         
         # Sort attractions by category preference and optimize the order
         optimized_itinerary = self.create_optimized_itinerary(relevant_attractions, start_time)
         
         return optimized_itinerary
 
-    def filter_attractions(self, city: str, interests: List[str]) -> List[Dict]:
+    def filter_attractions(self, city: str, interests: List[str], deadline: Optional[Deadline] = None) -> List[Dict]:
         """
         Filters attractions in the specified city based on user interests.
+        Exact category matches are always kept; with an interest matcher, attractions whose
+        embedding is close to any interest (e.g., "history" for "historical") are kept as well.
+        If the matcher fails (e.g., its encoder model cannot be loaded), only exact matches are kept.
         """
-        attractions = attractions_db[city]
-        filtered_attractions = [
-            attraction for attraction in attractions if attraction['category'] in interests
-        ]
+        attractions = self.catalog[city]
+        matched = set(self.semantic_matches(city, attractions, interests, deadline))
+        if hasattr(attractions, "positions_for_category"):
+            # Shared catalogs carry a category index, so only the kept attractions are materialized
+            matched.update(int(p) for interest in interests for p in attractions.positions_for_category(interest))
+        else:
+            matched.update(p for p, attraction in enumerate(attractions) if attraction['category'] in interests)
+        filtered_attractions = [attractions[position] for position in sorted(matched)]
         return filtered_attractions
 
+    def semantic_matches(self, city: str, attractions, interests: List[str],
+                         deadline: Optional[Deadline] = None) -> List[int]:
+        """
+        Returns the positions the interest matcher finds for the interests, or none without a
+        matcher or when it fails; exact category matching then serves the request on its own.
+        """
+        if self.interest_matcher is None:
+            return []
+        try:
+            return self.interest_matcher.match(city, attractions, interests)
+        except Exception as e:
+            if not self._matcher_failure_logged:
+                self._matcher_failure_logged = True
+                logger.exception("Interest matching failed; falling back to exact category matches")
+            if deadline is not None:
+                deadline.mark_degraded("interest_matching", f"Exact category matches only: {e}")
+            return []
+
+    def category_weights(self, user_id: Optional[str], deadline: Optional[Deadline] = None) -> Dict[str, float]:
+        """
+        Returns the normalized category weights of the user's interest profile, or none if there is
+        no profile. The profile only refines the order, so a failed lookup plans without it.
+        """
+        if self.profiles is None or not user_id:
+            return {}
+        try:
+            profile = self.profiles.fetch_profile(user_id, deadline)
+        except Exception as e:
+            logger.warning("Could not load the interest profile of user %s: %r", user_id, e)
+            if deadline is not None:
+                deadline.mark_degraded("profile", f"Interest profile unavailable: {e}")
+            return {}
+        return profile.normalized_weights() if profile else {}
+
+    def rank_attractions(self, city: str, attractions: List[Dict], anchors: Optional[List[str]] = None,
+                         category_weights: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """
+        Orders attractions by the user's category weights, heaviest first, then by how often past
+        trips visited them together with the anchors (by default, the other attractions of the day),
+        so the stops people tend to combine come first. Each score is a sum of constant-time
+        neighbor lookups; ties keep the catalog order.
+        """
+        if (self.covisitation is None and not category_weights) or len(attractions) < 2:
+            return attractions
+        names = [attraction["name"] for attraction in attractions]
+        anchors = names if anchors is None else anchors
+        scores = []
+        for name in names:
+            neighbors = self.covisitation.neighbors(city, name) if self.covisitation else {}
+            scores.append(sum(neighbors.get(anchor, 0.0) for anchor in anchors if anchor != name))
+        weights = [(category_weights or {}).get(attraction["category"].lower(), 0.0) for attraction in attractions]
+        order = sorted(range(len(attractions)), key=lambda position: (-weights[position], -scores[position]))
+        return [attractions[position] for position in order]
+
     def create_optimized_itinerary(self, attractions: List[Dict], start_time: str) -> List[Dict]:
         """
         Organizes the itinerary by calculating start and end times for each attraction.
@@ -65,7 +147,10 @@ class ItineraryGenerator:
                 "start_time": start_time_str,
                 "end_time": end_time_str,
                 "duration": attraction["duration"],
-                "cost": attraction["cost"]
+                "cost": attraction["cost"],
+                "outdoor": attraction.get("outdoor", False),
+                "latitude": attraction.get("latitude"),
+                "longitude": attraction.get("longitude")
             })
 
             # Update the current time to the end of this attraction visit
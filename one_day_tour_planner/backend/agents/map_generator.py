@@ -0,0 +1,21 @@
+from typing import List, Optional, Tuple
+
+class MapGenerator:
+    def __init__(self, base_url: str = "https://www.google.com/maps/dir/"):
+        # Base URL of the directions service used to render the route
+        self.base_url = base_url
+
+    def create_map(self, locations: List[Tuple[float, float]]) -> Optional[str]:
+        """
+        Builds a directions link that visits the given locations in order.
+
+        Args:
+            locations (list): A list of (latitude, longitude) tuples in visiting order.
+
+        Returns:
+            str or None: The map link, or None if there are no locations.
+        """
+        if not locations:
+            return None
+        waypoints = "/".join(f"{latitude},{longitude}" for latitude, longitude in locations)
+        return f"{self.base_url}{waypoints}"
@@ -1,47 +1,79 @@
-from neo4j import GraphDatabase
-from typing import Optional, Dict
+from typing import Optional, Dict, Callable
+from database.queries import (
+    STORE_PREFERENCE_QUERY, FETCH_PREFERENCES_QUERY, UPDATE_PREFERENCE_QUERY, STORE_TRIP_QUERY, FETCH_TRIPS_QUERY,
+    LOCK_AND_READ_PROFILE_QUERY, WRITE_PROFILE_QUERY, FETCH_PROFILE_QUERY,
+)
+from database.schemas.memory import InterestProfile
+from agents.memory_write_buffer import WriteBehindBuffer, BufferedWrite
+from utils.deadline import Deadline
+from utils.tracing import traced
 
 class MemoryAgent:
-    def __init__(self, uri: str, user: str, password: str):
+    def __init__(self, uri: str, user: str, password: str, write_behind: bool = False, **buffer_options):
+        """
+        Args:
+            uri (str): The URI of the Neo4j database.
+            user (str): The username to connect to Neo4j.
+            password (str): The password to connect to Neo4j.
+            write_behind (bool): Buffer preference and trip writes and flush them in batches in the
+                                 background instead of writing them on the request path.
+            **buffer_options: Passed to WriteBehindBuffer (max_queue_size, batch_size, flush_interval,
+                              max_attempts, retry_backoff).
+        """
+        # Imported here so that importing the agent does not load the Neo4j driver package
+        from neo4j import GraphDatabase
+
         # Initialize Neo4j driver with provided credentials
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.write_buffer = WriteBehindBuffer(self.driver, **buffer_options) if write_behind else None
 
+    @traced
     def store_preference(self, user_id: str, key: str, value: str):
         """
-        Stores a single user preference as a relationship in the Neo4j graph.
+        Stores a single user preference on the user's own preference node for the key, replacing
+        the value stored before.
 
         Args:
             user_id (str): The unique identifier for the user.
             key (str): The preference key (e.g., "city", "budget").
             value (str): The value of the preference (e.g., "Rome", "50").
+
+        Raises:
+            WriteBufferFullError: If write-behind is enabled and the buffer is full.
         """
-        query = """
-        MERGE (u:User {id: $user_id})
-        MERGE (p:Preference {key: $key, value: $value})
-        MERGE (u)-[:HAS_PREFERENCE]->(p)
-        """
+        if self.write_buffer:
+            self.write_buffer.submit(BufferedWrite.preference(user_id, key, value))
+            return
+
+        def store(tx):
+            tx.run(STORE_PREFERENCE_QUERY, user_id=user_id, key=key, value=value)
+            self._update_profile(tx, user_id, lambda profile: profile.add_preference(key, value))
+
         with self.driver.session() as session:
-            session.run(query, user_id=user_id, key=key, value=value)
+            session.execute_write(store)
 
-    def fetch_preferences(self, user_id: str) -> Optional[Dict[str, str]]:
+    @traced
+    def fetch_preferences(self, user_id: str, deadline: Optional[Deadline] = None) -> Optional[Dict[str, str]]:
         """
         Retrieves all stored preferences for a specific user.
 
         Args:
             user_id (str): The unique identifier for the user.
+            deadline (Deadline, optional): The request deadline; the query is aborted when it passes.
 
         Returns:
             dict: A dictionary of preferences, where keys are preference types and values are preference values.
         """
-        query = """
-        MATCH (u:User {id: $user_id})-[:HAS_PREFERENCE]->(p:Preference)
-        RETURN p.key AS key, p.value AS value
-        """
+        query = self._with_timeout(FETCH_PREFERENCES_QUERY, deadline)
         with self.driver.session() as session:
             result = session.run(query, user_id=user_id)
             preferences = {record["key"]: record["value"] for record in result}
+        for write in self._pending_writes(user_id):
+            if write.kind == "preference":
+                preferences[write.key] = write.value
         return preferences if preferences else None
 
+    @traced
     def update_preference(self, user_id: str, key: str, new_value: str):
         """
         Updates an existing user preference in the Neo4j graph.
@@ -51,13 +83,10 @@ class MemoryAgent:
             key (str): The preference key to update.
             new_value (str): The new value for the preference.
         """
-        query = """
-        MATCH (u:User {id: $user_id})-[:HAS_PREFERENCE]->(p:Preference {key: $key})
-        SET p.value = $new_value
-        """
         with self.driver.session() as session:
-            session.run(query, user_id=user_id, key=key, new_value=new_value)
+            session.run(UPDATE_PREFERENCE_QUERY, user_id=user_id, key=key, new_value=new_value)
 
+    @traced
     def store_trip_history(self, user_id: str, trip_id: str, trip_data: Dict[str, str]):
         """
         Stores a trip history record in the Neo4j graph, associating it with the user.
@@ -66,37 +95,101 @@ class MemoryAgent:
             user_id (str): The unique identifier for the user.
             trip_id (str): Unique identifier for the trip.
             trip_data (dict): A dictionary of trip details (e.g., {"destination": "Rome", "date": "2023-11-10"}).
+
+        Raises:
+            WriteBufferFullError: If write-behind is enabled and the buffer is full.
         """
-        query = """
-        MERGE (u:User {id: $user_id})
-        MERGE (t:Trip {id: $trip_id})
-        SET t += $trip_data
-        MERGE (u)-[:HAS_TRIP]->(t)
-        """
+        if self.write_buffer:
+            self.write_buffer.submit(BufferedWrite.trip(user_id, trip_id, trip_data))
+            return
+
+        def store(tx):
+            tx.run(STORE_TRIP_QUERY, user_id=user_id, trip_id=trip_id, trip_data=trip_data)
+            self._update_profile(tx, user_id, lambda profile: profile.add_trip(trip_data))
+
         with self.driver.session() as session:
-            session.run(query, user_id=user_id, trip_id=trip_id, trip_data=trip_data)
+            session.execute_write(store)
 
-    def fetch_trip_history(self, user_id: str) -> Optional[Dict[str, Dict[str, str]]]:
+    @traced
+    def fetch_trip_history(self, user_id: str, deadline: Optional[Deadline] = None) -> Optional[Dict[str, Dict[str, str]]]:
         """
         Retrieves all trip history records for a specific user.
 
         Args:
             user_id (str): The unique identifier for the user.
+            deadline (Deadline, optional): The request deadline; the query is aborted when it passes.
 
         Returns:
             dict: A dictionary of trips, where keys are trip IDs and values are dictionaries of trip details.
         """
-        query = """
-        MATCH (u:User {id: $user_id})-[:HAS_TRIP]->(t:Trip)
-        RETURN t.id AS trip_id, t
-        """
+        query = self._with_timeout(FETCH_TRIPS_QUERY, deadline)
         with self.driver.session() as session:
             result = session.run(query, user_id=user_id)
             trips = {record["trip_id"]: dict(record["t"]) for record in result}
+        for write in self._pending_writes(user_id):
+            if write.kind == "trip":
+                trips.setdefault(write.trip_id, {"id": write.trip_id}).update(write.trip_data)
         return trips if trips else None
 
+    @traced
+    def fetch_profile(self, user_id: str, deadline: Optional[Deadline] = None) -> Optional[InterestProfile]:
+        """
+        Retrieves the materialized interest profile of a user with a single property read.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+            deadline (Deadline, optional): The request deadline; the query is aborted when it passes.
+
+        Returns:
+            InterestProfile: The user's profile, or None if the user has none yet.
+        """
+        query = self._with_timeout(FETCH_PROFILE_QUERY, deadline)
+        with self.driver.session() as session:
+            record = session.run(query, user_id=user_id).single()
+        stored = record["profile"] if record else None
+        pending = self._pending_writes(user_id, record["profile_version"] if record else None)
+        if not stored and not pending:
+            return None
+
+        profile = InterestProfile.from_json(stored)
+        for write in pending:
+            write.apply_to_profile(profile)
+        return profile
+
+    @staticmethod
+    def _with_timeout(query: str, deadline: Optional[Deadline]):
+        """
+        Attaches the remaining request time to a query as its transaction timeout.
+
+        Raises:
+            DeadlineExceeded: If the deadline has already passed.
+        """
+        if deadline is None:
+            return query
+        from neo4j import Query
+        return Query(query, timeout=deadline.timeout())
+
+    def _pending_writes(self, user_id: str, seen_version: Optional[int] = None):
+        """
+        Returns the user's buffered writes that have not reached Neo4j yet, so reads include them.
+        """
+        return self.write_buffer.pending_writes(user_id, seen_version) if self.write_buffer else []
+
+    def _update_profile(self, tx, user_id: str, update: Callable[[InterestProfile], None]):
+        """
+        Applies an incremental update to the user's profile inside the caller's write transaction.
+        The user node is locked before the profile is read, so concurrent writes for the same user
+        cannot overwrite each other's updates.
+        """
+        record = tx.run(LOCK_AND_READ_PROFILE_QUERY, user_id=user_id).single()
+        profile = InterestProfile.from_json(record["profile"] if record else None)
+        update(profile)
+        tx.run(WRITE_PROFILE_QUERY, user_id=user_id, profile=profile.to_json())
+
     def close(self):
         """
-        Closes the Neo4j driver session.
+        Flushes any buffered writes and closes the Neo4j driver session.
         """
+        if self.write_buffer:
+            self.write_buffer.close()
         self.driver.close()
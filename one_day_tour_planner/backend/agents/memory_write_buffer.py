@@ -0,0 +1,267 @@
+import logging
+import threading
+import time
+from queue import Queue, Full, Empty
+from typing import Dict, List, Optional
+from database.queries import (
+    BATCH_STORE_PREFERENCES_QUERY, BATCH_STORE_TRIPS_QUERY, BATCH_LOCK_AND_READ_PROFILES_QUERY, BATCH_WRITE_PROFILES_QUERY,
+)
+from database.schemas.memory import InterestProfile
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Tells whether a failed flush may succeed if retried (deadlocks, lost connections), as
+    opposed to a write Neo4j will always reject (a bad value or a constraint violation).
+    """
+    from neo4j.exceptions import TransientError, ServiceUnavailable, SessionExpired
+    return isinstance(error, (TransientError, ServiceUnavailable, SessionExpired))
+
+
+class WriteBufferFullError(RuntimeError):
+    """Raised when a write cannot be buffered because the queue is full (backpressure)."""
+
+
+class BufferedWrite:
+    """
+    A preference or trip write waiting to be flushed to Neo4j.
+
+    version is the profile_version its flush gives the user node, set while the flush
+    transaction is open; a profile read at that version or later already includes the write.
+    """
+
+    __slots__ = ("kind", "user_id", "key", "value", "trip_id", "trip_data", "version")
+
+    def __init__(self, kind: str, user_id: str, key: str = None, value=None, trip_id: str = None, trip_data: Dict = None):
+        self.kind = kind
+        self.user_id = user_id
+        self.key = key
+        self.value = value
+        self.trip_id = trip_id
+        self.trip_data = trip_data
+        self.version = None
+
+    @classmethod
+    def preference(cls, user_id: str, key: str, value) -> "BufferedWrite":
+        return cls("preference", user_id, key=key, value=value)
+
+    @classmethod
+    def trip(cls, user_id: str, trip_id: str, trip_data: Dict) -> "BufferedWrite":
+        return cls("trip", user_id, trip_id=trip_id, trip_data=dict(trip_data))
+
+    def apply_to_profile(self, profile: InterestProfile):
+        if self.kind == "preference":
+            profile.add_preference(self.key, self.value)
+        else:
+            profile.add_trip(self.trip_data)
+
+
+class WriteBehindBuffer:
+    """
+    Takes preference and trip writes off the request path. Writes go into a bounded in-process
+    queue and a background thread flushes them in batched UNWIND transactions, as soon as
+    batch_size writes are waiting or the oldest one has waited flush_interval seconds.
+
+    Until a write is flushed it stays in a per-user overlay, so reads served by this worker
+    see it immediately (read-your-writes). A write leaves the overlay only after its commit, so
+    profile reads pass the profile_version they read to skip writes already included in it. When the queue is full, submit raises
+    WriteBufferFullError right away, so callers slow down instead of memory growing without
+    bound; it never blocks, as it is called from the event loop. close() flushes everything
+    still queued.
+
+    A batch that fails transiently is retried up to max_attempts times with exponential backoff.
+    Each attempt is a single explicit transaction, so the driver does not retry on top of that.
+    One that fails permanently is split in halves until the bad write is isolated, which is
+    logged and dropped, so a single write can never stall the flusher and fill the queue.
+
+    Attributes:
+        max_queue_size (int): Maximum number of writes waiting to be flushed.
+        batch_size (int): Maximum number of writes per transaction.
+        flush_interval (float): Longest time in seconds a write waits before being flushed.
+        max_attempts (int): Attempts per batch before writes failing transiently are dropped.
+        retry_backoff (float): Wait in seconds before the first retry; doubled for each further one.
+    """
+
+    def __init__(self, driver, max_queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_attempts: int = 5, retry_backoff: float = 0.5):
+        self.driver = driver
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.flushed_writes = 0
+        self.flushed_batches = 0
+        self.failed_batches = 0
+        self.dropped_writes = 0
+        self._queue = Queue(maxsize=max_queue_size)
+        self._overlay: Dict[str, List[BufferedWrite]] = {}
+        self._overlay_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, write: BufferedWrite):
+        """
+        Buffers a write.
+
+        Args:
+            write (BufferedWrite): The write to buffer.
+
+        Raises:
+            WriteBufferFullError: If the queue is full.
+            RuntimeError: If the buffer has been closed.
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("The write buffer has been closed")
+
+        # Visible to reads before it is queued, so there is no window where it is in neither place
+        with self._overlay_lock:
+            self._overlay.setdefault(write.user_id, []).append(write)
+        try:
+            self._queue.put_nowait(write)
+        except Full:
+            self._forget([write])
+            raise WriteBufferFullError(f"Write buffer is full ({self.max_queue_size} pending writes)")
+
+    def pending_writes(self, user_id: str, seen_version: Optional[int] = None) -> List[BufferedWrite]:
+        """
+        Returns the writes of a user that have not been flushed yet, oldest first.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+            seen_version (int, optional): The profile_version of a profile just read; writes
+                committed at or before it are left out, as the profile already includes them.
+        """
+        with self._overlay_lock:
+            pending = list(self._overlay.get(user_id, ()))
+        if seen_version is None:
+            return pending
+        return [write for write in pending if write.version is None or write.version > seen_version]
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self):
+        """
+        Blocks until every write submitted so far has been flushed.
+        """
+        self._queue.join()
+
+    def close(self, timeout: float = 30.0):
+        """
+        Stops accepting writes, flushes the ones still queued and stops the background thread.
+        """
+        self._stopped.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error("Write buffer did not drain within %.0f s; %d writes not flushed", timeout, self._queue.qsize())
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._flush_with_retry(batch)
+            elif self._stopped.is_set():
+                return
+
+    def _collect_batch(self) -> List[BufferedWrite]:
+        # Wait for the first write, then gather more until the batch is full or the first one is due
+        try:
+            batch = [self._queue.get(timeout=min(self.flush_interval, 0.1) if not self._stopped.is_set() else 0.01)]
+        except Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if self._stopped.is_set() or remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _flush_with_retry(self, batch: List[BufferedWrite]):
+        try:
+            self._flush(batch)
+        finally:
+            self._forget(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _flush(self, batch: List[BufferedWrite]):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                # A plain transaction: execute_write would retry transient errors on top of this loop
+                with self.driver.session() as session:
+                    with session.begin_transaction() as tx:
+                        self._write_batch(tx, batch)
+                        tx.commit()
+                self.flushed_writes += len(batch)
+                self.flushed_batches += 1
+                return
+            except Exception as e:
+                for write in batch:
+                    write.version = None
+                self.failed_batches += 1
+                error = e
+                if not is_transient(e):
+                    break
+                logger.warning("Failed to flush %d buffered memory writes (attempt %d of %d): %s",
+                               len(batch), attempt, self.max_attempts, e)
+                if attempt < self.max_attempts:
+                    time.sleep(min(self.retry_backoff * 2 ** (attempt - 1), 30))
+        else:
+            logger.error("Dropping %d buffered memory writes after %d failed attempts", len(batch), self.max_attempts)
+            self.dropped_writes += len(batch)
+            return
+
+        # Rejected for good: flush each half separately, so only the bad write is lost
+        if len(batch) > 1:
+            middle = len(batch) // 2
+            self._flush(batch[:middle])
+            self._flush(batch[middle:])
+            return
+        write = batch[0]
+        logger.error("Dropping a buffered %s write for user %s that cannot be stored: %s", write.kind, write.user_id, error)
+        self.dropped_writes += 1
+
+    def _forget(self, writes: List[BufferedWrite]):
+        with self._overlay_lock:
+            for write in writes:
+                pending = self._overlay.get(write.user_id)
+                if pending is None:
+                    continue
+                # Remove this exact write; an equal one submitted later must stay visible
+                for position, candidate in enumerate(pending):
+                    if candidate is write:
+                        del pending[position]
+                        break
+                if not pending:
+                    del self._overlay[write.user_id]
+
+    @staticmethod
+    def _write_batch(tx, batch: List[BufferedWrite]):
+        preferences = [{"user_id": w.user_id, "key": w.key, "value": w.value} for w in batch if w.kind == "preference"]
+        trips = [{"user_id": w.user_id, "trip_id": w.trip_id, "trip_data": w.trip_data} for w in batch if w.kind == "trip"]
+        if preferences:
+            tx.run(BATCH_STORE_PREFERENCES_QUERY, rows=preferences)
+        if trips:
+            tx.run(BATCH_STORE_TRIPS_QUERY, rows=trips)
+
+        # One profile read-modify-write per user for the whole batch, applied in submission order
+        user_ids = sorted({w.user_id for w in batch})
+        profiles, versions = {}, {}
+        for record in tx.run(BATCH_LOCK_AND_READ_PROFILES_QUERY, user_ids=user_ids):
+            profiles[record["user_id"]] = InterestProfile.from_json(record["profile"])
+            versions[record["user_id"]] = record["profile_version"]
+        for write in batch:
+            write.apply_to_profile(profiles.setdefault(write.user_id, InterestProfile()))
+            write.version = versions.get(write.user_id)
+        tx.run(BATCH_WRITE_PROFILES_QUERY,
+               rows=[{"user_id": user_id, "profile": profile.to_json()} for user_id, profile in profiles.items()])
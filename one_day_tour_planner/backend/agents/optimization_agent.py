@@ -1,19 +1,130 @@
-from typing import List, Dict
+import math
+import random
+import numpy as np
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from utils.deadline import Deadline
+from utils.tracing import traced
+
+# Mean Earth radius used for great-circle distances
+EARTH_RADIUS_KM = 6371.0
+# Time between consecutive stops, as scheduled by ItineraryGenerator
+BUFFER_MINUTES = 15
+# Name of the placeholder stop that stands for the starting point during the search
+STARTING_POINT = "Starting point"
 
 class OptimizationAgent:
-    def __init__(self):
+    def __init__(self, routing_engine=None):
         # Define transport options with estimated costs per kilometer and speeds in km/h
         self.transport_options = {
             "walking": {"cost_per_km": 0, "speed_kmh": 5},
             "public_transport": {"cost_per_km": 0.5, "speed_kmh": 20},
             "taxi": {"cost_per_km": 1.5, "speed_kmh": 40}
         }
+        # Optional utils.routing.RoutingEngine; cities without a street graph use straight-line distances
+        self.routing_engine = routing_engine
 
-    def optimize_route(self, itinerary: List[Dict], budget: float) -> List[Dict]:
+    @traced
+    def optimize_route(self, itinerary: List[Dict], budget: float, deadline: Optional[Deadline] = None,
+                       city: Optional[str] = None, start: Optional[Tuple[float, float]] = None) -> List[Dict]:
         """
         Optimizes the itinerary based on user budget by choosing transport modes
-        to balance cost and travel time.
+        to balance cost and travel time. When every stop has coordinates, the visiting order
+        is improved first (see improve_order); with a deadline, the best order found when it
+        expires is used and the optimization stage is marked as degraded. If the routing engine
+        has a street graph for the city, walking times replace straight-line distances and each
+        stop gets the travel time by its selected transport. With a starting point (latitude,
+        longitude), the route leaves from there, so every stop may come first and the first one
+        gets the transport and cost of getting to it.
+        """
+        stops = self._leave_from(itinerary, start)
+        stops, complete = self.improve_order(stops, deadline, city)
+        if not complete:
+            deadline.mark_degraded("optimization", "Route search stopped at the deadline; best order found so far")
+        return self._arrive_at_first_stop(self.assign_transport(stops, budget, city, deadline), start)
+
+    @traced
+    def optimize_alternatives(self, itinerary: List[Dict], budget: float, k: int = 3, min_difference: float = 0.3,
+                              deadline: Optional[Deadline] = None, city: Optional[str] = None,
+                              start: Optional[Tuple[float, float]] = None) -> List[List[Dict]]:
+        """
+        Returns up to k alternative orders of the itinerary, shortest first, from a single search.
+        All restarts share one distance matrix, every local optimum found is kept as a candidate,
+        and the 2-opt neighbours of those optima (scored with an O(1) delta from their parent's
+        length) widen the pool. An alternative is only picked if at least min_difference of its
+        legs differ from every order picked before it, so the options are not near-duplicates.
+
+        Args:
+            itinerary (List[Dict]): The stops, in their initial order.
+            budget (float): The user's budget, used to choose transport for each alternative.
+            k (int): The maximum number of alternatives, the best one included.
+            min_difference (float): Minimum share of legs an alternative must not have in common
+                                    with any alternative ranked above it.
+            deadline (Deadline, optional): When to stop searching.
+            city (str, optional): The city of the stops, to use its street graph if there is one.
+            start (Tuple[float, float], optional): Where the routes leave from, as (latitude, longitude).
+
+        Returns:
+            List[List[Dict]]: The alternatives, each a separately timed copy of the stops.
+        """
+        itinerary = self._leave_from(itinerary, start)
+        if not self._can_reorder(itinerary):
+            return [self._arrive_at_first_stop(self.assign_transport(itinerary, budget, city, deadline), start)]
+
+        distances = self._distance_matrix(itinerary, city, deadline)
+        candidates, complete = self._search_orders(distances, deadline, restarts=max(2 * k, 4))
+        if not complete:
+            deadline.mark_degraded("optimization", "Route search stopped at the deadline; best orders found so far")
+        pool = dict(candidates)
+        for order, length in candidates:
+            for neighbour, neighbour_length in self._two_opt_neighbours(list(order), length, distances):
+                pool.setdefault(neighbour, neighbour_length)
+
+        alternatives = []
+        for order in self._select_diverse(sorted(pool, key=pool.get), k, min_difference):
+            stops = [dict(itinerary[position]) for position in order]
+            if list(order) != sorted(order):
+                self.reschedule(stops)
+            alternatives.append(self._arrive_at_first_stop(self.assign_transport(stops, budget, city, deadline), start))
+        return alternatives
+
+    @staticmethod
+    def _leave_from(itinerary: List[Dict], start: Optional[Tuple[float, float]]) -> List[Dict]:
+        """
+        Puts a placeholder stop for the starting point in front of the itinerary. The search keeps
+        the first stop in place, so with the placeholder every real stop can be reordered.
+        """
+        if start is None or not itinerary:
+            return itinerary
+        placeholder = {"name": STARTING_POINT, "latitude": start[0], "longitude": start[1], "duration": 0}
+        if itinerary[0].get("start_time"):
+            placeholder["start_time"] = itinerary[0]["start_time"]
+        return [placeholder] + itinerary
+
+    def _arrive_at_first_stop(self, route: List[Dict], start: Optional[Tuple[float, float]]) -> List[Dict]:
+        """
+        Drops the starting-point placeholder again and re-times the stops from the original start
+        time, which the placeholder kept.
+        """
+        if start is None or len(route) < 2:
+            return route
+        placeholder, route = route[0], route[1:]
+        if "start_time" in placeholder and all(self._has_schedule_data(stop) for stop in route):
+            route[0]["start_time"] = placeholder["start_time"]
+            self.reschedule(route)
+        return route
+
+    def assign_transport(self, itinerary: List[Dict], budget: float, city: Optional[str] = None,
+                         deadline: Optional[Deadline] = None) -> List[Dict]:
+        """
+        Chooses the transport to each stop from the previous one within the remaining budget.
+        With a street graph for the city, the network travel time is added as 'travel_minutes'.
         """
+        travel_times = {}
+        if self._has_routing(itinerary, city, list(self.transport_options), deadline):
+            points = [(stop['latitude'], stop['longitude']) for stop in itinerary]
+            travel_times = {mode: self.routing_engine.travel_times(city, points, mode) for mode in self.transport_options}
+
         total_cost = 0
         optimized_itinerary = []
 
@@ -35,21 +146,184 @@ class OptimizationAgent:
                 stop['transport'] = selected_transport
                 stop['travel_cost'] = travel_cost
                 stop['distance_from_previous'] = distance_km
+                if travel_times and np.isfinite(travel_times[selected_transport][i - 1, i]):
+                    stop['travel_minutes'] = round(float(travel_times[selected_transport][i - 1, i]) / 60, 1)
 
             # Add the optimized stop to the itinerary
             optimized_itinerary.append(stop)
 
         return optimized_itinerary
 
+    def improve_order(self, itinerary: List[Dict], deadline: Optional[Deadline] = None,
+                      city: Optional[str] = None) -> Tuple[List[Dict], bool]:
+        """
+        Reorders the stops after the first one to shorten the total distance, starting from the
+        given order and from a nearest-neighbour order and applying 2-opt moves until none helps.
+        This is an anytime search: the deadline is checked between moves and the best order so
+        far is returned when it expires. Stops are re-timed if the order changes.
+
+        Args:
+            itinerary (List[Dict]): The stops, in their initial order.
+            deadline (Deadline, optional): When to stop searching.
+            city (str, optional): The city of the stops; with a street graph, walking time is minimized.
+
+        Returns:
+            tuple: (stops, complete) where complete is False if the search was cut short.
+        """
+        if not self._can_reorder(itinerary):
+            return itinerary, True
+
+        candidates, complete = self._search_orders(self._distance_matrix(itinerary, city, deadline), deadline)
+        order = min(candidates, key=lambda candidate: candidate[1])[0]
+        if list(order) == sorted(order):
+            return itinerary, complete
+        return self.reschedule([itinerary[position] for position in order]), complete
+
+    def _can_reorder(self, itinerary: List[Dict]) -> bool:
+        return len(itinerary) >= 3 and all(self._has_schedule_data(stop) for stop in itinerary)
+
+    def _has_routing(self, itinerary: List[Dict], city: Optional[str], modes: List[str],
+                     deadline: Optional[Deadline] = None) -> bool:
+        """
+        Tells whether the city's street graph can be used for the stops. A graph whose contraction
+        hierarchies have not been prepared (scripts/prepare_routing.py) is not preprocessed within
+        the request: straight-line distances are used and the routing stage is marked as degraded.
+        """
+        if not (city and self.routing_engine and self.routing_engine.has_city(city) and itinerary
+                and all(stop.get('latitude') is not None and stop.get('longitude') is not None for stop in itinerary)):
+            return False
+        if self.routing_engine.ready(city, modes):
+            return True
+        if deadline is not None:
+            deadline.mark_degraded("routing", "Street graph not prepared yet; straight-line distances used")
+        return False
+
+    def _distance_matrix(self, itinerary: List[Dict], city: Optional[str] = None,
+                         deadline: Optional[Deadline] = None) -> List[List[float]]:
+        """
+        Returns the cost of going between every pair of stops: walking seconds on the city's
+        street graph if available and all pairs are connected, otherwise straight-line kilometres.
+        """
+        if self._has_routing(itinerary, city, ["walking"], deadline):
+            times = self.routing_engine.travel_times(city, [(stop['latitude'], stop['longitude']) for stop in itinerary], "walking")
+            if np.isfinite(times).all():
+                return times.tolist()
+        return [[self.estimate_distance(a, b) for b in itinerary] for a in itinerary]
+
+    @staticmethod
+    def _route_length(order: List[int], distances: List[List[float]]) -> float:
+        return sum(distances[a][b] for a, b in zip(order, order[1:]))
+
+    def _search_orders(self, distances: List[List[float]], deadline: Optional[Deadline] = None,
+                       restarts: int = 0, seed: int = 0) -> Tuple[List[Tuple[Tuple[int, ...], float]], bool]:
+        """
+        Runs 2-opt from the given order, a nearest-neighbour order and `restarts` random orders
+        (the first stop always stays first).
+
+        Returns:
+            tuple: (candidates, complete) where candidates are the distinct (order, length) pairs
+                   found, the two seed orders included, and complete is False if the deadline cut
+                   the search short.
+        """
+        size = len(distances)
+        identity = list(range(size))
+        greedy = [0]
+        remaining = set(identity[1:])
+        while remaining:
+            closest = min(remaining, key=lambda stop: (distances[greedy[-1]][stop], stop))
+            greedy.append(closest)
+            remaining.remove(closest)
+
+        # The seeds count as results on their own, so there is an answer even if no time is left
+        found = {tuple(order): self._route_length(order, distances) for order in (identity, greedy)}
+        starts = [identity, greedy]
+        rng = random.Random(seed)
+        for _ in range(restarts):
+            tail = identity[1:]
+            rng.shuffle(tail)
+            starts.append([0] + tail)
+
+        for start in starts:
+            order, complete = self._two_opt(list(start), distances, deadline)
+            found.setdefault(tuple(order), self._route_length(order, distances))
+            if not complete:
+                return list(found.items()), False
+        return list(found.items()), True
+
+    @staticmethod
+    def _two_opt(order: List[int], distances: List[List[float]], deadline: Optional[Deadline] = None) -> Tuple[List[int], bool]:
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, len(order) - 1):
+                if deadline and deadline.expired():
+                    return order, False
+                for j in range(i + 1, len(order)):
+                    # Reversing order[i..j] replaces edges (i-1, i) and (j, j+1) by (i-1, j) and (i, j+1)
+                    before = distances[order[i - 1]][order[i]]
+                    after = distances[order[i - 1]][order[j]]
+                    if j + 1 < len(order):
+                        before += distances[order[j]][order[j + 1]]
+                        after += distances[order[i]][order[j + 1]]
+                    if after < before - 1e-9:
+                        order[i:j + 1] = reversed(order[i:j + 1])
+                        improved = True
+        return order, True
+
+    @staticmethod
+    def _two_opt_neighbours(order: List[int], length: float, distances: List[List[float]]):
+        """
+        Yields every order one 2-opt move away, with its length computed from the parent's.
+        """
+        for i in range(1, len(order) - 1):
+            for j in range(i + 1, len(order)):
+                delta = distances[order[i - 1]][order[j]] - distances[order[i - 1]][order[i]]
+                if j + 1 < len(order):
+                    delta += distances[order[i]][order[j + 1]] - distances[order[j]][order[j + 1]]
+                yield tuple(order[:i] + order[i:j + 1][::-1] + order[j + 1:]), length + delta
+
+    @staticmethod
+    def _select_diverse(orders: List[Tuple[int, ...]], k: int, min_difference: float) -> List[Tuple[int, ...]]:
+        legs = lambda order: {frozenset(leg) for leg in zip(order, order[1:])}
+        selected = []
+        for order in orders:
+            order_legs = legs(order)
+            if all(len(order_legs - legs(other)) >= min_difference * len(order_legs) for other in selected):
+                selected.append(order)
+                if len(selected) == k:
+                    break
+        return selected
+
+    @staticmethod
+    def _has_schedule_data(stop: Dict) -> bool:
+        return (stop.get('latitude') is not None and stop.get('longitude') is not None
+                and stop.get('duration') is not None and 'start_time' in stop)
+
+    @staticmethod
+    def reschedule(itinerary: List[Dict]) -> List[Dict]:
+        """
+        Recomputes start and end times for stops in a new order, keeping the first start time.
+        """
+        current_time = datetime.strptime(itinerary[0]['start_time'], "%I:%M %p")
+        for stop in itinerary:
+            end_time = current_time + timedelta(minutes=stop['duration'])
+            stop['start_time'] = current_time.strftime("%I:%M %p")
+            stop['end_time'] = end_time.strftime("%I:%M %p")
+            current_time = end_time + timedelta(minutes=BUFFER_MINUTES)
+        return itinerary
+
     def estimate_distance(self, start: Dict, end: Dict) -> float:
         """
-        Estimates the distance in kilometers between two points.
-        For simplicity, a fixed average distance is assumed here.
-        In real applications, use geolocation APIs for accurate distance.
+        Estimates the distance in kilometers between two points: the great-circle distance
+        when both stops have coordinates, otherwise a fixed average distance.
         """
-        # Example: Assume an average distance between stops for demo purposes
-        average_distance_km = 2  # Placeholder; replace with real distance if available
-        return average_distance_km
+        if None in (start.get('latitude'), start.get('longitude'), end.get('latitude'), end.get('longitude')):
+            average_distance_km = 2  # Placeholder when coordinates are unknown
+            return average_distance_km
+
+        lat1, lon1, lat2, lon2 = map(math.radians, (start['latitude'], start['longitude'], end['latitude'], end['longitude']))
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        return round(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a)), 3)
 
     def select_transport(self, distance_km: float, remaining_budget: float) -> str:
         """
@@ -1,3 +1,4 @@
+import uuid
 from pydantic import BaseModel
 from typing import List, Optional
 from agents.memory_agent import MemoryAgent
@@ -10,27 +11,29 @@ class UserPreferences(BaseModel):
     budget: float
     interests: List[str]
     starting_point: Optional[str] = None
+    user_id: Optional[str] = None  # Returned by the first call; omit to register a new user
 
 # User Interaction Agent to handle collecting and storing user preferences
 class UserInteractionAgent:
-    def __init__(self):
-        # Initialize memory agent for storing and retrieving preferences
-        self.memory_agent = MemoryAgent()
+    def __init__(self, memory_agent: MemoryAgent):
+        # Memory agent used for storing and retrieving preferences
+        self.memory_agent = memory_agent
 
     def collect_preferences(self, preferences: UserPreferences):
         """
-        Collects and stores user preferences in memory for personalization.
+        Collects and stores user preferences in memory for personalization, under the user's ID
+        or, if the preferences have none, under a newly generated one that is returned.
         """
         # Convert preferences to a dictionary for easier handling
-        preferences_data = preferences.dict()
+        preferences_data = preferences.dict(exclude={"user_id"})
         
         # Store each preference as a relationship in memory using the MemoryAgent
-        user_id = self.generate_user_id(preferences)  # Generate or retrieve a user ID
+        user_id = preferences.user_id or self.generate_user_id()
         for key, value in preferences_data.items():
             self.memory_agent.store_preference(user_id, key, value)
         
         # Return confirmation of stored preferences
-        return {"status": "success", "message": "User preferences collected and stored successfully"}
+        return {"status": "success", "message": "User preferences collected and stored successfully", "user_id": user_id}
 
     def retrieve_preferences(self, user_id: str) -> dict:
         """
@@ -43,6 +46,17 @@ class UserInteractionAgent:
         else:
             return {"status": "error", "message": "No preferences found for this user"}
 
+    def retrieve_profile(self, user_id: str) -> dict:
+        """
+        Retrieves the summarized interest profile (category weights, budget percentiles,
+        typical start time) maintained for a given user_id.
+        """
+        profile = self.memory_agent.fetch_profile(user_id)
+        if profile:
+            return profile.summary()
+        else:
+            return {"status": "error", "message": "No profile found for this user"}
+
     def update_preference(self, user_id: str, key: str, value: str):
         """
         Updates a specific user preference in memory.
@@ -51,10 +65,9 @@ class UserInteractionAgent:
         self.memory_agent.store_preference(user_id, key, value)
         return {"status": "success", "message": f"Preference '{key}' updated successfully"}
 
-    def generate_user_id(self, preferences: UserPreferences) -> str:
+    def generate_user_id(self) -> str:
         """
-        Generates a unique user ID based on user preferences.
-        Here, we'll simply use the city and start_time for simplicity,
-        but a more robust system could use unique identifiers.
+        Generates a new, random user ID. IDs are never derived from the preferences, so
+        unrelated users who plan the same city and start time stay separate users.
         """
-        return f"{preferences.city}_{preferences.start_time}"
+        return uuid.uuid4().hex
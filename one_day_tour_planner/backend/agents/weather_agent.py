@@ -1,42 +1,230 @@
-import requests
-from datetime import datetime
+import calendar
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from utils.deadline import Deadline, DeadlineExceeded, timeout_for
+from utils.tracing import traced
+
+# Conditions that make outdoor stops worth flagging
+BAD_WEATHER_KEYWORDS = ("rain", "snow", "storm", "drizzle", "thunder")
+
+class ForecastIndex:
+    """
+    A forecast parsed once into time-sorted columns, so that conditions at any moment
+    can be looked up with a binary search instead of scanning the raw forecast list.
+
+    Attributes:
+        timestamps (array): UTC epoch seconds of each forecast entry, ascending.
+        temperatures (array): Temperature of each entry, aligned with timestamps.
+        conditions (list): Weather description of each entry, aligned with timestamps.
+        utc_offset (int): The city's offset from UTC in seconds, used to map local times.
+        max_gap (float): How far (in seconds) before the first or after the last entry a lookup is still answered.
+    """
+
+    def __init__(self, timestamps: array, temperatures: array, conditions: List[str],
+                 utc_offset: int = 0, max_gap: float = 3 * 3600):
+        self.timestamps = timestamps
+        self.temperatures = temperatures
+        self.conditions = conditions
+        self.utc_offset = utc_offset
+        self.max_gap = max_gap
+
+    @classmethod
+    def from_forecast(cls, forecast_data: dict) -> "ForecastIndex":
+        """
+        Builds the index from an OpenWeatherMap 5 day / 3 hour forecast payload.
+
+        Args:
+            forecast_data (dict): The full forecast data returned from the API.
+
+        Returns:
+            ForecastIndex: The parsed forecast.
+        """
+        entries = sorted(forecast_data.get('list', []), key=lambda entry: entry['dt'])
+        return cls(
+            timestamps=array('d', (entry['dt'] for entry in entries)),
+            temperatures=array('d', (entry['main']['temp'] for entry in entries)),
+            conditions=[entry['weather'][0]['description'] for entry in entries],
+            utc_offset=forecast_data.get('city', {}).get('timezone', 0),
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def to_epoch(self, local_time: datetime) -> float:
+        """
+        Converts a naive local time in the forecast's city to UTC epoch seconds.
+        """
+        return calendar.timegm(local_time.timetuple()) - self.utc_offset
+
+    def at(self, local_time: datetime) -> Optional[Dict]:
+        """
+        Returns the conditions at a local time. The temperature is linearly interpolated
+        between the surrounding forecast entries, the condition is taken from the nearest one.
+
+        Args:
+            local_time (datetime): A naive datetime in the city's local time.
+
+        Returns:
+            dict or None: {'temperature', 'condition'}, or None if the time is outside the forecast.
+        """
+        if not self.timestamps:
+            return None
+
+        t = self.to_epoch(local_time)
+        i = bisect_left(self.timestamps, t)
+
+        if i < len(self.timestamps) and self.timestamps[i] == t:
+            return {"temperature": self.temperatures[i], "condition": self.conditions[i]}
+        if i == 0 or i == len(self.timestamps):
+            edge = 0 if i == 0 else i - 1
+            if abs(self.timestamps[edge] - t) > self.max_gap:
+                return None
+            return {"temperature": self.temperatures[edge], "condition": self.conditions[edge]}
+
+        t0, t1 = self.timestamps[i - 1], self.timestamps[i]
+        weight = (t - t0) / (t1 - t0)
+        temperature = self.temperatures[i - 1] + weight * (self.temperatures[i] - self.temperatures[i - 1])
+        condition = self.conditions[i - 1] if weight < 0.5 else self.conditions[i]
+        return {"temperature": round(temperature, 2), "condition": condition}
+
+    def day_slice(self, date: str) -> slice:
+        """
+        Returns the positions of all entries falling on a local date ('YYYY-MM-DD').
+        """
+        day_start = self.to_epoch(datetime.strptime(date, "%Y-%m-%d"))
+        lo = bisect_left(self.timestamps, day_start)
+        hi = bisect_left(self.timestamps, day_start + 24 * 3600, lo)
+        return slice(lo, hi)
 
 class WeatherAgent:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache_ttl: float = 1800, request_timeout: float = 10.0):
         # Initialize with an API key for the weather service
         self.api_key = api_key
         self.base_url = "http://api.openweathermap.org/data/2.5/forecast"
+        # Longest wait for the weather service; a request deadline can shorten it further
+        self.request_timeout = request_timeout
+        # Parsed forecasts per city, reused until they are cache_ttl seconds old
+        self.cache_ttl = cache_ttl
+        self._forecasts: Dict[str, tuple] = {}
 
-    def fetch_weather(self, city: str, date: str) -> dict:
+    def get_forecast_index(self, city: str, deadline: Optional[Deadline] = None) -> ForecastIndex:
         """
-        Fetches weather forecast data for a specific city and date.
-        
+        Returns the parsed forecast for a city, fetching it only if the cached one has expired.
+
         Args:
-            city (str): The name of the city for which to fetch the weather forecast.
-            date (str): The date for the forecast in 'YYYY-MM-DD' format.
+            city (str): The name of the city.
+            deadline (Deadline, optional): The request deadline, which bounds the fetch.
 
         Returns:
-            dict: A dictionary with weather details like temperature, conditions, and recommendations.
+            ForecastIndex: The parsed forecast.
+
+        Raises:
+            requests.RequestException: If the forecast could not be retrieved in time.
+            DeadlineExceeded: If the deadline passed before the fetch could start.
         """
+        cached = self._forecasts.get(city)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        # Imported on first use to keep the agent cheap to import
+        import requests
+
         # Request weather data from the OpenWeatherMap API
         params = {
             "q": city,
             "appid": self.api_key,
             "units": "metric"  # Metric units (Celsius) for temperature
         }
-        
+        response = requests.get(self.base_url, params=params, timeout=timeout_for(deadline, self.request_timeout))
+        response.raise_for_status()  # Raise an error for HTTP issues
+
+        forecast_index = ForecastIndex.from_forecast(response.json())
+        self._forecasts[city] = (time.monotonic(), forecast_index)
+        return forecast_index
+
+    @traced
+    def fetch_weather(self, city: str, date: str, deadline: Optional[Deadline] = None) -> dict:
+        """
+        Fetches weather forecast data for a specific city and date.
+
+        Args:
+            city (str): The name of the city for which to fetch the weather forecast.
+            date (str): The date for the forecast in 'YYYY-MM-DD' format.
+            deadline (Deadline, optional): The request deadline; if the forecast cannot be fetched
+                                           in time, the weather stage is marked as degraded.
+
+        Returns:
+            dict: A dictionary with weather details like temperature, conditions, and recommendations.
+        """
+        import requests
+
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()  # Raise an error for HTTP issues
-            forecast_data = response.json()
+            forecast_index = self.get_forecast_index(city, deadline)
 
             # Extract relevant weather data for the requested date
-            daily_weather = self.extract_weather_for_date(forecast_data, date)
+            daily_weather = self.summarize_date(forecast_index, date)
             return daily_weather
-        
-        except requests.RequestException as e:
+
+        except (requests.RequestException, DeadlineExceeded) as e:
+            if deadline:
+                deadline.mark_degraded("weather", f"Forecast unavailable: {e}")
             return {"error": f"Failed to retrieve weather data: {str(e)}"}
 
+    @traced
+    def fetch_weather_for_itinerary(self, city: str, date: str, itinerary: List[Dict],
+                                    deadline: Optional[Deadline] = None) -> List[Dict]:
+        """
+        Adds the forecast at each stop's start time to the itinerary, and flags outdoor stops
+        scheduled during bad weather.
+
+        Args:
+            city (str): The city of the itinerary.
+            date (str): The date of the trip in 'YYYY-MM-DD' format.
+            itinerary (list): Stops with a 'start_time' in '%I:%M %p' format and an optional 'outdoor' flag.
+            deadline (Deadline, optional): The request deadline; stops are left unannotated if
+                                           the forecast cannot be fetched in time.
+
+        Returns:
+            list: The same stops, each with a 'weather' entry and, where relevant, a 'weather_warning'.
+        """
+        import requests
+
+        try:
+            forecast_index = self.get_forecast_index(city, deadline)
+        except (requests.RequestException, DeadlineExceeded) as e:
+            if deadline:
+                deadline.mark_degraded("weather", f"Forecast unavailable: {e}")
+            return itinerary
+        return self.annotate_itinerary(forecast_index, date, itinerary)
+
+    def annotate_itinerary(self, forecast_index: ForecastIndex, date: str, itinerary: List[Dict]) -> List[Dict]:
+        """
+        Annotates itinerary stops in place with the conditions at their start time.
+
+        Args:
+            forecast_index (ForecastIndex): The parsed forecast of the city.
+            date (str): The date of the trip in 'YYYY-MM-DD' format.
+            itinerary (list): The stops to annotate.
+
+        Returns:
+            list: The annotated stops.
+        """
+        day = datetime.strptime(date, "%Y-%m-%d")
+        for stop in itinerary:
+            if 'start_time' not in stop:
+                continue
+            clock = datetime.strptime(stop['start_time'], "%I:%M %p")
+            weather = forecast_index.at(day + timedelta(hours=clock.hour, minutes=clock.minute))
+            if weather is None:
+                continue
+            stop['weather'] = weather
+            if stop.get('outdoor') and any(word in weather['condition'] for word in BAD_WEATHER_KEYWORDS):
+                stop['weather_warning'] = self.get_weather_recommendation(weather['condition'])
+        return itinerary
+
     def extract_weather_for_date(self, forecast_data: dict, date: str) -> dict:
         """
         Extracts and formats weather data for a specific date from forecast data.
@@ -48,13 +236,24 @@ class WeatherAgent:
         Returns:
             dict: Processed weather information for the specified date.
         """
-        target_day_data = [
-            item for item in forecast_data['list'] if item['dt_txt'].startswith(date)
-        ]
+        return self.summarize_date(ForecastIndex.from_forecast(forecast_data), date)
+
+    def summarize_date(self, forecast_index: ForecastIndex, date: str) -> dict:
+        """
+        Summarizes the forecast of a single date.
+
+        Args:
+            forecast_index (ForecastIndex): The parsed forecast.
+            date (str): The target date in 'YYYY-MM-DD' format.
+
+        Returns:
+            dict: Processed weather information for the specified date.
+        """
+        day = forecast_index.day_slice(date)
 
         # Process data to find the average temperature and main weather conditions
-        temperatures = [entry['main']['temp'] for entry in target_day_data]
-        conditions = [entry['weather'][0]['description'] for entry in target_day_data]
+        temperatures = forecast_index.temperatures[day]
+        conditions = forecast_index.conditions[day]
 
         # Calculate average temperature and find the most common weather condition
         avg_temp = sum(temperatures) / len(temperatures) if temperatures else None
@@ -0,0 +1,264 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from database.neo4j_setup import apply_schema
+from database.queries import (
+    LOAD_CITIES_QUERY, LOAD_ATTRACTIONS_QUERY, LOAD_USERS_QUERY, BATCH_STORE_PREFERENCES_QUERY, BATCH_STORE_TRIPS_QUERY,
+    LOCK_PROFILE_SOURCES_PAGE_QUERY, BATCH_WRITE_PROFILES_QUERY,
+)
+from database.schemas.memory import InterestProfile
+
+logger = logging.getLogger(__name__)
+
+
+class Entity(NamedTuple):
+    # UNWIND query that MERGEs one batch of rows
+    query: str
+    # Converts an input row into the row the query expects
+    prepare: Callable[[Dict], Dict]
+    # The key of the shared node the row's writes lock: the node it MERGEs or the one its relationship
+    # ends on. Rows with the same key always go to the same session, so parallel sessions never wait
+    # on each other's locks or race to create the same node
+    partition_key: Callable[[Dict], str]
+
+
+def _split(row: Dict, *keys: str) -> Dict:
+    prepared = {key: row[key] for key in keys}
+    prepared["properties"] = {key: value for key, value in row.items() if key not in keys}
+    return prepared
+
+
+# Loaded in this order, so the nodes a row refers to exist (or are merged) before it
+ENTITIES: Dict[str, Entity] = {
+    "cities": Entity(
+        LOAD_CITIES_QUERY,
+        lambda row: {"name": row["name"], "description": row.get("description"), "activities": row.get("activities", [])},
+        lambda row: row["name"]),
+    # Every attraction's LOCATED_IN relationship locks its city, so a city's attractions are written by one session
+    "attractions": Entity(LOAD_ATTRACTIONS_QUERY, lambda row: _split(row, "city", "name"), lambda row: row["city"]),
+    "users": Entity(LOAD_USERS_QUERY, lambda row: dict(_split(row, "id"), id=str(row["id"])), lambda row: str(row["id"])),
+    "preferences": Entity(
+        BATCH_STORE_PREFERENCES_QUERY,
+        lambda row: {"user_id": str(row["user_id"]), "key": row["key"], "value": row["value"]},
+        lambda row: str(row["user_id"])),
+    # Trip ids are unique, but every trip's HAS_TRIP relationship locks its user
+    "trips": Entity(
+        BATCH_STORE_TRIPS_QUERY,
+        lambda row: {"user_id": str(row["user_id"]), "trip_id": str(row["trip_id"]),
+                     "trip_data": {key: value for key, value in row.items() if key not in ("user_id", "trip_id")}},
+        lambda row: str(row["user_id"])),
+}
+
+
+def read_rows(path: str) -> Iterator[Dict]:
+    """
+    Streams the rows of a JSON Lines file (optionally gzip-compressed) one at a time.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def find_chunks(data_dir: str, entity: str) -> List[str]:
+    """
+    Returns the chunk files of an entity, <data_dir>/<entity>/*.jsonl[.gz], in name order.
+    """
+    pattern = os.path.join(data_dir, entity, "*.jsonl")
+    return sorted(glob.glob(pattern) + glob.glob(pattern + ".gz"))
+
+
+class Checkpoint:
+    """
+    Records which chunks were fully loaded (and how far the profile rebuild got), so an interrupted
+    load resumes with the first unfinished chunk. The file is replaced atomically on every update.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+        # profiles_after: the last user whose profile was rebuilt, or "" once all of them were
+        self.state = {"chunks": {}, "profiles_after": None}
+        if path and os.path.exists(path):
+            with open(path) as source:
+                self.state.update(json.load(source))
+
+    def is_done(self, chunk: str) -> bool:
+        return chunk in self.state["chunks"]
+
+    def mark_done(self, chunk: str, rows: int):
+        with self._lock:
+            self.state["chunks"][chunk] = rows
+            self.state["profiles_after"] = None  # new rows, so every profile is rebuilt again
+            self._save()
+
+    def mark_profiles(self, after: Optional[str]):
+        with self._lock:
+            self.state["profiles_after"] = after
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        with open(self.path + ".tmp", "w") as output:
+            json.dump(self.state, output)
+        os.replace(self.path + ".tmp", self.path)
+
+
+class LoadStats(NamedTuple):
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class BulkLoader:
+    """
+    Loads cities, attractions, users, preferences and trips into Neo4j from chunked JSON Lines
+    files. Each chunk is streamed and its rows are routed by partition key to one of `workers`
+    sessions, which write them in UNWIND batches of batch_size rows, one transaction per batch.
+    Each partition has its own writer thread, so its batches commit in the order they were read
+    and a later row for the same node (e.g., a user's newer preference value) always wins.
+    Every write is a MERGE, so loading the same data twice changes nothing; a chunk is recorded in
+    the checkpoint once all of its batches committed, and a resumed load skips recorded chunks.
+
+    User profiles are rebuilt from the loaded preferences and trips at the end instead of being
+    updated per row, which keeps the load idempotent. The rebuild locks each user like live writes
+    do, so it is safe to load while the app is running.
+
+    Attributes:
+        driver: The Neo4j driver.
+        batch_size (int): Rows per transaction.
+        workers (int): Parallel sessions.
+        checkpoint (Checkpoint): Progress of this load.
+    """
+
+    def __init__(self, driver, batch_size: int = 1000, workers: int = 4, checkpoint_path: Optional[str] = None):
+        self.driver = driver
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint = Checkpoint(checkpoint_path)
+
+    def load_directory(self, data_dir: str, rebuild_profiles: bool = True) -> Dict[str, LoadStats]:
+        """
+        Loads every entity found under data_dir (see find_chunks), creating the schema first.
+
+        Returns:
+            Dict[str, LoadStats]: Rows written and time taken per entity, plus "profiles".
+        """
+        chunks = {entity: [(os.path.relpath(path, data_dir), path) for path in find_chunks(data_dir, entity)]
+                  for entity in ENTITIES}
+        return self.load({entity: [(name, lambda path=path: read_rows(path)) for name, path in files]
+                          for entity, files in chunks.items()}, rebuild_profiles)
+
+    def load(self, sources: Dict[str, List[Tuple[str, Callable[[], Iterable[Dict]]]]],
+             rebuild_profiles: bool = True) -> Dict[str, LoadStats]:
+        """
+        Loads named row sources per entity.
+
+        Args:
+            sources: For each entity of ENTITIES, (chunk name, function returning the rows) pairs.
+            rebuild_profiles (bool): Recompute the profile of every user once the rows are loaded.
+
+        Returns:
+            Dict[str, LoadStats]: Rows written and time taken per entity, plus "profiles".
+        """
+        with self.driver.session() as session:
+            apply_schema(session)
+
+        stats = {}
+        # One single-threaded writer per partition: its batches run one at a time, in submission order
+        writers = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"bulk-load-{partition}")
+                   for partition in range(self.workers)]
+        try:
+            for entity, spec in ENTITIES.items():
+                started, rows = time.monotonic(), 0
+                for chunk, open_rows in sources.get(entity, []):
+                    if self.checkpoint.is_done(chunk):
+                        logger.info("Skipping %s, loaded by an earlier run", chunk)
+                        continue
+                    chunk_rows = self._load_chunk(writers, spec, open_rows())
+                    self.checkpoint.mark_done(chunk, chunk_rows)
+                    rows += chunk_rows
+                stats[entity] = LoadStats(rows, time.monotonic() - started)
+                logger.info("Loaded %d %s (%.0f rows/s)", rows, entity, stats[entity].rows_per_second)
+        finally:
+            for writer in writers:
+                writer.shutdown()
+        if rebuild_profiles:
+            stats["profiles"] = self.rebuild_profiles()
+        return stats
+
+    def _load_chunk(self, writers: List[ThreadPoolExecutor], spec: Entity, rows: Iterable[Dict]) -> int:
+        # One pending batch per partition; a full batch is handed to the partition's writer, and at
+        # most a couple of batches per worker are queued so reading never runs far ahead of writing
+        batches: List[List[Dict]] = [[] for _ in range(self.workers)]
+        in_flight, count = set(), 0
+        for row in rows:
+            partition = zlib.crc32(spec.partition_key(row).encode("utf-8")) % self.workers
+            batches[partition].append(spec.prepare(row))
+            count += 1
+            if len(batches[partition]) >= self.batch_size:
+                in_flight.add(writers[partition].submit(self._write, spec.query, batches[partition]))
+                batches[partition] = []
+                if len(in_flight) >= 2 * self.workers:
+                    done, in_flight = wait(in_flight, return_when="FIRST_COMPLETED")
+                    for future in done:
+                        future.result()
+        in_flight.update(writers[partition].submit(self._write, spec.query, batch)
+                         for partition, batch in enumerate(batches) if batch)
+        for future in wait(in_flight).done:
+            future.result()  # re-raises a failed batch, so the chunk is not checkpointed
+        return count
+
+    def _write(self, query: str, rows: List[Dict]):
+        with self.driver.session() as session:
+            session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+
+    def rebuild_profiles(self, page_size: int = 1000) -> LoadStats:
+        """
+        Recomputes the interest profile of every user from their preferences and trips, in user id
+        order, recording the last finished page in the checkpoint. Each page is locked, read and
+        written in one transaction, so live profile updates are never lost.
+        """
+        started, users = time.monotonic(), 0
+        after = self.checkpoint.state.get("profiles_after")
+        if after == "":
+            return LoadStats(0, 0.0)  # finished by an earlier run and nothing was loaded since
+        after = after or ""
+        with self.driver.session() as session:
+            while True:
+                rows = session.execute_write(self._rebuild_page, after, page_size)
+                if not rows:
+                    break
+                users += len(rows)
+                after = rows[-1]["user_id"]
+                self.checkpoint.mark_profiles(after)
+        self.checkpoint.mark_profiles("")
+        stats = LoadStats(users, time.monotonic() - started)
+        logger.info("Rebuilt %d profiles (%.0f users/s)", users, stats.rows_per_second)
+        return stats
+
+    @staticmethod
+    def _rebuild_page(tx, after: str, page_size: int) -> List[Dict]:
+        rows = []
+        for record in list(tx.run(LOCK_PROFILE_SOURCES_PAGE_QUERY, after=after, limit=page_size)):
+            profile = InterestProfile()
+            for preference in record["preferences"]:
+                profile.add_preference(preference["key"], preference["value"])
+            for trip in record["trips"]:
+                profile.add_trip(trip)
+            rows.append({"user_id": record["user_id"], "profile": profile.to_json()})
+        if rows:
+            tx.run(BATCH_WRITE_PROFILES_QUERY, rows=rows).consume()
+        return rows
@@ -1,4 +1,19 @@
 from neo4j import GraphDatabase
+from database.queries import SCHEMA_QUERIES, SUPERSEDED_INDEXES, LIST_PLAIN_INDEXES_QUERY
+
+def apply_schema(session):
+    """
+    Creates the indexes and constraints of SCHEMA_QUERIES, first dropping the plain indexes that
+    one of the constraints replaces. Every statement is idempotent, so this is safe to repeat.
+
+    Args:
+        session: An open Neo4j session.
+    """
+    for record in session.run(LIST_PLAIN_INDEXES_QUERY):
+        if (record["labels"][0], tuple(record["properties"])) in SUPERSEDED_INDEXES:
+            session.run(f"DROP INDEX `{record['name']}` IF EXISTS")
+    for query in SCHEMA_QUERIES:
+        session.run(query)
 
 class Neo4jConnection:
     def __init__(self, uri: str, user: str, password: str):
@@ -21,18 +36,13 @@ class Neo4jConnection:
 
     def create_indexes(self):
         """
-        Creates indexes on commonly queried nodes to optimize performance.
-        This method sets up indexes on `User` nodes by `id`, `Preference` nodes by `key` and `value`,
-        and `Trip` nodes by `id`.
+        Creates indexes and constraints on commonly queried nodes to optimize performance.
+        This method sets up uniqueness constraints (and their backing indexes) on `User.id`, `Trip.id`,
+        `City.name`, `Attraction` (`city`, `name`) and `UserPreference` (`user_id`, `key`). The statements
+        come from the query catalog in database/queries.py.
         """
-        index_queries = [
-            "CREATE INDEX IF NOT EXISTS FOR (u:User) ON (u.id)",
-            "CREATE INDEX IF NOT EXISTS FOR (p:Preference) ON (p.key, p.value)",
-            "CREATE INDEX IF NOT EXISTS FOR (t:Trip) ON (t.id)"
-        ]
         with self.driver.session() as session:
-            for query in index_queries:
-                session.run(query)
+            apply_schema(session)
         print("Indexes created successfully")
 
     def reset_database(self):
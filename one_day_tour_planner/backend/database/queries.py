@@ -0,0 +1,237 @@
+# Central catalog of the Cypher queries used by the application.
+# Values are always passed as parameters ($name), never formatted into the query text, so Neo4j
+# reuses one cached plan per query and user input cannot change the query. SCHEMA_QUERIES creates
+# the indexes and constraints these lookups rely on, and scripts/check_query_plans.py EXPLAINs
+# every CATALOG entry to catch plans that scan a whole label.
+# Only constants live here, so both the backend and the frontend can import this module.
+from typing import Dict, NamedTuple
+
+# Indexes and constraints backing the lookups below. Node keys are uniqueness constraints, so
+# concurrent MERGEs (e.g., from the bulk loader's parallel sessions) cannot create duplicates.
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "CREATE CONSTRAINT user_preference_key_unique IF NOT EXISTS FOR (p:UserPreference) REQUIRE (p.user_id, p.key) IS UNIQUE",
+    "CREATE CONSTRAINT trip_id_unique IF NOT EXISTS FOR (t:Trip) REQUIRE t.id IS UNIQUE",
+    "CREATE CONSTRAINT city_name_unique IF NOT EXISTS FOR (c:City) REQUIRE c.name IS UNIQUE",
+    "CREATE CONSTRAINT attraction_key_unique IF NOT EXISTS FOR (a:Attraction) REQUIRE (a.city, a.name) IS UNIQUE",
+]
+
+# Plain indexes created by earlier versions of SCHEMA_QUERIES that a constraint above replaces (they must be
+# dropped first because Neo4j will not create a constraint over an existing index) or that nothing uses anymore
+SUPERSEDED_INDEXES = {("User", ("id",)), ("Trip", ("id",)), ("Preference", ("key", "value"))}
+
+LIST_PLAIN_INDEXES_QUERY = """
+SHOW RANGE INDEXES YIELD name, entityType, labelsOrTypes, properties, owningConstraint
+WHERE entityType = 'NODE' AND owningConstraint IS NULL
+RETURN name, labelsOrTypes AS labels, properties
+"""
+
+# Preferences
+# Every user has their own UserPreference node per key, holding the latest value. Nodes are never shared
+# between users, so popular values (city=Paris) do not become supernodes that every write locks.
+STORE_PREFERENCE_QUERY = """
+MERGE (u:User {id: $user_id})
+MERGE (p:UserPreference {user_id: $user_id, key: $key})
+SET p.value = $value
+MERGE (u)-[:HAS_PREFERENCE]->(p)
+"""
+
+FETCH_PREFERENCES_QUERY = """
+MATCH (u:User {id: $user_id})-[:HAS_PREFERENCE]->(p:UserPreference)
+RETURN p.key AS key, p.value AS value
+"""
+
+UPDATE_PREFERENCE_QUERY = """
+MATCH (p:UserPreference {user_id: $user_id, key: $key})
+SET p.value = $new_value
+"""
+
+# Trips
+# New trips are labelled CovisitPending until the co-visitation job has counted them
+STORE_TRIP_QUERY = """
+MERGE (u:User {id: $user_id})
+MERGE (t:Trip {id: $trip_id})
+ON CREATE SET t:CovisitPending
+SET t += $trip_data
+MERGE (u)-[:HAS_TRIP]->(t)
+"""
+
+FETCH_TRIPS_QUERY = """
+MATCH (u:User {id: $user_id})-[:HAS_TRIP]->(t:Trip)
+RETURN t.id AS trip_id, t
+"""
+
+# Interest profiles
+# Locks the user node for the rest of the transaction (by writing to it) and returns its stored profile
+LOCK_AND_READ_PROFILE_QUERY = """
+MATCH (u:User {id: $user_id})
+SET u.profile_version = coalesce(u.profile_version, 0) + 1
+RETURN u.profile AS profile
+"""
+
+WRITE_PROFILE_QUERY = """
+MATCH (u:User {id: $user_id})
+SET u.profile = $profile
+"""
+
+FETCH_PROFILE_QUERY = """
+MATCH (u:User {id: $user_id})
+RETURN u.profile AS profile, u.profile_version AS profile_version
+"""
+
+# Batched writes (used by the write-behind buffer); each row is one buffered write
+BATCH_STORE_PREFERENCES_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {id: row.user_id})
+MERGE (p:UserPreference {user_id: row.user_id, key: row.key})
+SET p.value = row.value
+MERGE (u)-[:HAS_PREFERENCE]->(p)
+"""
+
+BATCH_STORE_TRIPS_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {id: row.user_id})
+MERGE (t:Trip {id: row.trip_id})
+ON CREATE SET t:CovisitPending
+SET t += row.trip_data
+MERGE (u)-[:HAS_TRIP]->(t)
+"""
+
+# Same as LOCK_AND_READ_PROFILE_QUERY for many users; pass the ids sorted so concurrent batches lock in the same order
+BATCH_LOCK_AND_READ_PROFILES_QUERY = """
+UNWIND $user_ids AS user_id
+MATCH (u:User {id: user_id})
+SET u.profile_version = coalesce(u.profile_version, 0) + 1
+RETURN u.id AS user_id, u.profile AS profile, u.profile_version AS profile_version
+"""
+
+BATCH_WRITE_PROFILES_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {id: row.user_id})
+SET u.profile = row.profile
+"""
+
+# Co-visitation job (scripts/build_covisitation.py); a trip's attractions are the names in t.attractions
+# A full rebuild pages through all trips in id order and clears their pending label in the same transaction
+FETCH_TRIP_VISITS_PAGE_QUERY = """
+MATCH (t:Trip)
+WHERE t.id > $after
+WITH t ORDER BY t.id LIMIT $limit
+REMOVE t:CovisitPending
+RETURN t.id AS trip_id, t.destination AS city, t.attractions AS attractions
+"""
+
+# An incremental update only reads the trips stored since the last run. It is left out of CATALOG because
+# it scans the CovisitPending label on purpose; that label only holds the trips not counted yet.
+FETCH_PENDING_TRIP_VISITS_QUERY = """
+MATCH (t:CovisitPending)
+WITH t LIMIT $limit
+REMOVE t:CovisitPending
+RETURN t.id AS trip_id, t.destination AS city, t.attractions AS attractions
+"""
+
+# Bulk loading (database/bulk_loader.py); preferences and trips reuse the batched write queries above
+LOAD_CITIES_QUERY = """
+UNWIND $rows AS row
+MERGE (c:City {name: row.name})
+SET c.description = row.description, c.activities = row.activities
+"""
+
+LOAD_ATTRACTIONS_QUERY = """
+UNWIND $rows AS row
+MERGE (c:City {name: row.city})
+MERGE (a:Attraction {city: row.city, name: row.name})
+SET a += row.properties
+MERGE (a)-[:LOCATED_IN]->(c)
+"""
+
+LOAD_USERS_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {id: row.id})
+SET u += row.properties
+"""
+
+# Everything a page of users' profiles is rebuilt from, in user id order. Each user is locked the way
+# LOCK_AND_READ_PROFILE_QUERY locks it before their preferences and trips are read, so a rebuild written in
+# the same transaction cannot overwrite the profile update of a concurrent live write
+LOCK_PROFILE_SOURCES_PAGE_QUERY = """
+MATCH (u:User)
+WHERE u.id > $after
+WITH u ORDER BY u.id LIMIT $limit
+SET u.profile_version = coalesce(u.profile_version, 0) + 1
+RETURN u.id AS user_id,
+       [(u)-[:HAS_PREFERENCE]->(p:UserPreference) | {key: p.key, value: p.value}] AS preferences,
+       [(u)-[:HAS_TRIP]->(t:Trip) | properties(t)] AS trips
+"""
+
+# Preference migration (scripts/migrate_preferences.py) from the shared (:Preference {key, value}) nodes of
+# earlier versions. For each page of users, in id order, every key becomes a UserPreference node and the
+# user's relationships to the shared nodes are deleted. A key the user had several values for keeps the
+# newest (relationship ids grow with creation order); a UserPreference written since the upgrade is kept.
+MIGRATE_PREFERENCES_PAGE_QUERY = """
+MATCH (u:User)
+WHERE u.id > $after
+WITH u ORDER BY u.id LIMIT $limit
+CALL {
+  WITH u
+  MATCH (u)-[r:HAS_PREFERENCE]->(old:Preference)
+  WITH u, r, old ORDER BY id(r) DESC
+  WITH u, old.key AS key, collect(old.value)[0] AS value, collect(r) AS relationships
+  MERGE (p:UserPreference {user_id: u.id, key: key})
+  ON CREATE SET p.value = value
+  MERGE (u)-[:HAS_PREFERENCE]->(p)
+  FOREACH (r IN relationships | DELETE r)
+  RETURN count(key) AS migrated
+}
+RETURN u.id AS user_id, migrated
+"""
+
+# Shared Preference nodes left without relationships once every user was migrated, deleted a batch at a time.
+# Left out of CATALOG because it scans the Preference label on purpose.
+DELETE_ORPHANED_PREFERENCES_QUERY = """
+MATCH (old:Preference)
+WHERE NOT (old)--()
+WITH old LIMIT $limit
+DELETE old
+RETURN count(*) AS deleted
+"""
+
+# Cities
+CITY_INFO_QUERY = """
+MATCH (c:City {name: $city})
+RETURN c.name AS city, c.description AS description, c.activities AS activities
+"""
+
+
+class CatalogQuery(NamedTuple):
+    cypher: str
+    example_parameters: Dict
+    read_only: bool
+
+
+# Every query above (except FETCH_PENDING_TRIP_VISITS_QUERY and DELETE_ORPHANED_PREFERENCES_QUERY) with representative parameters, used by the plan checker
+CATALOG: Dict[str, CatalogQuery] = {
+    "store_preference": CatalogQuery(STORE_PREFERENCE_QUERY, {"user_id": "1", "key": "city", "value": "Paris"}, False),
+    "fetch_preferences": CatalogQuery(FETCH_PREFERENCES_QUERY, {"user_id": "1"}, True),
+    "update_preference": CatalogQuery(UPDATE_PREFERENCE_QUERY, {"user_id": "1", "key": "city", "new_value": "Rome"}, False),
+    "store_trip": CatalogQuery(STORE_TRIP_QUERY, {"user_id": "1", "trip_id": "1", "trip_data": {"destination": "Paris"}}, False),
+    "fetch_trips": CatalogQuery(FETCH_TRIPS_QUERY, {"user_id": "1"}, True),
+    "lock_and_read_profile": CatalogQuery(LOCK_AND_READ_PROFILE_QUERY, {"user_id": "1"}, False),
+    "write_profile": CatalogQuery(WRITE_PROFILE_QUERY, {"user_id": "1", "profile": "{}"}, False),
+    "fetch_profile": CatalogQuery(FETCH_PROFILE_QUERY, {"user_id": "1"}, True),
+    "batch_store_preferences": CatalogQuery(
+        BATCH_STORE_PREFERENCES_QUERY, {"rows": [{"user_id": "1", "key": "city", "value": "Paris"}]}, False),
+    "batch_store_trips": CatalogQuery(
+        BATCH_STORE_TRIPS_QUERY, {"rows": [{"user_id": "1", "trip_id": "1", "trip_data": {"destination": "Paris"}}]}, False),
+    "batch_lock_and_read_profiles": CatalogQuery(BATCH_LOCK_AND_READ_PROFILES_QUERY, {"user_ids": ["1"]}, False),
+    "batch_write_profiles": CatalogQuery(BATCH_WRITE_PROFILES_QUERY, {"rows": [{"user_id": "1", "profile": "{}"}]}, False),
+    "fetch_trip_visits_page": CatalogQuery(FETCH_TRIP_VISITS_PAGE_QUERY, {"after": "", "limit": 1000}, False),
+    "load_cities": CatalogQuery(
+        LOAD_CITIES_QUERY, {"rows": [{"name": "Paris", "description": "", "activities": []}]}, False),
+    "load_attractions": CatalogQuery(
+        LOAD_ATTRACTIONS_QUERY, {"rows": [{"city": "Paris", "name": "Louvre Museum", "properties": {"cost": 20}}]}, False),
+    "load_users": CatalogQuery(LOAD_USERS_QUERY, {"rows": [{"id": "1", "properties": {"name": "John Doe"}}]}, False),
+    "lock_profile_sources_page": CatalogQuery(LOCK_PROFILE_SOURCES_PAGE_QUERY, {"after": "", "limit": 1000}, False),
+    "migrate_preferences_page": CatalogQuery(MIGRATE_PREFERENCES_PAGE_QUERY, {"after": "", "limit": 1000}, False),
+    "city_info": CatalogQuery(CITY_INFO_QUERY, {"city": "Paris"}, True),
+}
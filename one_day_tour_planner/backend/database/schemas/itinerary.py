@@ -0,0 +1,89 @@
+import json
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Iterable, List, Literal, Optional, Union
+
+Stop = Dict[str, Any]
+
+
+class ItineraryEvent(BaseModel):
+    """
+    One event of a streamed complete itinerary. A stream sends each section as soon as its stage
+    has finished, in this order: "itinerary", "optimized_route", "weather", "map", then "done".
+    A stream that fails part way ends with an "error" event instead.
+
+    Attributes:
+        event (str): The kind of event; identifies the model.
+        elapsed_ms (float): Time since the request started when the event was sent.
+    """
+
+    event: str
+    elapsed_ms: float = Field(0.0, description="Milliseconds since the request started.")
+
+    def fields(self) -> Dict[str, Any]:
+        """
+        Returns the sections this event carries, leaving out the event metadata and empty sections.
+        """
+        return {key: value for key, value in self.dict(exclude={"event", "elapsed_ms"}).items() if value is not None}
+
+
+class ItineraryStageEvent(ItineraryEvent):
+    event: Literal["itinerary"] = "itinerary"
+    itinerary: List[Stop] = Field(..., description="The stops selected for the preferences, before optimization.")
+
+
+class RouteStageEvent(ItineraryEvent):
+    event: Literal["optimized_route"] = "optimized_route"
+    optimized_route: List[Stop] = Field(..., description="The stops in their optimized order, with times and transport.")
+    starting_point: Optional[Dict[str, Any]] = Field(None, description="Where the route leaves from, if one was found.")
+
+
+class WeatherStageEvent(ItineraryEvent):
+    event: Literal["weather"] = "weather"
+    weather_info: Optional[Dict[str, Any]] = Field(None, description="The forecast summary for the day.")
+    optimized_route: Optional[List[Stop]] = Field(None, description="The optimized route again, with each stop's weather.")
+
+
+class MapStageEvent(ItineraryEvent):
+    event: Literal["map"] = "map"
+    map_link: Optional[str] = Field(None, description="A directions link for the optimized route.")
+
+
+class DoneEvent(ItineraryEvent):
+    event: Literal["done"] = "done"
+    degraded: Optional[Dict[str, str]] = Field(None, description="Stages that returned partial results, with the reason.")
+
+
+class ErrorEvent(ItineraryEvent):
+    event: Literal["error"] = "error"
+    detail: str = Field(..., description="Why the stream ended early.")
+
+
+StreamEvent = Union[ItineraryStageEvent, RouteStageEvent, WeatherStageEvent, MapStageEvent, DoneEvent, ErrorEvent]
+
+EVENT_TYPES = {model.__fields__["event"].default: model for model in StreamEvent.__args__}
+
+
+def parse_event(data: Union[str, bytes, Dict[str, Any]]) -> ItineraryEvent:
+    """
+    Decodes one streamed event (a JSON line, an SSE data payload or a decoded dict) into its model.
+
+    Raises:
+        ValueError: If the event kind is unknown or its fields are invalid.
+    """
+    if not isinstance(data, dict):
+        data = json.loads(data)
+    model = EVENT_TYPES.get(data.get("event"))
+    if model is None:
+        raise ValueError(f"Unknown itinerary event: {data.get('event')!r}")
+    return model(**data)
+
+
+def merge_events(events: Iterable[ItineraryEvent]) -> Dict[str, Any]:
+    """
+    Combines the events of a stream into the complete itinerary, later sections replacing earlier
+    ones (the weather stage resends the route with each stop's weather).
+    """
+    merged: Dict[str, Any] = {}
+    for event in events:
+        merged.update(event.fields())
+    return merged
@@ -0,0 +1,152 @@
+import json
+from bisect import bisect_right
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+# Upper edges of the budget histogram buckets; the last bucket holds everything above 500
+BUDGET_BUCKET_EDGES = [10, 25, 50, 75, 100, 150, 200, 300, 500]
+
+# Factor applied to existing category weights whenever new interests are observed
+CATEGORY_WEIGHT_DECAY = 0.9
+
+class InterestProfile(BaseModel):
+    """
+    A compact summary of a user's preferences and trip history, stored as a single JSON property
+    (`profile`) on the user's `User` node. It is updated incrementally on every preference or trip
+    write, so reading it costs one property lookup however long the user's history is.
+
+    Attributes:
+        category_weights (Dict[str, float]): Decayed counts of interest categories, most recent weighing most.
+        budget_histogram (List[int]): Number of observed budgets per BUDGET_BUCKET_EDGES bucket.
+        max_budget (float): The largest observed budget, which bounds the open-ended last bucket.
+        start_hour_histogram (List[int]): Number of observed start times per hour of the day.
+        observations (int): How many updates the profile has absorbed.
+    """
+
+    category_weights: Dict[str, float] = Field(default_factory=dict)
+    budget_histogram: List[int] = Field(default_factory=lambda: [0] * (len(BUDGET_BUCKET_EDGES) + 1))
+    start_hour_histogram: List[int] = Field(default_factory=lambda: [0] * 24)
+    max_budget: float = 0.0
+    observations: int = 0
+
+    @classmethod
+    def from_json(cls, data: Optional[str]) -> "InterestProfile":
+        """
+        Loads a profile from its stored JSON form; a missing property yields an empty profile.
+        """
+        return cls(**json.loads(data)) if data else cls()
+
+    def to_json(self) -> str:
+        return json.dumps(self.dict(), separators=(",", ":"))
+
+    def add_interests(self, interests: List[str]):
+        """
+        Records interest categories, decaying the weight of older ones.
+        """
+        interests = [interest.strip().lower() for interest in interests if interest and interest.strip()]
+        if not interests:
+            return
+        for category in self.category_weights:
+            self.category_weights[category] = round(self.category_weights[category] * CATEGORY_WEIGHT_DECAY, 6)
+        for category in interests:
+            self.category_weights[category] = self.category_weights.get(category, 0.0) + 1.0
+        self.observations += 1
+
+    def add_budget(self, budget: float):
+        """
+        Records a trip budget in the budget histogram.
+        """
+        self.budget_histogram[bisect_right(BUDGET_BUCKET_EDGES, float(budget))] += 1
+        self.max_budget = max(self.max_budget, float(budget))
+        self.observations += 1
+
+    def add_start_time(self, start_time: str):
+        """
+        Records a start time ('HH:MM', '%I:%M %p' or ISO datetime) in the start-hour histogram.
+        Unparseable values are ignored.
+        """
+        for time_format in ("%H:%M", "%I:%M %p", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M"):
+            try:
+                hour = datetime.strptime(start_time.strip(), time_format).hour
+                break
+            except (ValueError, AttributeError):
+                continue
+        else:
+            return
+        self.start_hour_histogram[hour] += 1
+        self.observations += 1
+
+    def add_preference(self, key: str, value):
+        """
+        Updates the profile from a single stored preference.
+        """
+        if key == "interests":
+            self.add_interests(value if isinstance(value, list) else str(value).split(","))
+        elif key == "budget":
+            try:
+                self.add_budget(float(value))
+            except (TypeError, ValueError):
+                pass
+        elif key == "start_time":
+            self.add_start_time(str(value))
+
+    def add_trip(self, trip_data: Dict):
+        """
+        Updates the profile from a trip record, using whichever of its interests/categories,
+        budget/cost and start_time fields are present.
+        """
+        for key in ("interests", "categories"):
+            if key in trip_data:
+                self.add_preference("interests", trip_data[key])
+        for key in ("budget", "cost"):
+            if key in trip_data:
+                self.add_preference("budget", trip_data[key])
+                break
+        if "start_time" in trip_data:
+            self.add_start_time(str(trip_data["start_time"]))
+
+    def normalized_weights(self) -> Dict[str, float]:
+        """
+        Returns the category weights scaled to sum to 1.
+        """
+        total = sum(self.category_weights.values())
+        return {category: weight / total for category, weight in self.category_weights.items()} if total else {}
+
+    def budget_percentile(self, fraction: float) -> Optional[float]:
+        """
+        Estimates a budget percentile (e.g., 0.5 for the median) as the upper edge of the bucket containing it.
+        """
+        total = sum(self.budget_histogram)
+        if not total:
+            return None
+        seen = 0
+        for bucket, count in enumerate(self.budget_histogram):
+            seen += count
+            if seen >= fraction * total:
+                return float(BUDGET_BUCKET_EDGES[bucket]) if bucket < len(BUDGET_BUCKET_EDGES) else self.max_budget
+        return self.max_budget
+
+    def typical_start_time(self) -> Optional[str]:
+        """
+        Returns the most frequent start hour as 'HH:00', or None if no start time was observed.
+        """
+        if not any(self.start_hour_histogram):
+            return None
+        hour = max(range(24), key=lambda h: self.start_hour_histogram[h])
+        return f"{hour:02d}:00"
+
+    def summary(self) -> Dict:
+        """
+        Returns the profile in the form used for ranking and display.
+        """
+        return {
+            "category_weights": self.normalized_weights(),
+            "budget_percentiles": {
+                "p25": self.budget_percentile(0.25),
+                "p50": self.budget_percentile(0.5),
+                "p75": self.budget_percentile(0.75),
+            },
+            "typical_start_time": self.typical_start_time(),
+            "observations": self.observations,
+        }
@@ -1,23 +1,206 @@
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from datetime import date
+from contextlib import asynccontextmanager, AsyncExitStack
+from fastapi import FastAPI, HTTPException, Depends, Request, Header
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from agents.user_interaction_agent import UserInteractionAgent
 from agents.itinerary_generator import ItineraryGenerator
 from agents.optimization_agent import OptimizationAgent
 from agents.weather_agent import WeatherAgent
 from agents.memory_agent import MemoryAgent
+from agents.memory_write_buffer import WriteBufferFullError
 from agents.map_generator import MapGenerator
-from typing import List, Optional
+from database.schemas.itinerary import (
+    ItineraryEvent, ItineraryStageEvent, RouteStageEvent, WeatherStageEvent, MapStageEvent, DoneEvent, ErrorEvent,
+    merge_events,
+)
+from utils.config import (
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, WEATHER_API_KEY, HUGGINGFACE_MODEL_NAME,
+    EMBEDDING_MODEL_NAME, INTEREST_MATCH_MIN_SCORE, INTEREST_MATCH_TOP_K, EMBEDDINGS_FLOAT16, EMBEDDINGS_ANN_THRESHOLD,
+    CHAT_MAX_PROMPT_TOKENS, CHAT_SUMMARY_TOKENS, CHAT_PREFERENCE_TOKENS, CHAT_REPLY_TOKENS, CHAT_MAX_CONVERSATIONS,
+    COMPLETE_ITINERARY_DEADLINE, WEATHER_REQUEST_TIMEOUT,
+    SPECULATION_ENABLED, SPECULATION_QUEUE_SIZE, SPECULATION_WORKERS, SPECULATION_TTL, MAX_ROUTE_ALTERNATIVES, ROUTE_ALTERNATIVE_MIN_DIFFERENCE,
+    ROUTING_DATA_DIR, ROUTING_CACHE_DIR,
+    ATTRACTION_CATALOG_DIR, ATTRACTION_CATALOG_CHECK_INTERVAL, COVISITATION_PATH, COVISITATION_CHECK_INTERVAL,
+    GAZETTEER_PATH, PLACE_SUGGESTIONS_LIMIT,
+    ADMISSION_MAX_CONCURRENT, ADMISSION_QUEUE_SIZE, ADMISSION_MAX_WAIT, ADMISSION_PLANNING_CONCURRENCY,
+    ADMISSION_CHAT_CONCURRENCY,
+    MEMORY_WRITE_BEHIND, MEMORY_WRITE_QUEUE_SIZE, MEMORY_WRITE_BATCH_SIZE, MEMORY_WRITE_FLUSH_INTERVAL,
+    MEMORY_WRITE_MAX_ATTEMPTS,
+    TRACE_SLOW_REQUEST_MS, TRACE_BUFFER_SIZE, LOOP_STALL_THRESHOLD_MS, PROFILER_MAX_SECONDS,
+)
+from utils.conversation import ConversationManager
+from utils.embeddings import HuggingFaceEmbedder, InterestMatcher
+from utils.openai_integration import HuggingFaceIntegration
+from utils.shared_catalog import SharedCatalog
+from utils.covisitation import CoVisitationIndex
+from utils.gazetteer import Gazetteer, Place
+from utils.deadline import Deadline
+from utils.routing import RoutingEngine
+from utils.singleflight import SingleFlight
+from utils.speculation import Speculator
+from utils.admission import AdmissionController, AdmissionRejected, RequestClass
+from utils.tracing import Tracer
+from utils.profiling import SamplingProfiler, LoopStallDetector, ProfilerBusyError
+from typing import AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Admission control: cheap reads are served before preference writes, planning and chat when requests queue up.
+# Endpoints not listed here (health and admin) are never queued.
+admission = AdmissionController(
+    {
+        "read": RequestClass(priority=0, max_concurrent=ADMISSION_MAX_CONCURRENT),
+        "preferences": RequestClass(priority=1, max_concurrent=ADMISSION_MAX_CONCURRENT),
+        "planning": RequestClass(priority=2, max_concurrent=ADMISSION_PLANNING_CONCURRENCY),
+        "chat": RequestClass(priority=3, max_concurrent=ADMISSION_CHAT_CONCURRENCY),
+    },
+    max_concurrent=ADMISSION_MAX_CONCURRENT,
+    max_queue=ADMISSION_QUEUE_SIZE,
+    max_wait=ADMISSION_MAX_WAIT,
+)
+ENDPOINT_CLASSES = {
+    "/weather": "read",
+    "/generate_map": "read",
+    "/places/autocomplete": "read",
+    "/users/": "read",
+    "/collect_preferences": "preferences",
+    "/store_preference": "preferences",
+    "/generate_itinerary": "planning",
+    "/optimize_route": "planning",
+    "/generate_complete_itinerary": "planning",
+    "/generate_complete_itinerary/stream": "planning",
+    "/chat": "chat",
+}
+
+def request_class(path: str) -> Optional[str]:
+    """
+    Returns the admission class of a request path, or None if the path is not admission-controlled.
+    """
+    for prefix, name in ENDPOINT_CLASSES.items():
+        if path == prefix or (prefix.endswith("/") and path.startswith(prefix)):
+            return name
+    return None
+
+# Identical planning requests in flight at the same time are computed once
+itinerary_flights = SingleFlight("generate_itinerary")
+complete_itinerary_flights = SingleFlight("generate_complete_itinerary")
+
+# Request tracing and diagnostics
+tracer = Tracer(slow_threshold_ms=TRACE_SLOW_REQUEST_MS, buffer_size=TRACE_BUFFER_SIZE)
+profiler = SamplingProfiler()
+loop_stall_detector = LoopStallDetector(threshold_ms=LOOP_STALL_THRESHOLD_MS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates the agents once per worker when the app starts and releases them on shutdown.
+    Agents are kept on app.state and handed to endpoints through the get_* dependencies below,
+    so tests can swap them with app.dependency_overrides without any live service.
+    """
+    loop_stall_detector.start(asyncio.get_running_loop())
+
+    memory_agent = MemoryAgent(
+        NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+        write_behind=MEMORY_WRITE_BEHIND,
+        max_queue_size=MEMORY_WRITE_QUEUE_SIZE,
+        batch_size=MEMORY_WRITE_BATCH_SIZE,
+        flush_interval=MEMORY_WRITE_FLUSH_INTERVAL,
+        max_attempts=MEMORY_WRITE_MAX_ATTEMPTS,
+    )
+    app.state.memory_agent = memory_agent
+    app.state.user_interaction_agent = UserInteractionAgent(memory_agent)
+    # Attraction embeddings are computed per city on first use; the encoder model loads lazily as well
+    interest_matcher = InterestMatcher(
+        HuggingFaceEmbedder(EMBEDDING_MODEL_NAME),
+        min_score=INTEREST_MATCH_MIN_SCORE,
+        top_k=INTEREST_MATCH_TOP_K,
+        use_float16=EMBEDDINGS_FLOAT16,
+        ann_threshold=EMBEDDINGS_ANN_THRESHOLD,
+    ) if EMBEDDING_MODEL_NAME else None
+    if interest_matcher:
+        try:
+            HuggingFaceEmbedder.check_available()
+        except ImportError as e:
+            # Without the model's libraries interests are matched to categories exactly, as before
+            logger.warning("Semantic interest matching disabled: %s", e)
+            interest_matcher = None
+    # Workers map the same published catalog read-only instead of each holding their own copy
+    catalog = SharedCatalog(ATTRACTION_CATALOG_DIR, ATTRACTION_CATALOG_CHECK_INTERVAL) if ATTRACTION_CATALOG_DIR else None
+    # Attractions often visited together are ranked first; the batch job's file is picked up when it changes
+    covisitation = CoVisitationIndex(COVISITATION_PATH, COVISITATION_CHECK_INTERVAL) if COVISITATION_PATH else None
+    app.state.itinerary_generator = ItineraryGenerator(interest_matcher, catalog, covisitation, profiles=memory_agent)
+    # Place names for typeahead and starting points are matched in memory, without a geocoding service
+    app.state.gazetteer = Gazetteer.from_csv(GAZETTEER_PATH) if GAZETTEER_PATH else Gazetteer.from_catalog(
+        app.state.itinerary_generator.catalog)
+    # Street-graph routing for cities with an extract under ROUTING_DATA_DIR
+    routing_engine = RoutingEngine(ROUTING_DATA_DIR, ROUTING_CACHE_DIR or None) if ROUTING_DATA_DIR else None
+    app.state.optimization_agent = OptimizationAgent(routing_engine)
+    app.state.weather_agent = WeatherAgent(WEATHER_API_KEY, request_timeout=WEATHER_REQUEST_TIMEOUT)
+    app.state.map_generator = MapGenerator()
+    # The model is loaded on the first chat request, not at startup
+    chat_model = HuggingFaceIntegration(HUGGINGFACE_MODEL_NAME)
+    app.state.chat_model = chat_model
+    app.state.conversations = ConversationManager(
+        count_tokens=chat_model.count_tokens,
+        max_prompt_tokens=CHAT_MAX_PROMPT_TOKENS,
+        summary_tokens=CHAT_SUMMARY_TOKENS,
+        preference_tokens=CHAT_PREFERENCE_TOKENS,
+        max_conversations=CHAT_MAX_CONVERSATIONS,
+    )
+    # Complete itineraries are precomputed in the background when preferences are collected
+    app.state.speculator = Speculator(
+        "generate_complete_itinerary",
+        max_queue=SPECULATION_QUEUE_SIZE,
+        workers=SPECULATION_WORKERS,
+        ttl=SPECULATION_TTL,
+    ) if SPECULATION_ENABLED else None
+    try:
+        yield
+    finally:
+        if app.state.speculator:
+            await app.state.speculator.close()
+        memory_agent.close()
+        loop_stall_detector.stop()
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Agent dependencies
+def get_memory_agent(request: Request) -> MemoryAgent:
+    return request.app.state.memory_agent
+
+def get_user_interaction_agent(request: Request) -> UserInteractionAgent:
+    return request.app.state.user_interaction_agent
+
+def get_itinerary_generator(request: Request) -> ItineraryGenerator:
+    return request.app.state.itinerary_generator
+
+def get_optimization_agent(request: Request) -> OptimizationAgent:
+    return request.app.state.optimization_agent
+
+def get_weather_agent(request: Request) -> WeatherAgent:
+    return request.app.state.weather_agent
+
+def get_map_generator(request: Request) -> MapGenerator:
+    return request.app.state.map_generator
+
+def get_gazetteer(request: Request) -> Gazetteer:
+    return request.app.state.gazetteer
 
-# Initialize Agents
-user_interaction_agent = UserInteractionAgent()
-itinerary_generator = ItineraryGenerator()
-optimization_agent = OptimizationAgent()
-weather_agent = WeatherAgent()
-memory_agent = MemoryAgent()
-map_generator = MapGenerator()
+def get_speculator(request: Request) -> Optional[Speculator]:
+    return request.app.state.speculator
+
+def get_chat_model(request: Request) -> HuggingFaceIntegration:
+    return request.app.state.chat_model
+
+def get_conversations(request: Request) -> ConversationManager:
+    return request.app.state.conversations
 
 # Define data models for API requests
 class UserPreferences(BaseModel):
@@ -27,51 +210,192 @@ class UserPreferences(BaseModel):
     budget: float
     interests: List[str]
     starting_point: Optional[str] = None
+    date: Optional[str] = None  # Trip date in 'YYYY-MM-DD' format, defaults to today
+    user_id: Optional[str] = None  # Returned by /collect_preferences; omit to register a new user
+
+    def trip_date(self) -> str:
+        return self.date or date.today().isoformat()
+
+    def fingerprint(self) -> str:
+        """
+        Returns a hash identifying equivalent preferences: interests are compared as a case-
+        insensitive set and the date is resolved, so requests that plan the same day match.
+        The user is part of it, as their interest profile orders the attractions.
+        """
+        canonical = self.dict()
+        canonical["city"] = self.city.strip()
+        canonical["interests"] = sorted({interest.strip().lower() for interest in self.interests})
+        canonical["date"] = self.trip_date()
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
 
 class ItineraryItem(BaseModel):
     name: str
-    time: str
-    transport: str
+    start_time: str
+    end_time: str
+    category: Optional[str] = None
+    duration: Optional[int] = None
+    cost: Optional[float] = None
+    transport: Optional[str] = None
+    travel_cost: Optional[float] = None
+    distance_from_previous: Optional[float] = None
+    travel_minutes: Optional[float] = None
+    outdoor: Optional[bool] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    weather: Optional[dict] = None
+    weather_warning: Optional[str] = None
     status: Optional[str] = None
 
+class ChatRequest(BaseModel):
+    message: str
+    conversation_id: Optional[str] = None  # Omit to start a new conversation
+    user_id: Optional[str] = None  # Used to load the user's stored preferences into the context
+
 class ItineraryResponse(BaseModel):
-    itinerary: List[ItineraryItem]
+    itinerary: Optional[List[ItineraryItem]] = None
     optimized_route: Optional[List[ItineraryItem]] = None
     weather_info: Optional[dict] = None
     map_link: Optional[str] = None
+    # Stages that returned partial results to meet the request deadline, with the reason
+    degraded: Optional[Dict[str, str]] = None
+    # Other diverse orders of the optimized route, best first
+    alternatives: Optional[List[List[ItineraryItem]]] = None
+    # Where the optimized route leaves from, if a starting point was given and found
+    starting_point: Optional[dict] = None
+
+async def release_after(body: AsyncIterator[bytes], release) -> AsyncIterator[bytes]:
+    """
+    Passes a response body through and calls release() once it has been sent or abandoned.
+    """
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        await release()
+
+# Run expensive endpoints only when there is capacity; shed the rest early with 503 + Retry-After
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    name = request_class(request.url.path)
+    if name is None:
+        return await call_next(request)
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(admission.admit(name))
+    except AdmissionRejected as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": str(e.retry_after)})
+    try:
+        response = await call_next(request)
+    except BaseException:
+        await slot.aclose()
+        raise
+    # call_next returns once the headers are ready; a streamed body is still being computed, so the slot is held until it is sent
+    response.body_iterator = release_after(response.body_iterator, slot.aclose)
+    return response
+
+# Wrap every request in a trace so agent calls record their spans under it
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with tracer.trace(f"{request.method} {request.url.path}") as trace:
+        response = await call_next(request)
+    response.headers["X-Trace-Id"] = trace.trace_id
+    return response
+
+def write_buffer_full(error: WriteBufferFullError) -> HTTPException:
+    """
+    Turns write-buffer backpressure into a 503 that tells the client when to retry.
+    """
+    retry_after = max(1, round(MEMORY_WRITE_FLUSH_INTERVAL))
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(retry_after)})
 
 # Endpoint to collect user preferences
 @app.post("/collect_preferences")
-async def collect_preferences(preferences: UserPreferences):
+async def collect_preferences(preferences: UserPreferences,
+                              user_interaction_agent: UserInteractionAgent = Depends(get_user_interaction_agent),
+                              itinerary_generator: ItineraryGenerator = Depends(get_itinerary_generator),
+                              optimization_agent: OptimizationAgent = Depends(get_optimization_agent),
+                              weather_agent: WeatherAgent = Depends(get_weather_agent),
+                              map_generator: MapGenerator = Depends(get_map_generator),
+                              gazetteer: Gazetteer = Depends(get_gazetteer),
+                              speculator: Optional[Speculator] = Depends(get_speculator)):
     try:
-        # Save preferences in memory
-        memory_agent.store_preferences(preferences)
-        user_interaction_agent.collect_preferences(preferences)
-        return {"message": "Preferences collected successfully!"}
+        # Save preferences in memory, under a new user ID unless the request carries one
+        result = user_interaction_agent.collect_preferences(preferences)
+        preferences = preferences.copy(update={"user_id": result["user_id"]})
+
+        # The complete itinerary is usually requested next: start planning it now, unless requests are already queueing
+        if speculator and admission.queue_depth() == 0:
+            speculator.submit(preferences.fingerprint(), lambda: plan_complete_itinerary(
+                preferences, Deadline(COMPLETE_ITINERARY_DEADLINE), itinerary_generator, optimization_agent,
+                weather_agent, map_generator, gazetteer))
+        return {"message": "Preferences collected successfully!", "user_id": result["user_id"]}
+    except WriteBufferFullError as e:
+        raise write_buffer_full(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Endpoint to generate an initial itinerary based on user preferences
 @app.post("/generate_itinerary", response_model=ItineraryResponse)
-async def generate_itinerary(preferences: UserPreferences):
+async def generate_itinerary(preferences: UserPreferences,
+                             itinerary_generator: ItineraryGenerator = Depends(get_itinerary_generator)):
     try:
-        itinerary = itinerary_generator.generate_itinerary(preferences.city, preferences.interests)
+        itinerary = await itinerary_flights.do(preferences.fingerprint(), lambda: asyncio.to_thread(
+            itinerary_generator.generate_itinerary, preferences.city, preferences.interests, preferences.start_time,
+            preferences.user_id))
         return {"itinerary": itinerary}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def resolve_starting_point(preferences: UserPreferences, gazetteer: Gazetteer, degraded: Dict[str, str]) -> Optional[Place]:
+    """
+    Looks up the preferences' starting point in the gazetteer. A starting point that cannot be
+    found is reported in `degraded`, and the route then starts at its first stop as before.
+    """
+    if not preferences.starting_point:
+        return None
+    place = gazetteer.resolve(preferences.starting_point, preferences.city)
+    if place is None:
+        degraded["starting_point"] = f"Unknown starting point: {preferences.starting_point}"
+    return place
+
 # Endpoint to optimize the itinerary based on user budget and preferences
 @app.post("/optimize_route", response_model=ItineraryResponse)
-async def optimize_route(preferences: UserPreferences, itinerary: List[ItineraryItem]):
+async def optimize_route(preferences: UserPreferences, itinerary: List[ItineraryItem], alternatives: int = 0,
+                         optimization_agent: OptimizationAgent = Depends(get_optimization_agent),
+                         gazetteer: Gazetteer = Depends(get_gazetteer)):
+    try:
+        stops = [item.dict(exclude_none=True) for item in itinerary]
+        degraded = {}
+        place = resolve_starting_point(preferences, gazetteer, degraded)
+        start = (place.latitude, place.longitude) if place else None
+        response = {"starting_point": place.to_dict() if place else None, "degraded": degraded or None}
+        # The route search is CPU-bound, so it runs off the event loop
+        if alternatives <= 0:
+            optimized_route = await asyncio.to_thread(
+                optimization_agent.optimize_route, stops, preferences.budget, city=preferences.city, start=start)
+            return {"optimized_route": optimized_route, **response}
+
+        # One search yields the best route and up to `alternatives` diverse other options
+        routes = await asyncio.to_thread(
+            optimization_agent.optimize_alternatives, stops, preferences.budget, k=min(alternatives, MAX_ROUTE_ALTERNATIVES) + 1,
+            min_difference=ROUTE_ALTERNATIVE_MIN_DIFFERENCE, city=preferences.city, start=start)
+        return {"optimized_route": routes[0], "alternatives": routes[1:], **response}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint suggesting cities, neighborhoods and landmarks for what the user has typed so far
+@app.get("/places/autocomplete")
+async def autocomplete_places(q: str, city: Optional[str] = None, kind: Optional[str] = None,
+                              limit: int = PLACE_SUGGESTIONS_LIMIT, gazetteer: Gazetteer = Depends(get_gazetteer)):
     try:
-        optimized_route = optimization_agent.optimize_route(itinerary, preferences.budget)
-        return {"optimized_route": optimized_route}
+        places = gazetteer.search(q, limit=max(1, min(limit, 50)), city=city, kind=kind)
+        return {"query": q, "places": [place.to_dict() for place in places]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Endpoint to fetch weather information for the selected city and date
 @app.get("/weather")
-async def get_weather(city: str, date: str):
+async def get_weather(city: str, date: str, weather_agent: WeatherAgent = Depends(get_weather_agent)):
     try:
         weather_info = weather_agent.fetch_weather(city, date)
         return {"weather_info": weather_info}
@@ -80,7 +404,7 @@ async def get_weather(city: str, date: str):
 
 # Endpoint to generate a map based on itinerary locations
 @app.post("/generate_map")
-async def generate_map(locations: List[tuple]):
+async def generate_map(locations: List[tuple], map_generator: MapGenerator = Depends(get_map_generator)):
     try:
         map_link = map_generator.create_map(locations)
         return {"map_link": map_link}
@@ -89,37 +413,175 @@ async def generate_map(locations: List[tuple]):
 
 # Endpoint to store additional user preferences dynamically
 @app.post("/store_preference")
-async def store_preference(user_id: str, key: str, value: str):
+async def store_preference(user_id: str, key: str, value: str,
+                           memory_agent: MemoryAgent = Depends(get_memory_agent)):
     try:
         memory_agent.store_preference(user_id, key, value)
         return {"message": "Preference stored successfully"}
+    except WriteBufferFullError as e:
+        raise write_buffer_full(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint to read a user's materialized interest profile
+@app.get("/users/{user_id}/profile")
+async def get_user_profile(user_id: str,
+                           user_interaction_agent: UserInteractionAgent = Depends(get_user_interaction_agent)):
+    try:
+        return user_interaction_agent.retrieve_profile(user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Endpoint to generate a complete itinerary with weather info and map link
 @app.post("/generate_complete_itinerary", response_model=ItineraryResponse)
-async def generate_complete_itinerary(preferences: UserPreferences):
+async def generate_complete_itinerary(preferences: UserPreferences,
+                                      itinerary_generator: ItineraryGenerator = Depends(get_itinerary_generator),
+                                      optimization_agent: OptimizationAgent = Depends(get_optimization_agent),
+                                      weather_agent: WeatherAgent = Depends(get_weather_agent),
+                                      map_generator: MapGenerator = Depends(get_map_generator),
+                                      gazetteer: Gazetteer = Depends(get_gazetteer),
+                                      speculator: Optional[Speculator] = Depends(get_speculator),
+                                      x_deadline_ms: Optional[float] = Header(None)):
     try:
-        # Step 1: Generate initial itinerary
-        itinerary = itinerary_generator.generate_itinerary(preferences.city, preferences.interests)
+        # The whole request shares one deadline; a client may ask for a tighter one than the default
+        budget = COMPLETE_ITINERARY_DEADLINE
+        if x_deadline_ms:
+            budget = min(budget, x_deadline_ms / 1000)
+
+        async def plan() -> dict:
+            events = await claim_precomputed(speculator, preferences) or await plan_complete_itinerary(
+                preferences, Deadline(budget), itinerary_generator, optimization_agent, weather_agent, map_generator, gazetteer)
+            return merge_events(events)
+
+        # Concurrent requests with the same preferences and deadline share a single computation
+        return await complete_itinerary_flights.do(f"{preferences.fingerprint()}:{budget}", plan)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint streaming the complete itinerary section by section as each stage finishes: newline-delimited JSON
+# events by default, server-sent events if the client accepts text/event-stream (see database/schemas/itinerary.py)
+@app.post("/generate_complete_itinerary/stream")
+async def stream_complete_itinerary(preferences: UserPreferences,
+                                    itinerary_generator: ItineraryGenerator = Depends(get_itinerary_generator),
+                                    optimization_agent: OptimizationAgent = Depends(get_optimization_agent),
+                                    weather_agent: WeatherAgent = Depends(get_weather_agent),
+                                    map_generator: MapGenerator = Depends(get_map_generator),
+                                    gazetteer: Gazetteer = Depends(get_gazetteer),
+                                    speculator: Optional[Speculator] = Depends(get_speculator),
+                                    accept: Optional[str] = Header(None),
+                                    x_deadline_ms: Optional[float] = Header(None)):
+    budget = COMPLETE_ITINERARY_DEADLINE
+    if x_deadline_ms:
+        budget = min(budget, x_deadline_ms / 1000)
+    deadline = Deadline(budget)
+    server_sent = "text/event-stream" in (accept or "")
 
-        # Step 2: Optimize the route based on budget
-        optimized_route = optimization_agent.optimize_route(itinerary, preferences.budget)
+    async def events() -> AsyncIterator[ItineraryEvent]:
+        try:
+            precomputed = await claim_precomputed(speculator, preferences)
+            if precomputed:
+                for event in precomputed:
+                    yield event.copy(update={"elapsed_ms": round(deadline.elapsed() * 1000, 1)})
+                return
+            async for event in complete_itinerary_stages(preferences, deadline, itinerary_generator, optimization_agent,
+                                                         weather_agent, map_generator, gazetteer):
+                yield event
+        except Exception as e:
+            # The status line has already been sent, so a failure ends the stream with an error event
+            yield ErrorEvent(detail=str(e), elapsed_ms=round(deadline.elapsed() * 1000, 1))
 
-        # Step 3: Fetch weather information
-        weather_info = weather_agent.fetch_weather(preferences.city, preferences.start_time.split(" ")[0])
+    async def body() -> AsyncIterator[str]:
+        async for event in events():
+            yield f"event: {event.event}\ndata: {event.json()}\n\n" if server_sent else event.json() + "\n"
 
-        # Step 4: Generate map for the optimized route
-        locations = [(item['latitude'], item['longitude']) for item in optimized_route]
+    return StreamingResponse(body(), media_type="text/event-stream" if server_sent else "application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def claim_precomputed(speculator: Optional[Speculator], preferences: UserPreferences) -> Optional[List[ItineraryEvent]]:
+    """
+    Picks up the itinerary precomputed when these preferences were collected, waiting for it if it
+    is still running. Returns its events, or None if there is none or it failed.
+    """
+    precomputed = speculator.claim(preferences.fingerprint()) if speculator else None
+    if precomputed is None:
+        return None
+    await asyncio.wait({precomputed})
+    if precomputed.cancelled() or precomputed.exception() is not None:
+        return None
+    return precomputed.result()
+
+async def complete_itinerary_stages(preferences: UserPreferences, deadline: Deadline, itinerary_generator: ItineraryGenerator,
+                                    optimization_agent: OptimizationAgent, weather_agent: WeatherAgent,
+                                    map_generator: MapGenerator, gazetteer: Gazetteer) -> AsyncIterator[ItineraryEvent]:
+    """
+    Runs every planning stage for /generate_complete_itinerary within the deadline, yielding each
+    section as soon as its stage has finished and a final "done" event.
+    """
+    elapsed_ms = lambda: round(deadline.elapsed() * 1000, 1)
+
+    # Step 1: Generate initial itinerary
+    itinerary = await asyncio.to_thread(itinerary_generator.generate_itinerary, preferences.city, preferences.interests,
+                                        preferences.start_time, preferences.user_id, deadline)
+    yield ItineraryStageEvent(itinerary=itinerary, elapsed_ms=elapsed_ms())
+
+    # Step 2: Optimize the route based on budget (on copies, so the raw itinerary stays untouched),
+    # leaving from the starting point if one was given; the search returns its best order so far if the deadline passes
+    place = resolve_starting_point(preferences, gazetteer, deadline.degraded)
+    optimized_route = await asyncio.to_thread(optimization_agent.optimize_route, [dict(stop) for stop in itinerary],
+                                              preferences.budget, deadline, preferences.city,
+                                              (place.latitude, place.longitude) if place else None)
+    yield RouteStageEvent(optimized_route=optimized_route, starting_point=place.to_dict() if place else None,
+                          elapsed_ms=elapsed_ms())
+
+    # Step 3: Fetch weather information for the day and for each stop's start time (one forecast fetch serves both).
+    # Weather is optional: without a forecast in time the route is returned without it
+    weather_info = await asyncio.to_thread(weather_agent.fetch_weather, preferences.city, preferences.trip_date(), deadline)
+    route_with_weather = None
+    if "weather" not in deadline.degraded:
+        route_with_weather = weather_agent.fetch_weather_for_itinerary(
+            preferences.city, preferences.trip_date(), optimized_route, deadline)
+    yield WeatherStageEvent(weather_info=weather_info, optimized_route=route_with_weather, elapsed_ms=elapsed_ms())
+
+    # Step 4: Generate map for the optimized route, unless the deadline has already passed
+    map_link = None
+    if deadline.expired():
+        deadline.mark_degraded("map", "Skipped: request deadline exceeded")
+    else:
+        locations = [(item['latitude'], item['longitude']) for item in optimized_route
+                     if item.get('latitude') is not None and item.get('longitude') is not None]
         map_link = map_generator.create_map(locations)
+    yield MapStageEvent(map_link=map_link, elapsed_ms=elapsed_ms())
+
+    # Step 5: Report the stages that returned partial results
+    yield DoneEvent(degraded=deadline.degraded or None, elapsed_ms=elapsed_ms())
+
+async def plan_complete_itinerary(preferences: UserPreferences, deadline: Deadline, itinerary_generator: ItineraryGenerator,
+                                  optimization_agent: OptimizationAgent, weather_agent: WeatherAgent,
+                                  map_generator: MapGenerator, gazetteer: Gazetteer) -> List[ItineraryEvent]:
+    """
+    Runs every planning stage for /generate_complete_itinerary within the deadline and returns their
+    events; merge_events combines them into the complete itinerary.
+    """
+    return [event async for event in complete_itinerary_stages(
+        preferences, deadline, itinerary_generator, optimization_agent, weather_agent, map_generator, gazetteer)]
 
-        # Step 5: Return the complete itinerary response
-        return {
-            "itinerary": itinerary,
-            "optimized_route": optimized_route,
-            "weather_info": weather_info,
-            "map_link": map_link
-        }
+# Endpoint to chat with the assistant; the server keeps a token-budgeted context per conversation
+@app.post("/chat")
+async def chat(chat_request: ChatRequest,
+               chat_model: HuggingFaceIntegration = Depends(get_chat_model),
+               conversations: ConversationManager = Depends(get_conversations),
+               memory_agent: MemoryAgent = Depends(get_memory_agent)):
+    try:
+        conversation_id = chat_request.conversation_id or uuid.uuid4().hex
+        load_preferences = lambda: memory_agent.fetch_preferences(chat_request.user_id) if chat_request.user_id else None
+
+        # Model loading, tokenizing and generation are CPU-bound, so they run off the event loop
+        prompt, prompt_tokens = await asyncio.to_thread(
+            conversations.build_prompt, conversation_id, chat_request.message, load_preferences)
+        reply = await asyncio.to_thread(chat_model.generate_reply, prompt, CHAT_REPLY_TOKENS)
+        conversations.record_reply(conversation_id, reply)
+
+        return {"conversation_id": conversation_id, "response": reply, "prompt_tokens": prompt_tokens}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -127,3 +589,29 @@ async def generate_complete_itinerary(preferences: UserPreferences):
 @app.get("/health")
 async def health_check():
     return {"status": "Healthy"}
+
+# Admin endpoint with service metrics
+@app.get("/admin/metrics")
+async def get_metrics(request: Request):
+    speculator = getattr(request.app.state, "speculator", None)
+    return {
+        "singleflight": {flights.name: flights.stats() for flights in (itinerary_flights, complete_itinerary_flights)},
+        "admission": admission.stats(),
+        "speculation": speculator.stats() if speculator else None,
+    }
+
+# Admin endpoint listing the most recent slow request traces
+@app.get("/admin/traces/slow")
+async def get_slow_traces():
+    return {"threshold_ms": tracer.slow_threshold_ms, "traces": tracer.slow_traces()}
+
+# Admin endpoint that samples all threads for N seconds and returns a flamegraph-compatible collapsed-stack dump
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def run_profiler(seconds: float = 10.0):
+    if not 0 < seconds <= PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {PROFILER_MAX_SECONDS}")
+    try:
+        # Sample from a worker thread so the event loop keeps serving the traffic being profiled
+        return await asyncio.to_thread(profiler.profile, seconds)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,170 @@
+import asyncio
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed because capacity and the wait queue are exhausted."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RequestClass(NamedTuple):
+    # Lower numbers are served first when requests are queued
+    priority: int
+    # Maximum requests of this class running at once, on top of the global limit
+    max_concurrent: int
+
+
+class _Waiter:
+    __slots__ = ("request_class", "priority", "sequence", "future", "enqueued_at", "granted")
+
+    def __init__(self, request_class: str, priority: int, sequence: int, future: asyncio.Future):
+        self.request_class = request_class
+        self.priority = priority
+        self.sequence = sequence
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    Limits how many requests run at once, overall and per request class, and queues the rest in
+    a single bounded queue ordered by class priority. A request that cannot start waits at most
+    max_wait seconds; when the queue is full the lowest-priority, most recent waiter is shed,
+    so under overload cheap high-priority requests keep flowing and expensive ones are turned
+    away early with a Retry-After hint instead of piling up until they all time out.
+
+    All methods must be called from the event loop thread.
+
+    Attributes:
+        max_concurrent (int): Requests allowed to run at once across all classes.
+        max_queue (int): Requests allowed to wait for a slot.
+        max_wait (float): Longest time in seconds a request waits before it is shed.
+        classes (Dict[str, RequestClass]): Priority and concurrency limit of each request class.
+    """
+
+    def __init__(self, classes: Dict[str, RequestClass], max_concurrent: int = 32, max_queue: int = 64,
+                 max_wait: float = 2.0, wait_samples: int = 1000):
+        self.classes = classes
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._class_in_flight = {name: 0 for name in classes}
+        self._queue: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._counters = {name: {"admitted": 0, "rejected": 0} for name in classes}
+        self._waits_ms = deque(maxlen=wait_samples)
+        self._service_time = 0.0
+
+    @asynccontextmanager
+    async def admit(self, request_class: str):
+        """
+        Holds a slot for the duration of the block, waiting for one if necessary.
+
+        Raises:
+            AdmissionRejected: If the request was shed.
+        """
+        await self.acquire(request_class)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            # Moving average of how long a request holds its slot, for the Retry-After estimate
+            self._service_time += 0.1 * ((time.monotonic() - started) - self._service_time)
+            self.release(request_class)
+
+    async def acquire(self, request_class: str):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(request_class, self.classes[request_class].priority, next(self._sequence), loop.create_future())
+        self._queue.append(waiter)
+        self._queue.sort(key=lambda w: (w.priority, w.sequence))
+        self._dispatch()
+
+        if not waiter.granted and len(self._queue) > self.max_queue:
+            # Shed the least important waiter; it may be the new request itself
+            victim = max(self._queue, key=lambda w: (w.priority, w.sequence))
+            self._queue.remove(victim)
+            victim.future.set_exception(self._rejection(victim.request_class, "wait queue is full"))
+
+        try:
+            await asyncio.wait_for(waiter.future, self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.granted:
+                return  # the slot arrived just as the wait timed out
+            self._remove(waiter)
+            raise self._rejection(request_class, f"no capacity within {self.max_wait:.1f} s")
+        except asyncio.CancelledError:
+            if waiter.granted:
+                self.release(request_class)
+            else:
+                self._remove(waiter)
+            raise
+        finally:
+            if waiter.granted:
+                self._waits_ms.append((time.monotonic() - waiter.enqueued_at) * 1000)
+
+    def release(self, request_class: str):
+        self.in_flight -= 1
+        self._class_in_flight[request_class] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        # Hand free slots to the highest-priority waiters whose class is still under its own limit
+        for waiter in list(self._queue):
+            if self.in_flight >= self.max_concurrent:
+                break
+            if waiter.future.done():
+                self._queue.remove(waiter)
+                continue
+            if self._class_in_flight[waiter.request_class] >= self.classes[waiter.request_class].max_concurrent:
+                continue
+            self._queue.remove(waiter)
+            self.in_flight += 1
+            self._class_in_flight[waiter.request_class] += 1
+            self._counters[waiter.request_class]["admitted"] += 1
+            waiter.granted = True
+            waiter.future.set_result(None)
+
+    def _remove(self, waiter: _Waiter):
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+
+    def _rejection(self, request_class: str, reason: str) -> AdmissionRejected:
+        self._counters[request_class]["rejected"] += 1
+        return AdmissionRejected(f"Server busy ({reason})", self.retry_after())
+
+    def retry_after(self) -> int:
+        """
+        Estimates in whole seconds when capacity should be available: the time to work off the
+        current queue at the observed service time.
+        """
+        return max(1, math.ceil(self._service_time * (len(self._queue) + 1) / self.max_concurrent))
+
+    def queue_depth(self, request_class: Optional[str] = None) -> int:
+        return sum(1 for w in self._queue if request_class is None or w.request_class == request_class)
+
+    def stats(self) -> Dict:
+        waits = sorted(self._waits_ms)
+        percentile = lambda fraction: round(waits[min(len(waits) - 1, int(fraction * len(waits)))], 2) if waits else 0.0
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._queue),
+            "wait_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": round(waits[-1], 2) if waits else 0.0},
+            "classes": {
+                name: {
+                    "in_flight": self._class_in_flight[name],
+                    "queued": self.queue_depth(name),
+                    **self._counters[name],
+                }
+                for name in self.classes
+            },
+        }
@@ -9,9 +9,79 @@ NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")  # Default URI for N
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")  # Default user for Neo4j
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")  # Default password for Neo4j
 
+# OpenWeatherMap configuration
+WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "")  # API key for the OpenWeatherMap forecast endpoint
+
 # Hugging Face configuration (no API key required for most models)
 HUGGINGFACE_MODEL_NAME = os.getenv("HUGGINGFACE_MODEL_NAME", "gpt2")  # Default model for text generation
 
+# Semantic interest matching; set EMBEDDING_MODEL_NAME to an empty string to match categories exactly
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+INTEREST_MATCH_MIN_SCORE = float(os.getenv("INTEREST_MATCH_MIN_SCORE", "0.45"))  # Minimum cosine similarity for a match
+INTEREST_MATCH_TOP_K = int(os.getenv("INTEREST_MATCH_TOP_K", "10"))  # Maximum attractions matched per request
+EMBEDDINGS_FLOAT16 = os.getenv("EMBEDDINGS_FLOAT16", "true").lower() == "true"  # Halve the memory of attraction embeddings
+EMBEDDINGS_ANN_THRESHOLD = int(os.getenv("EMBEDDINGS_ANN_THRESHOLD", "5000"))  # Catalog size above which an approximate index is used
+
+# Chat context budget (in model tokens); prompts stay within CHAT_MAX_PROMPT_TOKENS however long the conversation gets
+CHAT_MAX_PROMPT_TOKENS = int(os.getenv("CHAT_MAX_PROMPT_TOKENS", "700"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "150"))  # Share reserved for the rolling summary of older turns
+CHAT_PREFERENCE_TOKENS = int(os.getenv("CHAT_PREFERENCE_TOKENS", "100"))  # Share reserved for the user's stored preferences
+CHAT_REPLY_TOKENS = int(os.getenv("CHAT_REPLY_TOKENS", "120"))  # Maximum tokens generated per reply
+CHAT_MAX_CONVERSATIONS = int(os.getenv("CHAT_MAX_CONVERSATIONS", "1000"))  # Conversations kept in memory per worker
+
+# Latency budget for /generate_complete_itinerary; stages past it return partial results
+COMPLETE_ITINERARY_DEADLINE = float(os.getenv("COMPLETE_ITINERARY_DEADLINE", "3.0"))  # Seconds per request
+WEATHER_REQUEST_TIMEOUT = float(os.getenv("WEATHER_REQUEST_TIMEOUT", "10"))  # Longest wait (s) for the weather service
+
+# Complete itineraries precomputed after /collect_preferences for the /generate_complete_itinerary call that usually follows
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "true").lower() in ("1", "true", "yes")  # Precompute at all
+SPECULATION_QUEUE_SIZE = int(os.getenv("SPECULATION_QUEUE_SIZE", "32"))  # Precomputations waiting; the oldest are dropped
+SPECULATION_WORKERS = int(os.getenv("SPECULATION_WORKERS", "2"))  # Precomputations run at once per worker
+SPECULATION_TTL = float(os.getenv("SPECULATION_TTL", "120"))  # Seconds a precomputed itinerary waits to be claimed
+
+# Admission control of the API endpoints
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))  # Requests running at once per worker
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))  # Requests waiting for a slot before some are shed
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "2.0"))  # Longest wait (s) for a slot before answering 503
+ADMISSION_PLANNING_CONCURRENCY = int(os.getenv("ADMISSION_PLANNING_CONCURRENCY", "8"))  # Itinerary generation/optimization at once
+ADMISSION_CHAT_CONCURRENCY = int(os.getenv("ADMISSION_CHAT_CONCURRENCY", "2"))  # Chat replies generated at once
+
+# Alternative routes returned by /optimize_route
+MAX_ROUTE_ALTERNATIVES = int(os.getenv("MAX_ROUTE_ALTERNATIVES", "4"))  # Upper bound on alternatives per request
+ROUTE_ALTERNATIVE_MIN_DIFFERENCE = float(os.getenv("ROUTE_ALTERNATIVE_MIN_DIFFERENCE", "0.3"))  # Share of legs an alternative must change
+
+# Street-graph routing; each city has nodes.csv and edges.csv under ROUTING_DATA_DIR/<city>, empty disables it
+ROUTING_DATA_DIR = os.getenv("ROUTING_DATA_DIR", "")
+ROUTING_CACHE_DIR = os.getenv("ROUTING_CACHE_DIR", "")  # Where contraction hierarchies and travel-time matrices are persisted
+
+# Offline gazetteer for place typeahead and starting points; empty builds it from the attraction catalog
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "")  # CSV with name,kind,city,latitude,longitude[,importance]
+PLACE_SUGGESTIONS_LIMIT = int(os.getenv("PLACE_SUGGESTIONS_LIMIT", "10"))  # Default number of typeahead suggestions
+
+# Attraction co-visitation neighbors built by scripts/build_covisitation.py; empty keeps the catalog order
+COVISITATION_PATH = os.getenv("COVISITATION_PATH", "")  # Neighbor file read by the backend
+COVISITATION_STATE_PATH = os.getenv("COVISITATION_STATE_PATH", "")  # Counts kept between runs for incremental updates
+COVISITATION_TOP_N = int(os.getenv("COVISITATION_TOP_N", "20"))  # Neighbors kept per attraction
+COVISITATION_MIN_COUNT = int(os.getenv("COVISITATION_MIN_COUNT", "2"))  # Trips a pair must share to be kept
+COVISITATION_CHECK_INTERVAL = float(os.getenv("COVISITATION_CHECK_INTERVAL", "60"))  # Seconds between checks for a new file
+
+# Shared attraction catalog published by scripts/publish_catalog.py; empty uses the built-in attractions_db
+ATTRACTION_CATALOG_DIR = os.getenv("ATTRACTION_CATALOG_DIR", "")  # e.g., /dev/shm/attractions, shared by all workers on a host
+ATTRACTION_CATALOG_CHECK_INTERVAL = float(os.getenv("ATTRACTION_CATALOG_CHECK_INTERVAL", "5"))  # Seconds between checks for a new version
+
+# Write-behind buffering of preference and trip writes
+MEMORY_WRITE_BEHIND = os.getenv("MEMORY_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")  # Flush writes in background batches
+MEMORY_WRITE_QUEUE_SIZE = int(os.getenv("MEMORY_WRITE_QUEUE_SIZE", "10000"))  # Buffered writes before callers are pushed back
+MEMORY_WRITE_BATCH_SIZE = int(os.getenv("MEMORY_WRITE_BATCH_SIZE", "500"))  # Writes per flush transaction
+MEMORY_WRITE_FLUSH_INTERVAL = float(os.getenv("MEMORY_WRITE_FLUSH_INTERVAL", "1.0"))  # Longest time (s) a write stays buffered
+MEMORY_WRITE_MAX_ATTEMPTS = int(os.getenv("MEMORY_WRITE_MAX_ATTEMPTS", "5"))  # Flush attempts before failing writes are dropped
+
+# Tracing and profiling configuration
+TRACE_SLOW_REQUEST_MS = float(os.getenv("TRACE_SLOW_REQUEST_MS", "500"))  # Requests at least this slow keep their trace
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "100"))  # Number of slow traces kept in the ring buffer
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "250"))  # Event-loop blocking time that gets logged
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))  # Upper bound for on-demand profiling sessions
+
 # Ensure that critical configurations are provided
 if not NEO4J_PASSWORD:
     raise ValueError("Neo4j Password is missing! Please set the NEO4J_PASSWORD environment variable.")
@@ -0,0 +1,213 @@
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional, Tuple
+
+
+def approximate_token_count(text: str) -> int:
+    """
+    Rough token estimate (about four characters per token for English text), used when
+    no model tokenizer is available.
+    """
+    return max(1, len(text) // 4) if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """
+    Shortens a text at a word boundary so that it fits in max_tokens.
+
+    Args:
+        text (str): The text to shorten.
+        max_tokens (int): The token budget.
+        count_tokens (Callable): Function returning the token count of a text.
+
+    Returns:
+        str: The text itself if it fits, otherwise its longest fitting word prefix followed by '...'.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    # Binary search on the number of words kept, so long texts need only O(log n) token counts
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid]) + "...") <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + "..." if lo else ""
+
+
+class Conversation:
+    """
+    The server-side state of one chat conversation.
+
+    Attributes:
+        preferences (str): The user's stored preferences, rendered once when the conversation starts.
+        preference_tokens (int): Token count of the rendered preferences.
+        summary (deque): Compacted lines for older turns, each stored with its token count.
+        turns (deque): Recent (role, text, tokens) turns kept verbatim.
+    """
+
+    def __init__(self, preferences: str = "", preference_tokens: int = 0):
+        self.preferences = preferences
+        self.preference_tokens = preference_tokens
+        self.summary = deque()
+        self.summary_tokens = 0
+        self.turns = deque()
+        self.turn_tokens = 0
+        self.lock = threading.Lock()
+
+
+class ConversationManager:
+    """
+    Keeps chat conversations in memory and builds prompts that never exceed a token budget:
+    the user's preferences, a rolling summary of older turns, and as many recent turns as fit,
+    verbatim. Turns that no longer fit are compacted into the summary, and the oldest summary
+    lines are dropped once the summary outgrows its own share of the budget.
+
+    Attributes:
+        count_tokens (Callable): Function returning the token count of a text.
+        max_prompt_tokens (int): Upper bound on the size of every prompt.
+        summary_tokens (int): Share of the budget reserved for the rolling summary.
+        preference_tokens (int): Share of the budget reserved for the user's preferences.
+        max_conversations (int): How many conversations are kept; the least recently used are evicted.
+    """
+
+    SUMMARY_LINE_WORDS = 25
+    SYSTEM_LINE = "You are a helpful assistant planning one-day city tours.\n"
+    SUMMARY_HEADING = "Earlier in the conversation:\n"
+    REPLY_CUE = "Assistant:"
+
+    def __init__(self, count_tokens: Callable[[str], int] = approximate_token_count, max_prompt_tokens: int = 700,
+                 summary_tokens: int = 150, preference_tokens: int = 100, max_conversations: int = 1000):
+        self.count_tokens = count_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_tokens = summary_tokens
+        self.preference_tokens = preference_tokens
+        self.max_conversations = max_conversations
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Token counts of the fixed prompt parts, measured on first use (see _measure_fixed_parts)
+        self._fixed_tokens: Optional[int] = None
+        self._summary_heading_tokens: Optional[int] = None
+        self._max_turn_tokens: Optional[int] = None
+
+    def _measure_fixed_parts(self):
+        # Counting tokens may load the model's tokenizer, so it is done by the first prompt (off the
+        # event loop) rather than in the constructor, which runs in every worker at startup
+        if self._max_turn_tokens is not None:
+            return
+        fixed_tokens = self.count_tokens(self.SYSTEM_LINE) + self.count_tokens(self.REPLY_CUE)
+        summary_heading_tokens = self.count_tokens(self.SUMMARY_HEADING)
+        self._fixed_tokens, self._summary_heading_tokens = fixed_tokens, summary_heading_tokens
+        # Largest single turn that still fits next to a full summary and preferences
+        self._max_turn_tokens = (self.max_prompt_tokens - fixed_tokens - self.preference_tokens
+                                 - summary_heading_tokens - self.summary_tokens - self.count_tokens("Assistant: \n"))
+
+    def get_conversation(self, conversation_id: str,
+                         load_preferences: Callable[[], Optional[Dict[str, str]]] = lambda: None) -> Conversation:
+        """
+        Returns a conversation, creating it (and loading the user's preferences once) if it is new.
+
+        Args:
+            conversation_id (str): The conversation identifier.
+            load_preferences (Callable): Returns the user's stored preferences; only called for new conversations.
+
+        Returns:
+            Conversation: The conversation state.
+        """
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is not None:
+                self._conversations.move_to_end(conversation_id)
+                return conversation
+
+        preferences = load_preferences() or {}
+        rendered = "; ".join(f"{key}: {value}" for key, value in preferences.items())
+        budget = self.preference_tokens - self.count_tokens("User preferences: \n")
+        line = f"User preferences: {truncate_to_tokens(rendered, budget, self.count_tokens)}\n" if rendered else ""
+        conversation = Conversation(line, self.count_tokens(line) if line else 0)
+
+        with self._lock:
+            # Another request may have created it while preferences were loading
+            conversation = self._conversations.setdefault(conversation_id, conversation)
+            self._conversations.move_to_end(conversation_id)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        return conversation
+
+    def build_prompt(self, conversation_id: str, message: str,
+                     load_preferences: Callable[[], Optional[Dict[str, str]]] = lambda: None) -> Tuple[str, int]:
+        """
+        Records a user message and returns the prompt to answer it with.
+
+        Args:
+            conversation_id (str): The conversation identifier.
+            message (str): The new user message.
+            load_preferences (Callable): Returns the user's stored preferences for new conversations.
+
+        Returns:
+            tuple: The prompt and its size in tokens.
+        """
+        self._measure_fixed_parts()
+        conversation = self.get_conversation(conversation_id, load_preferences)
+        with conversation.lock:
+            self._add_turn(conversation, "User", message)
+            prompt = self._render(conversation)
+        return prompt, self.count_tokens(prompt)
+
+    def record_reply(self, conversation_id: str, reply: str):
+        """
+        Records the assistant's reply so it becomes part of the next prompt.
+
+        Args:
+            conversation_id (str): The conversation identifier.
+            reply (str): The generated reply.
+        """
+        self._measure_fixed_parts()
+        conversation = self.get_conversation(conversation_id)
+        with conversation.lock:
+            self._add_turn(conversation, "Assistant", reply)
+
+    def _turn_budget(self, conversation: Conversation) -> int:
+        # Whatever the fixed parts, preferences and summary leave over, from token counts cached per line
+        summary = self._summary_heading_tokens + conversation.summary_tokens if conversation.summary else 0
+        return self.max_prompt_tokens - self._fixed_tokens - conversation.preference_tokens - summary
+
+    def _add_turn(self, conversation: Conversation, role: str, text: str):
+        # A single oversized message is cut so that it fits on its own
+        text = truncate_to_tokens(text.strip(), self._max_turn_tokens, self.count_tokens)
+        tokens = self.count_tokens(f"{role}: {text}\n")
+        conversation.turns.append((role, text, tokens))
+        conversation.turn_tokens += tokens
+
+        while len(conversation.turns) > 1 and conversation.turn_tokens > self._turn_budget(conversation):
+            old_role, old_text, old_tokens = conversation.turns.popleft()
+            conversation.turn_tokens -= old_tokens
+            self._compact(conversation, old_role, old_text)
+
+    def _compact(self, conversation: Conversation, role: str, text: str):
+        # Keep the first sentence of the turn, capped to a few words
+        first_sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        words = first_sentence.split()
+        line = f"{role} said: " + " ".join(words[:self.SUMMARY_LINE_WORDS]) + ("..." if len(words) > self.SUMMARY_LINE_WORDS else "")
+        tokens = self.count_tokens(f"- {line}\n")
+        conversation.summary.append((line, tokens))
+        conversation.summary_tokens += tokens
+
+        while conversation.summary and conversation.summary_tokens > self.summary_tokens:
+            _, dropped_tokens = conversation.summary.popleft()
+            conversation.summary_tokens -= dropped_tokens
+
+    def _header(self, conversation: Conversation) -> str:
+        parts = [self.SYSTEM_LINE, conversation.preferences]
+        if conversation.summary:
+            parts.append(self.SUMMARY_HEADING)
+            parts.extend(f"- {line}\n" for line, _ in conversation.summary)
+        return "".join(parts)
+
+    def _render(self, conversation: Conversation) -> str:
+        turns = "".join(f"{role}: {text}\n" for role, text, _ in conversation.turns)
+        return f"{self._header(conversation)}{turns}{self.REPLY_CUE}"
@@ -0,0 +1,220 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from itertools import combinations
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _write_json(path: str, data: Dict):
+    # Written under a temporary name and swapped in, so readers never see a partial file
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", "w") as output:
+        json.dump(data, output, separators=(",", ":"))
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class CoVisitationCounts:
+    """
+    Sparse co-visitation counts built from trip histories: for every city, how many trips visited
+    each attraction and how many visited each pair of attractions together. Only pairs that
+    actually occur are stored, so memory grows with the trips rather than with the square of
+    the catalog. The counts are the job's state between runs; new trips are simply added to
+    them, and the neighbor lists are recomputed from the updated counts.
+
+    Attributes:
+        trips (int): Trips counted so far.
+    """
+
+    def __init__(self):
+        self.trips = 0
+        self._items: Dict[str, Dict[str, int]] = {}
+        self._pairs: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    def add_trip(self, city: str, attractions: Iterable[str]):
+        """
+        Counts one trip. Attractions visited more than once in the trip are counted once.
+        """
+        visited = sorted({name for name in attractions if name})
+        if not city or not visited:
+            return
+        self.trips += 1
+        items = self._items.setdefault(city, {})
+        pairs = self._pairs.setdefault(city, {})
+        for name in visited:
+            items[name] = items.get(name, 0) + 1
+        for first, second in combinations(visited, 2):
+            row = pairs.setdefault(first, {})
+            row[second] = row.get(second, 0) + 1
+
+    def count(self, city: str, first: str, second: str) -> int:
+        """
+        Returns the number of trips in the city that visited both attractions.
+        """
+        first, second = sorted((first, second))
+        return self._pairs.get(city, {}).get(first, {}).get(second, 0)
+
+    def top_neighbors(self, top_n: int = 20, min_count: int = 1) -> Dict[str, Dict[str, List[Tuple[str, float]]]]:
+        """
+        Returns the top_n neighbors of every attraction, best first, weighted by the cosine of
+        their visit sets (pair count / sqrt(count a * count b)) so popular attractions do not
+        become everyone's neighbor.
+
+        Args:
+            top_n (int): Neighbors kept per attraction.
+            min_count (int): Pairs seen in fewer trips than this are treated as noise and dropped.
+        """
+        neighbors: Dict[str, Dict[str, List[Tuple[str, float]]]] = {}
+        for city, pairs in self._pairs.items():
+            items = self._items[city]
+            candidates: Dict[str, List[Tuple[str, float]]] = {}
+            for first, row in pairs.items():
+                for second, count in row.items():
+                    if count < min_count:
+                        continue
+                    weight = round(count / math.sqrt(items[first] * items[second]), 6)
+                    candidates.setdefault(first, []).append((second, weight))
+                    candidates.setdefault(second, []).append((first, weight))
+            neighbors[city] = {
+                name: sorted(row, key=lambda neighbor: (-neighbor[1], neighbor[0]))[:top_n]
+                for name, row in candidates.items()
+            }
+        return neighbors
+
+    def to_dict(self) -> Dict:
+        return {"trips": self.trips, "items": self._items, "pairs": self._pairs}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CoVisitationCounts":
+        counts = cls()
+        counts.trips = data.get("trips", 0)
+        counts._items = data.get("items", {})
+        counts._pairs = data.get("pairs", {})
+        return counts
+
+    def save(self, path: str):
+        _write_json(path, self.to_dict())
+
+    @classmethod
+    def load(cls, path: str) -> "CoVisitationCounts":
+        """
+        Loads saved counts, or returns empty counts if none were saved yet.
+        """
+        try:
+            with open(path) as source:
+                return cls.from_dict(json.load(source))
+        except FileNotFoundError:
+            return cls()
+
+
+def publish_neighbors(path: str, counts: CoVisitationCounts, top_n: int = 20, min_count: int = 1) -> Dict:
+    """
+    Writes the compact neighbor file read by CoVisitationIndex.
+
+    Args:
+        path (str): The file to (atomically) replace.
+        counts (CoVisitationCounts): Counts to derive the neighbors from.
+        top_n (int): Neighbors kept per attraction.
+        min_count (int): Minimum number of shared trips for a pair to be kept.
+
+    Returns:
+        Dict: The published data.
+    """
+    data = {
+        "built_at": time.time(),
+        "trips": counts.trips,
+        "top_n": top_n,
+        "cities": counts.top_neighbors(top_n, min_count),
+    }
+    _write_json(path, data)
+    return data
+
+
+class CoVisitationIndex:
+    """
+    Read-only "visited together" lookups for ranking: neighbors are held as a dict per
+    attraction, so every lookup is a couple of hash probes. It follows the file written by
+    publish_neighbors: at most every check_interval seconds it stats the file and, if the batch
+    job replaced it, loads the new version and swaps it in with a single reference assignment.
+
+    Attributes:
+        path (str): The neighbor file written by publish_neighbors.
+        check_interval (float): Minimum time in seconds between checks for a new version.
+    """
+
+    def __init__(self, path: str, check_interval: float = 60.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stat = None
+        self._next_check = 0.0
+        self._neighbors: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._refresh()
+
+    @classmethod
+    def from_neighbors(cls, neighbors: Dict[str, Dict[str, List[Tuple[str, float]]]]) -> "CoVisitationIndex":
+        """
+        Builds an index from in-memory neighbor lists (as returned by CoVisitationCounts.top_neighbors).
+        """
+        index = cls.__new__(cls)
+        index.path = None
+        index.check_interval = float("inf")
+        index._lock = threading.Lock()
+        index._stat = None
+        index._next_check = float("inf")
+        index._neighbors = cls._as_lookup(neighbors)
+        return index
+
+    @staticmethod
+    def _as_lookup(cities: Dict) -> Dict[str, Dict[str, Dict[str, float]]]:
+        return {
+            city: {name: {neighbor: weight for neighbor, weight in row} for name, row in attractions.items()}
+            for city, attractions in cities.items()
+        }
+
+    def _refresh(self):
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is already checking
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            file_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if file_stat == self._stat:
+                return
+            with open(self.path) as source:
+                self._neighbors = self._as_lookup(json.load(source)["cities"])
+            self._stat = file_stat
+            logger.info("Loaded co-visitation neighbors for %d cities from %s", len(self._neighbors), self.path)
+        except (OSError, ValueError, KeyError):
+            logger.exception("Could not load co-visitation neighbors; keeping the current version")
+        finally:
+            self._lock.release()
+
+    def neighbors(self, city: str, name: str) -> Dict[str, float]:
+        """
+        Returns the attractions most often visited together with `name`, mapped to their weight in (0, 1].
+        """
+        if time.monotonic() >= self._next_check:
+            self._refresh()
+        return self._neighbors.get(city, {}).get(name, {})
+
+    def weight(self, city: str, first: str, second: str) -> float:
+        """
+        Returns how strongly two attractions are visited together, 0.0 if they never were (or
+        the pair is not among either one's top neighbors).
+        """
+        return self.neighbors(city, first).get(second) or self.neighbors(city, second).get(first, 0.0)
+
+    def cities(self) -> List[str]:
+        return list(self._neighbors)
@@ -0,0 +1,62 @@
+import time
+from typing import Dict, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage cannot run because the request deadline has passed."""
+
+
+class Deadline:
+    """
+    The time by which a request must be answered. It is created at the endpoint and passed to
+    every planning stage: blocking calls use remaining() as their timeout, anytime stages stop
+    improving their result when it expires, and optional stages that had to return partial
+    results record it in `degraded` so the response can say so.
+
+    Attributes:
+        budget (float): The total time in seconds the request was given.
+        expires_at (float): time.monotonic() value at which the deadline passes.
+        degraded (Dict[str, str]): Stages that returned partial results, with the reason.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.degraded: Dict[str, str] = {}
+
+    def remaining(self) -> float:
+        """
+        Returns the seconds left before the deadline, never negative.
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def elapsed(self) -> float:
+        """
+        Returns the seconds since the deadline was set, i.e. since the request started.
+        """
+        return time.monotonic() - (self.expires_at - self.budget)
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """
+        Returns the timeout to use for a blocking call: the remaining time, capped at `cap`.
+
+        Raises:
+            DeadlineExceeded: If no time is left to start the call.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Request deadline of {self.budget:.2f} s exceeded")
+        return min(remaining, cap) if cap is not None else remaining
+
+    def mark_degraded(self, stage: str, reason: str):
+        self.degraded[stage] = reason
+
+
+def timeout_for(deadline: Optional[Deadline], default: float) -> float:
+    """
+    Returns the timeout for a blocking call made with an optional deadline.
+    """
+    return deadline.timeout(default) if deadline else default
@@ -0,0 +1,291 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scales every row to unit length so that inner products are cosine similarities.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def build_ivf(vectors: np.ndarray, n_lists: int, iterations: int = 10,
+              seed: int = 0) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Clusters unit-length vectors for an inverted-file index with spherical k-means; centroids
+    are kept at unit length so assignment is a max inner product.
+
+    Returns:
+        tuple: The (n_lists, dim) float32 centroids and, per centroid, the positions of its vectors.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums)
+    assignment = np.argmax(vectors @ centroids.T, axis=1)
+    return centroids, [np.flatnonzero(assignment == c) for c in range(n_lists)]
+
+
+class HuggingFaceEmbedder:
+    """
+    Computes sentence embeddings with a Hugging Face encoder model (mean pooling over tokens).
+
+    Attributes:
+        model_name (str): The encoder model to use (e.g., 'sentence-transformers/all-MiniLM-L6-v2').
+        batch_size (int): How many texts are encoded per forward pass.
+    """
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", batch_size: int = 64):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._tokenizer = None
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @staticmethod
+    def check_available():
+        """
+        Verifies that the libraries the model needs are installed, without loading them.
+
+        Raises:
+            ImportError: If transformers or torch is missing.
+        """
+        import importlib.util
+
+        for module in ("transformers", "torch"):
+            if importlib.util.find_spec(module) is None:
+                raise ImportError(f"No module named '{module}'")
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is None:
+                # transformers (and torch) is only loaded when embeddings are actually needed
+                from transformers import AutoModel, AutoTokenizer
+
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                self._model = AutoModel.from_pretrained(self.model_name).eval()
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embeds texts in batches.
+
+        Args:
+            texts (Sequence[str]): The texts to embed.
+
+        Returns:
+            np.ndarray: A (len(texts), dim) float32 matrix of unit-length embeddings.
+        """
+        if self._model is None:
+            self._load()
+        import torch
+
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start:start + self.batch_size])
+            encoded = self._tokenizer(batch, padding=True, truncation=True, return_tensors="pt")
+            with torch.no_grad():
+                token_embeddings = self._model(**encoded).last_hidden_state
+            mask = encoded["attention_mask"].unsqueeze(-1).to(token_embeddings.dtype)
+            pooled = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            batches.append(pooled.numpy())
+        return normalize_rows(np.vstack(batches)) if batches else np.zeros((0, 0), dtype=np.float32)
+
+
+class VectorIndex:
+    """
+    A compact matrix of unit-length embeddings answering top-k inner-product queries.
+    Small catalogs are searched exactly with one matrix multiply; large ones can build an
+    inverted-file (IVF) index, which clusters the vectors and only scores the clusters
+    closest to the query.
+
+    Attributes:
+        vectors (np.ndarray): The normalized embeddings, float16 or float32.
+        centroids (np.ndarray or None): Cluster centers of the IVF index, if built.
+        n_probe (int): How many clusters are scanned per query in IVF mode.
+    """
+
+    # Rows converted back to float32 at a time when scoring float16 storage
+    SCORE_CHUNK = 65536
+
+    def __init__(self, vectors: np.ndarray, use_float16: bool = False, n_lists: Optional[int] = None,
+                 n_probe: int = 4, kmeans_iterations: int = 10, seed: int = 0):
+        normalized = normalize_rows(vectors)
+        self.vectors = normalized.astype(np.float16) if use_float16 else normalized
+        self.n_probe = n_probe
+        self.centroids = None
+        self.lists: List[np.ndarray] = []
+        if n_lists and len(normalized) > n_lists:
+            self.centroids, self.lists = build_ivf(normalized, n_lists, kmeans_iterations, seed)
+
+    @classmethod
+    def from_normalized(cls, vectors: np.ndarray, centroids: Optional[np.ndarray] = None,
+                        lists: Optional[Sequence[np.ndarray]] = None, n_probe: int = 4) -> "VectorIndex":
+        """
+        Wraps embeddings that are already unit length (float16 or float32) and, optionally, their
+        IVF clusters without copying them, e.g. the arrays of a published shared catalog.
+        """
+        index = cls.__new__(cls)
+        index.vectors = vectors
+        index.n_probe = n_probe
+        index.centroids = centroids
+        index.lists = list(lists or [])
+        return index
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if vectors.dtype == np.float32:
+            return vectors @ queries.T
+        return np.vstack([vectors[i:i + self.SCORE_CHUNK].astype(np.float32) @ queries.T
+                          for i in range(0, len(vectors), self.SCORE_CHUNK)] or [np.zeros((0, len(queries)))])
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k vectors most similar to any of the queries.
+
+        Args:
+            queries (np.ndarray): A (q, dim) matrix of unit-length query embeddings.
+            k (int): How many results to return.
+
+        Returns:
+            tuple: (positions, scores) of the best matches, best first. An item's score is its
+                   highest similarity to any query.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if len(self.vectors) == 0 or len(queries) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rows = None
+        if self.centroids is not None:
+            probe = min(self.n_probe, len(self.centroids))
+            nearest_lists = np.argpartition(-(queries @ self.centroids.T), probe - 1, axis=1)[:, :probe]
+            rows = np.unique(np.concatenate([self.lists[c] for c in np.unique(nearest_lists)]))
+
+        scores = self._scores(queries, rows).max(axis=1)
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        positions = best if rows is None else rows[best]
+        return positions, scores[best]
+
+
+class InterestMatcher:
+    """
+    Matches free-text user interests (e.g., "history", "art") to attractions by embedding similarity,
+    so that related wording still finds attractions whose category differs ("historical", "museum").
+
+    Attraction embeddings are computed once per city in batches and kept as a VectorIndex. Interest
+    embeddings are cached, so a request with known interests costs a single matrix multiply.
+
+    Attributes:
+        embedder: Object with an encode(texts) method returning unit-length embeddings.
+        min_score (float): Minimum cosine similarity for an attraction to count as a match.
+        top_k (int): Maximum number of attractions matched per request.
+        use_float16 (bool): Store attraction embeddings as float16 to halve their memory.
+        ann_threshold (int): Catalogs larger than this get an approximate (IVF) index.
+        cache_size (int): How many interest embeddings are cached.
+    """
+
+    def __init__(self, embedder, min_score: float = 0.45, top_k: int = 10, use_float16: bool = True,
+                 ann_threshold: int = 5000, cache_size: int = 4096):
+        self.embedder = embedder
+        self.min_score = min_score
+        self.top_k = top_k
+        self.use_float16 = use_float16
+        self.ann_threshold = ann_threshold
+        self.cache_size = cache_size
+        self._indexes: Dict[str, Tuple[Optional[int], VectorIndex]] = {}
+        self._interest_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def attraction_text(attraction: Dict) -> str:
+        return f"{attraction['name']} ({attraction['category']})"
+
+    def build_index(self, attractions: List[Dict]) -> VectorIndex:
+        """
+        Embeds a catalog of attractions and builds its index.
+
+        Args:
+            attractions (List[Dict]): Attractions with 'name' and 'category' keys. A shared catalog
+                                      view with precomputed `vectors` is indexed without encoding.
+
+        Returns:
+            VectorIndex: The index, with positions matching the catalog order.
+        """
+        vectors = getattr(attractions, "vectors", None)
+        if vectors is not None and getattr(attractions, "normalized", False):
+            # Published already normalized, cast and clustered; every worker reads the same mapping
+            return VectorIndex.from_normalized(vectors, attractions.centroids, attractions.lists)
+        if vectors is None:
+            vectors = self.embedder.encode([self.attraction_text(a) for a in attractions])
+        n_lists = int(np.sqrt(len(attractions))) if len(attractions) > self.ann_threshold else None
+        return VectorIndex(vectors, use_float16=self.use_float16, n_lists=n_lists)
+
+    def index_for(self, city: str, attractions: List[Dict]) -> VectorIndex:
+        """
+        Returns the index of a city's catalog, building it on first use and again whenever
+        a new version of a shared catalog is published.
+        """
+        version = getattr(attractions, "version", None)
+        cached = self._indexes.get(city)
+        if cached is None or cached[0] != version:
+            with self._lock:
+                cached = self._indexes.get(city)
+                if cached is None or cached[0] != version:
+                    cached = self._indexes[city] = (version, self.build_index(attractions))
+        return cached[1]
+
+    def embed_interests(self, interests: List[str]) -> np.ndarray:
+        """
+        Returns embeddings for interest strings, encoding only the ones not seen before.
+        """
+        keys = [interest.strip().lower() for interest in interests]
+        with self._lock:
+            vectors = {key: self._interest_cache.get(key) for key in keys}
+            for key, vector in vectors.items():
+                if vector is not None:
+                    self._interest_cache.move_to_end(key)
+
+        missing = [key for key, vector in vectors.items() if vector is None]
+        if missing:
+            encoded = self.embedder.encode(missing)
+            vectors.update(zip(missing, encoded))
+            with self._lock:
+                self._interest_cache.update(zip(missing, encoded))
+                while len(self._interest_cache) > self.cache_size:
+                    self._interest_cache.popitem(last=False)
+        return np.vstack([vectors[key] for key in keys])
+
+    def match(self, city: str, attractions: List[Dict], interests: List[str]) -> List[int]:
+        """
+        Finds the attractions of a city that match any of the interests.
+
+        Args:
+            city (str): The city whose catalog is searched.
+            attractions (List[Dict]): The city's catalog.
+            interests (List[str]): The user's interests.
+
+        Returns:
+            List[int]: Positions in the catalog of the matching attractions, best match first.
+        """
+        if not interests or not attractions:
+            return []
+        index = self.index_for(city, attractions)
+        positions, scores = index.search(self.embed_interests(interests), self.top_k)
+        return [int(position) for position, score in zip(positions, scores) if score >= self.min_score]
@@ -0,0 +1,181 @@
+import csv
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Ranking weight of each kind of place; a city outranks a landmark of the same name
+KIND_WEIGHTS = {"city": 3.0, "neighborhood": 2.0, "landmark": 1.0}
+
+# "41.89, 12.49" typed as a starting point resolves to itself
+COORDINATES_PATTERN = re.compile(r"^\s*(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)\s*$")
+
+
+class Place(NamedTuple):
+    name: str
+    kind: str  # "city", "neighborhood" or "landmark"
+    city: str  # The city the place is in; a city's own name for cities
+    latitude: float
+    longitude: float
+    importance: float = 0.0  # Higher ranks first among places matching equally well
+
+    def to_dict(self) -> Dict:
+        return self._asdict()
+
+
+def normalize(text: str) -> str:
+    """
+    Folds a place name for matching: lower case, accents removed, punctuation and repeated
+    spaces collapsed, so "Trevi-Fountain" and "trévi fountain" match alike.
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+class Gazetteer:
+    """
+    An in-memory, offline index of cities, neighborhoods and landmarks with coordinates, for
+    typeahead and for resolving free-text starting points without a geocoding service.
+
+    Every name is indexed under its normalized form and under each of its word suffixes ("tower"
+    finds "Eiffel Tower"), as one sorted array of keys with a parallel array of place ids. The
+    places matching a prefix are then a contiguous slice found with two binary searches. For
+    prefixes of up to precomputed_length characters, whose slices can be large, the best matches
+    are precomputed when the index is built.
+
+    Attributes:
+        places (List[Place]): All places, indexed by id.
+    """
+
+    def __init__(self, places: Iterable[Place], precomputed_length: int = 2, precomputed_limit: int = 20,
+                 max_scan: int = 5000):
+        self.places: List[Place] = list(places)
+        self.max_scan = max_scan
+        self._names = [normalize(place.name) for place in self.places]
+        entries = sorted(
+            (key, place_id)
+            for place_id, name in enumerate(self._names)
+            for key in self._keys(name)
+        )
+        self._keys_sorted = [key for key, _ in entries]
+        self._ids = array("I", (place_id for _, place_id in entries))
+        self._cities = [normalize(place.city) for place in self.places]
+        self._by_name: Dict[str, List[int]] = {}
+        for place_id, name in enumerate(self._names):
+            self._by_name.setdefault(name, []).append(place_id)
+
+        self.precomputed_length = precomputed_length
+        self._precomputed: Dict[str, List[int]] = {}
+        for prefix in {key[:length] for key in self._keys_sorted for length in range(1, precomputed_length + 1)}:
+            self._precomputed[prefix] = self._ranked(prefix, self._slice(prefix), precomputed_limit)
+
+    @staticmethod
+    def _keys(name: str) -> List[str]:
+        # A normalized name and every word suffix of it
+        words = name.split()
+        return [" ".join(words[start:]) for start in range(len(words))]
+
+    def _slice(self, prefix: str) -> range:
+        start = bisect_left(self._keys_sorted, prefix)
+        stop = bisect_left(self._keys_sorted, prefix + "\uffff", lo=start)
+        return range(start, stop)
+
+    def _ranked(self, prefix: str, positions: range, limit: Optional[int], city: Optional[str] = None,
+                kind: Optional[str] = None, scan: Optional[int] = None) -> List[int]:
+        best: Dict[int, Tuple] = {}
+        for position in (positions[:scan] if scan else positions):
+            place_id = self._ids[position]
+            place = self.places[place_id]
+            if (city and self._cities[place_id] != city) or (kind and place.kind != kind):
+                continue
+            key = self._keys_sorted[position]
+            # Whole-name matches first, then kind and importance, then shorter names
+            score = (key == self._names[place_id], key == prefix, KIND_WEIGHTS.get(place.kind, 0.0),
+                     place.importance, -len(place.name))
+            if place_id not in best or score > best[place_id]:
+                best[place_id] = score
+        ranked = sorted(best, key=lambda place_id: best[place_id], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def search(self, prefix: str, limit: int = 10, city: Optional[str] = None, kind: Optional[str] = None) -> List[Place]:
+        """
+        Returns the places whose name (or a word of it onwards) starts with the prefix, best first.
+
+        Args:
+            prefix (str): What the user typed so far.
+            limit (int): Maximum number of places returned.
+            city (str, optional): Only places in this city.
+            kind (str, optional): Only places of this kind ("city", "neighborhood" or "landmark").
+
+        Returns:
+            List[Place]: The matching places.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= self.precomputed_length and not city and not kind and limit <= len(self._precomputed.get(prefix, [])):
+            return [self.places[place_id] for place_id in self._precomputed[prefix][:limit]]
+        city = normalize(city) if city else None
+        # Long slices are cut at max_scan entries (in key order) to bound the latency of one lookup
+        ranked = self._ranked(prefix, self._slice(prefix), limit, city, kind, scan=self.max_scan)
+        return [self.places[place_id] for place_id in ranked]
+
+    def resolve(self, text: str, city: Optional[str] = None) -> Optional[Place]:
+        """
+        Resolves free text (a place name, or "latitude, longitude") to a single place: an exact
+        name match in the city if there is one, otherwise the best prefix match in the city.
+
+        Returns:
+            Optional[Place]: The place, or None if nothing matches.
+        """
+        match = COORDINATES_PATTERN.match(text or "")
+        if match:
+            latitude, longitude = float(match.group(1)), float(match.group(2))
+            if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+                return Place(text.strip(), "coordinates", city or "", latitude, longitude)
+            return None
+
+        exact = [self.places[place_id] for place_id in self._by_name.get(normalize(text or ""), [])]
+        if city:
+            in_city = [place for place in exact if normalize(place.city) == normalize(city)]
+            exact = in_city or exact
+        if exact:
+            return max(exact, key=lambda place: (KIND_WEIGHTS.get(place.kind, 0.0), place.importance))
+        matches = self.search(text or "", limit=1, city=city)
+        return matches[0] if matches else None
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    @classmethod
+    def from_csv(cls, path: str, **options) -> "Gazetteer":
+        """
+        Loads places from a CSV file with the columns name, kind, city, latitude, longitude and,
+        optionally, importance.
+        """
+        with open(path, newline="", encoding="utf-8") as source:
+            places = [
+                Place(row["name"], row["kind"], row.get("city") or row["name"], float(row["latitude"]),
+                      float(row["longitude"]), float(row.get("importance") or 0.0))
+                for row in csv.DictReader(source)
+            ]
+        return cls(places, **options)
+
+    @classmethod
+    def from_catalog(cls, attractions_by_city, **options) -> "Gazetteer":
+        """
+        Builds a gazetteer from an attraction catalog: every attraction with coordinates as a
+        landmark, and every city at the centroid of its attractions.
+        """
+        places = []
+        cities = attractions_by_city.cities() if hasattr(attractions_by_city, "cities") else list(attractions_by_city)
+        for city in cities:
+            located = [a for a in attractions_by_city[city] if a.get("latitude") is not None and a.get("longitude") is not None]
+            if not located:
+                continue
+            places.append(Place(city, "city", city, sum(a["latitude"] for a in located) / len(located),
+                                sum(a["longitude"] for a in located) / len(located), float(len(located))))
+            places.extend(Place(a["name"], "landmark", city, a["latitude"], a["longitude"]) for a in located)
+        return cls(places, **options)
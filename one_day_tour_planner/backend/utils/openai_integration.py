@@ -1,5 +1,6 @@
-from transformers import pipeline, set_seed
+import threading
 from typing import Optional
+from utils.tracing import traced
 
 class HuggingFaceIntegration:
     """
@@ -12,13 +13,43 @@ class HuggingFaceIntegration:
     def __init__(self, model_name: str = "gpt2"):
         """
         Initializes the HuggingFaceIntegration instance with the provided model.
+        The model itself is loaded on first use.
 
         Args:
             model_name (str): The model name for generating text (default is 'gpt2').
         """
-        self.generator = pipeline("text-generation", model=model_name)
-        set_seed(42)  # Optional: Set a fixed random seed for reproducibility
+        self.model_name = model_name
+        self._generator = None
+        self._load_lock = threading.Lock()
 
+    @property
+    def generator(self):
+        """
+        The text generation pipeline, loaded the first time it is needed.
+        """
+        if self._generator is None:
+            with self._load_lock:
+                if self._generator is None:
+                    # transformers (and the torch stack behind it) is only loaded when a model is actually needed
+                    from transformers import pipeline, set_seed
+
+                    self._generator = pipeline("text-generation", model=self.model_name)
+                    set_seed(42)  # Optional: Set a fixed random seed for reproducibility
+        return self._generator
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Counts the tokens the model's tokenizer produces for a text.
+
+        Args:
+            text (str): The text to measure.
+
+        Returns:
+            int: The number of tokens.
+        """
+        return len(self.generator.tokenizer.encode(text))
+
+    @traced
     def get_response(self, prompt: str, max_length: int = 150, num_return_sequences: int = 1) -> dict:
         """
         Generates a response from the Hugging Face model based on the given prompt.
@@ -72,3 +103,23 @@ class HuggingFaceIntegration:
             return generated_text
         else:
             return "Error: No valid response generated."
+
+    @traced
+    def generate_reply(self, prompt: str, max_new_tokens: int = 120) -> str:
+        """
+        Generates only the continuation of a prompt, bounded by a number of new tokens
+        rather than a total length, so the reply size does not depend on the prompt size.
+
+        Args:
+            prompt (str): The prompt text that the model will respond to.
+            max_new_tokens (int, optional): The maximum number of tokens to generate (default is 120).
+
+        Returns:
+            str: The generated reply, or an error message if generation failed.
+        """
+        try:
+            response = self.generator(prompt, max_new_tokens=max_new_tokens, return_full_text=False,
+                                      pad_token_id=self.generator.tokenizer.eos_token_id)
+        except Exception as e:
+            return f"Error: {str(e)}"
+        return self.get_text_from_response(response) or "Error: No valid response generated."
@@ -0,0 +1,143 @@
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profiling session is requested while another one is running."""
+
+
+class SamplingProfiler:
+    """
+    A wall-clock sampling profiler that periodically snapshots the stacks of all threads.
+
+    The output uses the collapsed-stack format understood by flamegraph.pl and speedscope:
+    one line per unique stack, frames separated by ';' from the outermost call inwards,
+    followed by a space and the number of samples.
+
+    Attributes:
+        interval (float): Seconds between two samples.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float) -> str:
+        """
+        Samples all threads for the given duration. Blocks the calling thread, so
+        call it from a worker thread when running inside the event loop.
+
+        Args:
+            seconds (float): How long to sample for.
+
+        Returns:
+            str: The collapsed-stack dump.
+
+        Raises:
+            ProfilerBusyError: If another profiling session is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profiling session is already running")
+        try:
+            samples = Counter()
+            own_thread = threading.get_ident()
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            deadline = time.monotonic() + seconds
+
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    thread_name = thread_names.get(thread_id, str(thread_id))
+                    samples[self.collapse_stack(thread_name, frame)] += 1
+                time.sleep(self.interval)
+
+            return "\n".join(f"{stack} {count}" for stack, count in samples.most_common())
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def collapse_stack(thread_name: str, frame) -> str:
+        """
+        Renders a frame chain as 'thread;outer_func (file:line);...;inner_func (file:line)'.
+        """
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        # ';' separates frames and the last space separates the count, so neither may appear inside a frame
+        return ";".join(f.replace(";", ":") for f in reversed(frames))
+
+
+class LoopStallDetector:
+    """
+    Watches an asyncio event loop from a background thread and logs the loop thread's
+    stack whenever a callback fails to run within the threshold, i.e. something is
+    blocking the loop.
+
+    Attributes:
+        threshold_ms (float): How long the loop may be unresponsive before a stall is reported.
+        check_interval (float): Seconds between two probes of the loop.
+    """
+
+    def __init__(self, threshold_ms: float = 250, check_interval: float = 0.5):
+        self.threshold_ms = threshold_ms
+        self.check_interval = check_interval
+        self.stall_count = 0
+        self._loop = None
+        self._loop_thread_id = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, loop):
+        """
+        Starts watching the given loop. Must be called from the loop's own thread.
+        """
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-stall-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the watcher thread.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.threshold_ms / 1000 + self.check_interval)
+            self._thread = None
+
+    def _watch(self):
+        threshold = self.threshold_ms / 1000
+        while not self._stopped.wait(self.check_interval):
+            heartbeat = threading.Event()
+            sent_at = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(heartbeat.set)
+            except RuntimeError:
+                # The loop has been closed
+                return
+
+            if heartbeat.wait(threshold):
+                continue
+
+            self.stall_count += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<stack unavailable>\n"
+            logger.warning("Event loop blocked for more than %.0f ms. Blocking stack:\n%s", self.threshold_ms, stack)
+
+            # Wait for the loop to catch up before probing again, so one stall is reported once
+            while not heartbeat.wait(self.check_interval):
+                if self._stopped.is_set():
+                    return
+            logger.warning("Event loop stall ended after %.0f ms", (time.monotonic() - sent_at) * 1000)
@@ -0,0 +1,481 @@
+import csv
+import hashlib
+import heapq
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import IO, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Travel profiles per transport mode, with the same speeds as OptimizationAgent.transport_options.
+# Highway classes in `excluded` cannot be used by the mode; `oneway` says whether one-way streets apply.
+MODE_PROFILES = {
+    "walking": {"speed_kmh": 5, "excluded": {"motorway", "motorway_link", "trunk", "trunk_link"}, "oneway": False},
+    "public_transport": {"speed_kmh": 20, "excluded": {"footway", "path", "steps", "pedestrian", "cycleway"}, "oneway": False},
+    "taxi": {"speed_kmh": 40, "excluded": {"footway", "path", "steps", "pedestrian", "cycleway"}, "oneway": True},
+}
+
+# Speed used for the stretch between a stop and the street node it is snapped to
+SNAP_SPEED_KMH = 5
+
+
+def write_atomically(path: str, write: Callable[[IO], None]):
+    """
+    Writes a cache file under a temporary name unique to this writer and then moves it into place,
+    so concurrent writers of the same file never publish each other's partial output.
+    """
+    directory, name = os.path.split(path)
+    output = tempfile.NamedTemporaryFile(dir=directory, prefix=name + ".", suffix=".tmp", delete=False)
+    try:
+        with output:
+            write(output)
+        os.replace(output.name, path)
+    except BaseException:
+        try:
+            os.remove(output.name)
+        except OSError:
+            pass
+        raise
+
+
+def load_street_graph(city_dir: str) -> Tuple[List[str], np.ndarray, List[Tuple[int, int, float, str, bool]]]:
+    """
+    Loads a street-graph extract: nodes.csv (id, lat, lon) and edges.csv (source, target,
+    length_m, highway, oneway), e.g. exported from OpenStreetMap with osmnx.
+
+    Returns:
+        tuple: (node ids, (n, 2) array of coordinates, edges as (source, target, length_m, highway, oneway)
+               with sources and targets as node positions).
+    """
+    node_ids, coordinates, positions = [], [], {}
+    with open(os.path.join(city_dir, "nodes.csv"), newline="") as source:
+        for row in csv.DictReader(source):
+            positions[row["id"]] = len(node_ids)
+            node_ids.append(row["id"])
+            coordinates.append((float(row["lat"]), float(row["lon"])))
+
+    edges = []
+    with open(os.path.join(city_dir, "edges.csv"), newline="") as source:
+        for row in csv.DictReader(source):
+            if row["source"] not in positions or row["target"] not in positions:
+                continue
+            oneway = str(row.get("oneway", "")).strip().lower() in ("yes", "true", "1")
+            edges.append((positions[row["source"]], positions[row["target"]], float(row["length_m"]),
+                          row.get("highway") or "", oneway))
+    return node_ids, np.array(coordinates, dtype=np.float64).reshape(-1, 2), edges
+
+
+def mode_edges(edges, profile: Dict) -> List[Tuple[int, int, float]]:
+    """
+    Turns street edges into directed (source, target, seconds) edges for one transport mode.
+    """
+    metres_per_second = profile["speed_kmh"] / 3.6
+    directed = []
+    for source, target, length, highway, oneway in edges:
+        if highway in profile["excluded"]:
+            continue
+        seconds = length / metres_per_second
+        directed.append((source, target, seconds))
+        if not (oneway and profile["oneway"]):
+            directed.append((target, source, seconds))
+    return directed
+
+
+class ContractionHierarchy:
+    """
+    A contraction hierarchy over a directed graph. Nodes are contracted one by one in order of
+    importance, adding shortcut edges wherever the only shortest path ran through the contracted
+    node. Afterwards, any shortest path consists of an upward part from the source and an upward
+    part from the target in the reverse graph, so queries only search a small upward cone.
+
+    Attributes:
+        rank (np.ndarray): Contraction order of every node.
+        up (tuple): CSR arrays (offsets, targets, weights) of edges leading to higher-ranked nodes.
+        down (tuple): CSR arrays of reversed edges from higher-ranked nodes, for backward searches.
+    """
+
+    def __init__(self, rank: np.ndarray, up: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                 down: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        self.rank = rank
+        self.up = up
+        self.down = down
+        # Plain lists are much faster than numpy scalars in the Python search loops
+        self._up = tuple(array.tolist() for array in up)
+        self._down = tuple(array.tolist() for array in down)
+
+    @classmethod
+    def build(cls, node_count: int, edges: Sequence[Tuple[int, int, float]], witness_limit: int = 200) -> "ContractionHierarchy":
+        """
+        Contracts a graph.
+
+        Args:
+            node_count (int): Number of nodes.
+            edges (Sequence[Tuple[int, int, float]]): Directed (source, target, weight) edges.
+            witness_limit (int): Maximum nodes settled per witness search; a lower limit preprocesses
+                                 faster at the cost of some unnecessary shortcuts.
+
+        Returns:
+            ContractionHierarchy: The hierarchy.
+        """
+        out: List[Dict[int, float]] = [dict() for _ in range(node_count)]
+        incoming: List[Dict[int, float]] = [dict() for _ in range(node_count)]
+        for source, target, weight in edges:
+            if source != target and weight < out[source].get(target, float("inf")):
+                out[source][target] = weight
+                incoming[target][source] = weight
+
+        contracted = [False] * node_count
+        contracted_neighbours = [0] * node_count
+
+        def witness_distances(source: int, skip: int, limit: float, targets: set) -> Dict[int, float]:
+            distances = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            remaining = set(targets)
+            while heap and remaining and settled < witness_limit:
+                distance, node = heapq.heappop(heap)
+                if distance > distances.get(node, float("inf")):
+                    continue
+                if distance > limit:
+                    break
+                settled += 1
+                remaining.discard(node)
+                for neighbour, weight in out[node].items():
+                    if neighbour == skip or contracted[neighbour]:
+                        continue
+                    candidate = distance + weight
+                    if candidate < distances.get(neighbour, float("inf")):
+                        distances[neighbour] = candidate
+                        heapq.heappush(heap, (candidate, neighbour))
+            return distances
+
+        def shortcuts_for(node: int) -> List[Tuple[int, int, float]]:
+            shortcuts = []
+            for source, to_node in incoming[node].items():
+                if contracted[source]:
+                    continue
+                via = {target: to_node + weight for target, weight in out[node].items()
+                       if not contracted[target] and target != source}
+                if not via:
+                    continue
+                distances = witness_distances(source, node, max(via.values()), set(via))
+                for target, distance in via.items():
+                    if distances.get(target, float("inf")) > distance:
+                        shortcuts.append((source, target, distance))
+            return shortcuts
+
+        def priority(node: int) -> Tuple[int, List[Tuple[int, int, float]]]:
+            # Edge difference plus the number of contracted neighbours, which spreads contraction evenly
+            shortcuts = shortcuts_for(node)
+            active_edges = sum(1 for n in incoming[node] if not contracted[n]) + sum(1 for n in out[node] if not contracted[n])
+            return len(shortcuts) - active_edges + contracted_neighbours[node], shortcuts
+
+        heap = [(priority(node)[0], node) for node in range(node_count)]
+        heapq.heapify(heap)
+        rank = np.zeros(node_count, dtype=np.int32)
+        order = 0
+        while heap:
+            _, node = heapq.heappop(heap)
+            # Lazy updates: re-evaluate the node and put it back if it is no longer the cheapest
+            current, shortcuts = priority(node)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, node))
+                continue
+            for source, target, distance in shortcuts:
+                if distance < out[source].get(target, float("inf")):
+                    out[source][target] = distance
+                    incoming[target][source] = distance
+            contracted[node] = True
+            rank[node] = order
+            order += 1
+            for neighbour in set(incoming[node]) | set(out[node]):
+                contracted_neighbours[neighbour] += 1
+
+        up: List[List[Tuple[int, float]]] = [[] for _ in range(node_count)]
+        down: List[List[Tuple[int, float]]] = [[] for _ in range(node_count)]
+        for source in range(node_count):
+            for target, weight in out[source].items():
+                if rank[target] > rank[source]:
+                    up[source].append((target, weight))
+                else:
+                    down[target].append((source, weight))
+        return cls(rank, cls._to_csr(up), cls._to_csr(down))
+
+    @staticmethod
+    def _to_csr(adjacency: List[List[Tuple[int, float]]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        offsets = np.zeros(len(adjacency) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(edges) for edges in adjacency])
+        targets = np.array([target for edges in adjacency for target, _ in edges], dtype=np.int32)
+        weights = np.array([weight for edges in adjacency for _, weight in edges], dtype=np.float32)
+        return offsets, targets, weights
+
+    def save(self, path: str):
+        write_atomically(path, lambda output: np.savez(
+            output, rank=self.rank, up_offsets=self.up[0], up_targets=self.up[1], up_weights=self.up[2],
+            down_offsets=self.down[0], down_targets=self.down[1], down_weights=self.down[2]))
+
+    @classmethod
+    def load(cls, path: str) -> "ContractionHierarchy":
+        with np.load(path) as data:
+            return cls(data["rank"], (data["up_offsets"], data["up_targets"], data["up_weights"]),
+                       (data["down_offsets"], data["down_targets"], data["down_weights"]))
+
+    @staticmethod
+    def _upward_search(graph, source: int) -> Dict[int, float]:
+        offsets, targets, weights = graph
+        distances = {source: 0.0}
+        heap = [(0.0, source)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > distances[node]:
+                continue
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[edge]
+                candidate = distance + weights[edge]
+                if candidate < distances.get(neighbour, float("inf")):
+                    distances[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+        return distances
+
+    def many_to_many(self, sources: Sequence[int], targets: Sequence[int]) -> np.ndarray:
+        """
+        Computes shortest travel times from every source to every target node with one upward
+        search per node: backward searches from the targets leave (target, distance) entries in
+        buckets at the nodes they reach, and each forward search from a source combines its
+        distances with the buckets it meets.
+
+        Returns:
+            np.ndarray: A (len(sources), len(targets)) float32 matrix; unreachable pairs are inf.
+        """
+        buckets: Dict[int, List[Tuple[int, float]]] = {}
+        for column, target in enumerate(targets):
+            for node, distance in self._upward_search(self._down, target).items():
+                buckets.setdefault(node, []).append((column, distance))
+
+        matrix = np.full((len(sources), len(targets)), np.inf, dtype=np.float32)
+        for row, source in enumerate(sources):
+            best = matrix[row].tolist()
+            for node, distance in self._upward_search(self._up, source).items():
+                for column, remaining in buckets.get(node, ()):
+                    if distance + remaining < best[column]:
+                        best[column] = distance + remaining
+            matrix[row] = best
+        return matrix
+
+
+class CityRouter:
+    """
+    The street graph of one city with a contraction hierarchy per transport mode. Requests only
+    use hierarchies that are ready (see is_ready); missing ones are built in a background thread.
+    """
+
+    def __init__(self, city_dir: str, cache_dir: Optional[str], graph_version: str, profiles: Dict[str, Dict]):
+        self.node_ids, self.coordinates, self._edges = load_street_graph(city_dir)
+        self.cache_dir = cache_dir
+        self.graph_version = graph_version
+        self.profiles = profiles
+        self._hierarchies: Dict[str, ContractionHierarchy] = {}
+        self._lock = threading.Lock()
+        self._builder: Optional[threading.Thread] = None
+
+    def _hierarchy_path(self, mode: str) -> Optional[str]:
+        return os.path.join(self.cache_dir, f"ch-{mode}-{self.graph_version}.npz") if self.cache_dir else None
+
+    def is_ready(self, mode: str) -> bool:
+        """
+        Tells whether the mode's hierarchy is loaded or cached on disk, i.e. can be used without
+        preprocessing the graph.
+        """
+        path = self._hierarchy_path(mode)
+        return mode in self._hierarchies or bool(path and os.path.exists(path))
+
+    def hierarchy(self, mode: str) -> ContractionHierarchy:
+        """
+        Returns the mode's hierarchy, loading it from the cache directory or building it on first use.
+        """
+        hierarchy = self._hierarchies.get(mode)
+        if hierarchy is not None:
+            return hierarchy
+        with self._lock:
+            hierarchy = self._hierarchies.get(mode)
+            if hierarchy is None:
+                path = self._hierarchy_path(mode)
+                if path and os.path.exists(path):
+                    hierarchy = ContractionHierarchy.load(path)
+                else:
+                    logger.info("Building the %s contraction hierarchy for %d nodes", mode, len(self.node_ids))
+                    hierarchy = ContractionHierarchy.build(len(self.node_ids), mode_edges(self._edges, self.profiles[mode]))
+                    if path:
+                        try:
+                            hierarchy.save(path)
+                        except OSError:
+                            logger.warning("Could not cache the %s contraction hierarchy at %s", mode, path, exc_info=True)
+                self._hierarchies[mode] = hierarchy
+        return hierarchy
+
+    def prepare_in_background(self, modes: Sequence[str]):
+        """
+        Starts building the hierarchies of the modes that are not ready, unless a build is already running.
+        """
+        with self._lock:
+            if self._builder is not None and self._builder.is_alive():
+                return
+
+            def build():
+                for mode in modes:
+                    try:
+                        self.hierarchy(mode)
+                    except Exception:
+                        logger.exception("Could not build the %s contraction hierarchy", mode)
+
+            self._builder = threading.Thread(target=build, name="routing-prepare", daemon=True)
+            self._builder.start()
+
+    def snap(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the nearest street node of every (lat, lon) point.
+
+        Returns:
+            tuple: (node positions, distances in metres)
+        """
+        lat = np.radians(self.coordinates[:, 0])
+        lon = np.radians(self.coordinates[:, 1])
+        nodes, metres = [], []
+        for point_lat, point_lon in np.radians(points):
+            # Equirectangular approximation, accurate at city scale
+            x = (lon - point_lon) * np.cos((lat + point_lat) / 2)
+            y = lat - point_lat
+            squared = x * x + y * y
+            nearest = int(np.argmin(squared))
+            nodes.append(nearest)
+            metres.append(float(np.sqrt(squared[nearest])) * 6371000.0)
+        return np.array(nodes, dtype=np.int64), np.array(metres, dtype=np.float32)
+
+
+class RoutingEngine:
+    """
+    Answers travel-time queries between attractions on local street graphs. Each city has a
+    directory under data_dir with nodes.csv and edges.csv. Contraction hierarchies are built
+    once per city and mode, ahead of time with scripts/prepare_routing.py or else in the
+    background on first use (see ready), and saved to cache_dir, together with the float32 travel-time matrix of every attraction set queried,
+    so repeated requests for the same stops read a small mapped file.
+
+    Attributes:
+        data_dir (str): Directory with one street-graph extract per city.
+        cache_dir (str or None): Where hierarchies and matrices are persisted; None keeps them in memory only.
+        max_cached_matrices (int): How many matrices are also kept in memory.
+    """
+
+    def __init__(self, data_dir: str, cache_dir: Optional[str] = None, profiles: Dict[str, Dict] = None,
+                 max_cached_matrices: int = 256):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self.profiles = profiles or MODE_PROFILES
+        self.max_cached_matrices = max_cached_matrices
+        self._routers: Dict[str, CityRouter] = {}
+        self._matrices: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def has_city(self, city: str) -> bool:
+        city_dir = os.path.join(self.data_dir, city)
+        return os.path.exists(os.path.join(city_dir, "nodes.csv")) and os.path.exists(os.path.join(city_dir, "edges.csv"))
+
+    def router(self, city: str) -> CityRouter:
+        router = self._routers.get(city)
+        if router is None:
+            with self._lock:
+                router = self._routers.get(city)
+                if router is None:
+                    city_dir = os.path.join(self.data_dir, city)
+                    cache_dir = os.path.join(self.cache_dir, city) if self.cache_dir else None
+                    if cache_dir:
+                        os.makedirs(cache_dir, exist_ok=True)
+                    router = self._routers[city] = CityRouter(city_dir, cache_dir, self._graph_version(city_dir), self.profiles)
+        return router
+
+    @staticmethod
+    def _graph_version(city_dir: str) -> str:
+        # Changes whenever the extract is replaced, so persisted hierarchies and matrices are never stale
+        stats = [os.stat(os.path.join(city_dir, name)) for name in ("nodes.csv", "edges.csv")]
+        return hashlib.sha1(repr([(s.st_size, s.st_mtime_ns) for s in stats]).encode()).hexdigest()[:12]
+
+    def ready(self, city: str, modes: Sequence[str]) -> bool:
+        """
+        Tells whether travel times of the modes can be computed without preprocessing the city's
+        street graph. If not, the missing hierarchies are built in the background for later requests.
+        """
+        router = self.router(city)
+        missing = [mode for mode in modes if not router.is_ready(mode)]
+        if missing:
+            router.prepare_in_background(missing)
+        return not missing
+
+    def travel_times(self, city: str, points: Sequence[Tuple[float, float]], mode: str = "walking") -> np.ndarray:
+        """
+        Returns the travel times in seconds between every pair of points for a transport mode.
+
+        Args:
+            city (str): The city whose street graph is used.
+            points (Sequence[Tuple[float, float]]): (latitude, longitude) of every stop.
+            mode (str): A key of MODE_PROFILES.
+
+        Returns:
+            np.ndarray: A (n, n) float32 matrix in the order of `points`; unreachable pairs are inf.
+        """
+        router = self.router(city)
+        # The matrix is stored for the sorted point set, so any order of the same stops reuses it
+        keys = [f"{lat:.6f},{lon:.6f}" for lat, lon in points]
+        canonical = sorted(set(keys))
+        digest = hashlib.sha1("|".join([city, mode, router.graph_version] + canonical).encode()).hexdigest()[:20]
+        matrix = self._cached_matrix(router, mode, digest)
+        if matrix is None:
+            matrix = self._compute_matrix(router, mode, [tuple(map(float, key.split(","))) for key in canonical])
+            self._store_matrix(router, mode, digest, matrix)
+
+        position = {key: index for index, key in enumerate(canonical)}
+        order = [position[key] for key in keys]
+        return np.asarray(matrix)[np.ix_(order, order)]
+
+    def _compute_matrix(self, router: CityRouter, mode: str, points: List[Tuple[float, float]]) -> np.ndarray:
+        nodes, snap_metres = router.snap(np.array(points, dtype=np.float64).reshape(-1, 2))
+        matrix = router.hierarchy(mode).many_to_many(nodes.tolist(), nodes.tolist())
+        snap_seconds = snap_metres / (SNAP_SPEED_KMH / 3.6)
+        matrix += snap_seconds[:, None] + snap_seconds[None, :]
+        np.fill_diagonal(matrix, 0.0)
+        return matrix
+
+    def _matrix_path(self, router: CityRouter, mode: str, digest: str) -> Optional[str]:
+        return os.path.join(router.cache_dir, f"matrix-{mode}-{digest}.npy") if router.cache_dir else None
+
+    def _cached_matrix(self, router: CityRouter, mode: str, digest: str) -> Optional[np.ndarray]:
+        with self._lock:
+            matrix = self._matrices.get(digest)
+            if matrix is not None:
+                self._matrices.move_to_end(digest)
+                return matrix
+        path = self._matrix_path(router, mode, digest)
+        if path and os.path.exists(path):
+            matrix = np.load(path, mmap_mode="r")
+            self._remember(digest, matrix)
+            return matrix
+        return None
+
+    def _store_matrix(self, router: CityRouter, mode: str, digest: str, matrix: np.ndarray):
+        path = self._matrix_path(router, mode, digest)
+        if path:
+            try:
+                write_atomically(path, lambda output: np.save(output, matrix.astype(np.float32)))
+            except OSError:
+                # The matrix is still served from memory; the next worker just computes it again
+                logger.warning("Could not cache the travel-time matrix at %s", path, exc_info=True)
+        self._remember(digest, matrix)
+
+    def _remember(self, digest: str, matrix: np.ndarray):
+        with self._lock:
+            self._matrices[digest] = matrix
+            while len(self._matrices) > self.max_cached_matrices:
+                self._matrices.popitem(last=False)
@@ -0,0 +1,338 @@
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+import numpy as np
+from utils.embeddings import build_ivf, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# File layout: MAGIC, the header length (uint64), the JSON header, then the arrays it describes,
+# each starting on an ALIGNMENT boundary so numpy can view them in place
+MAGIC = b"ATTRCAT1"
+ALIGNMENT = 64
+POINTER_FILE = "CURRENT"
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _build_arrays(attractions_by_city: Dict[str, List[Dict]], embeddings: Optional[Dict[str, np.ndarray]],
+                  use_float16: bool = True, ann_threshold: int = 5000):
+    """
+    Flattens the per-city attraction lists into columns plus the per-city and per-category ranges.
+    Embeddings are stored normalized, in their final dtype and, for cities larger than
+    ann_threshold, with their IVF clusters, so workers index them without copying.
+    """
+    cities, categories = {}, {}
+    rows: List[Dict] = []
+    category_positions: List[int] = []
+    for city, attractions in attractions_by_city.items():
+        start = len(rows)
+        rows.extend(attractions)
+        # Inverted index: city-local positions grouped by category, in catalog order within a category
+        by_category: Dict[str, List[int]] = {}
+        for position, attraction in enumerate(attractions):
+            by_category.setdefault(attraction["category"], []).append(position)
+            categories.setdefault(attraction["category"], len(categories))
+        ranges = {}
+        for category, positions in by_category.items():
+            ranges[category] = [len(category_positions), len(category_positions) + len(positions)]
+            category_positions.extend(positions)
+        cities[city] = {"start": start, "stop": len(rows), "categories": ranges}
+
+    names = [attraction["name"].encode("utf-8") for attraction in rows]
+    arrays = {
+        "duration": np.array([a["duration"] for a in rows], dtype=np.int32),
+        "cost": np.array([a["cost"] for a in rows], dtype=np.float64),
+        "outdoor": np.array([bool(a.get("outdoor", False)) for a in rows], dtype=np.uint8),
+        "latitude": np.array([np.nan if a.get("latitude") is None else a["latitude"] for a in rows], dtype=np.float64),
+        "longitude": np.array([np.nan if a.get("longitude") is None else a["longitude"] for a in rows], dtype=np.float64),
+        "category": np.array([categories[a["category"]] for a in rows], dtype=np.int32),
+        "name_offsets": np.cumsum([0] + [len(name) for name in names], dtype=np.int64),
+        "names": np.frombuffer(b"".join(names), dtype=np.uint8),
+        "category_positions": np.array(category_positions, dtype=np.int32),
+    }
+    if embeddings:
+        if sum(len(embeddings[city]) for city in attractions_by_city) != len(rows):
+            raise ValueError("Embeddings must have one row per attraction")
+        normalized = {city: normalize_rows(embeddings[city]) for city in attractions_by_city}
+        arrays["embeddings"] = np.vstack(list(normalized.values())).astype(np.float16 if use_float16 else np.float32)
+        # IVF clusters of the large cities: centroids in city order, and each cluster's city-local
+        # positions, delimited by list_offsets
+        centroids, list_positions, list_offsets = [], [], [0]
+        for city, vectors in normalized.items():
+            if len(vectors) <= ann_threshold:
+                continue
+            city_centroids, lists = build_ivf(vectors, int(np.sqrt(len(vectors))))
+            cities[city]["lists"] = [len(list_offsets) - 1, len(list_offsets) - 1 + len(lists)]
+            centroids.append(city_centroids)
+            for positions in lists:
+                list_positions.extend(positions)
+                list_offsets.append(len(list_positions))
+        if centroids:
+            arrays["centroids"] = np.vstack(centroids).astype(np.float32)
+            arrays["list_positions"] = np.array(list_positions, dtype=np.int64)
+            arrays["list_offsets"] = np.array(list_offsets, dtype=np.int64)
+    return cities, list(categories), arrays
+
+
+def current_version(directory: str) -> int:
+    """
+    Returns the version of the catalog currently published in a directory, or 0 if there is none.
+    """
+    try:
+        with open(os.path.join(directory, POINTER_FILE)) as pointer:
+            return int(pointer.read().strip().split("-")[1].split(".")[0])
+    except FileNotFoundError:
+        return 0
+
+
+def publish_catalog(directory: str, attractions_by_city: Dict[str, List[Dict]],
+                    embeddings: Optional[Dict[str, np.ndarray]] = None, keep_versions: int = 2,
+                    use_float16: bool = True, ann_threshold: int = 5000) -> int:
+    """
+    Writes a new version of the attraction catalog and atomically makes it the current one.
+    The data file is fully written and synced under its final name before the CURRENT pointer
+    is replaced, so an attaching worker sees either the old or the new catalog, never a mix.
+
+    Args:
+        directory (str): Where catalog versions are kept, ideally on tmpfs (e.g., /dev/shm/attractions).
+        attractions_by_city (Dict[str, List[Dict]]): Attractions per city, in the attractions_db format.
+        embeddings (Dict[str, np.ndarray], optional): Precomputed attraction embeddings per city,
+                                                       one row per attraction.
+        keep_versions (int): How many versions to keep on disk. Workers still mapping an older one
+                             keep it alive until they move on, so deleting it is safe.
+        use_float16 (bool): Store the embeddings as float16 (see EMBEDDINGS_FLOAT16).
+        ann_threshold (int): Cities with more attractions get an IVF index (see EMBEDDINGS_ANN_THRESHOLD).
+
+    Returns:
+        int: The published version.
+    """
+    os.makedirs(directory, exist_ok=True)
+    cities, categories, arrays = _build_arrays(attractions_by_city, embeddings, use_float16, ann_threshold)
+    version = current_version(directory) + 1
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({
+        "version": version,
+        "published_at": time.time(),
+        "cities": cities,
+        "categories": categories,
+        "normalized": True,
+        "arrays": layout,
+    }).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    file_name = f"catalog-{version:08d}.bin"
+    path = os.path.join(directory, file_name)
+    with open(path + ".tmp", "wb") as output:
+        output.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, array in arrays.items():
+            output.seek(data_start + layout[name]["offset"])
+            output.write(np.ascontiguousarray(array).tobytes())
+        output.truncate(data_start + offset)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(path + ".tmp", path)
+
+    pointer_path = os.path.join(directory, POINTER_FILE)
+    with open(pointer_path + ".tmp", "w") as pointer:
+        pointer.write(file_name)
+        pointer.flush()
+        os.fsync(pointer.fileno())
+    os.replace(pointer_path + ".tmp", pointer_path)
+
+    for old in sorted(f for f in os.listdir(directory) if f.startswith("catalog-") and f.endswith(".bin"))[:-keep_versions]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except OSError:
+            pass  # still mapped on platforms that forbid deleting mapped files
+    return version
+
+
+class CityCatalog(Sequence):
+    """
+    Read-only view of one city's attractions inside a mapped catalog. Columns are numpy views
+    of the shared mapping; an attraction dict is only built when it is accessed.
+
+    Attributes:
+        city (str): The city.
+        version (int): The catalog version the view belongs to.
+        vectors (np.ndarray or None): Precomputed embeddings of the attractions, if published.
+        normalized (bool): Whether the embeddings were published at unit length (older versions were not).
+        centroids (np.ndarray or None): IVF cluster centers of the embeddings, if the city is large.
+        lists (List[np.ndarray] or None): City-local positions of each cluster's attractions.
+    """
+
+    def __init__(self, snapshot: "CatalogSnapshot", city: str):
+        info = snapshot.cities[city]
+        self.city = city
+        self.version = snapshot.version
+        self._snapshot = snapshot
+        self._start, self._stop = info["start"], info["stop"]
+        self._category_ranges = info["categories"]
+        embeddings = snapshot.arrays.get("embeddings")
+        self.vectors = embeddings[self._start:self._stop] if embeddings is not None else None
+        self.normalized = snapshot.normalized
+        self.centroids, self.lists = None, None
+        if "lists" in info:
+            first, last = info["lists"]
+            offsets = snapshot.arrays["list_offsets"]
+            self.centroids = snapshot.arrays["centroids"][first:last]
+            self.lists = [snapshot.arrays["list_positions"][offsets[c]:offsets[c + 1]] for c in range(first, last)]
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("attraction position out of range")
+        return self._snapshot.attraction(self._start + position)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(self._start, self._stop):
+            yield self._snapshot.attraction(row)
+
+    def positions_for_category(self, category: str) -> np.ndarray:
+        """
+        Returns the positions of the city's attractions in a category, from the precomputed index.
+        """
+        start, stop = self._category_ranges.get(category, (0, 0))
+        return self._snapshot.arrays["category_positions"][start:stop]
+
+
+class CatalogSnapshot:
+    """
+    One mapped catalog version. Its arrays are read-only views into the shared mapping, so any
+    number of worker processes attached to the same version share a single copy in memory.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as source:
+            self._mapping = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapping[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an attraction catalog")
+        header_length = int.from_bytes(self._mapping[len(MAGIC):len(MAGIC) + 8], "little")
+        header = json.loads(self._mapping[len(MAGIC) + 8:len(MAGIC) + 8 + header_length])
+        data_start = _align(len(MAGIC) + 8 + header_length)
+
+        self.path = path
+        self.version: int = header["version"]
+        self.cities: Dict[str, Dict] = header["cities"]
+        self.categories: List[str] = header["categories"]
+        self.normalized: bool = header.get("normalized", False)
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            self.arrays[name] = np.frombuffer(
+                self._mapping, dtype=dtype, count=count, offset=data_start + spec["offset"],
+            ).reshape(spec["shape"])
+
+    def attraction(self, row: int) -> Dict:
+        arrays = self.arrays
+        name_start, name_stop = arrays["name_offsets"][row], arrays["name_offsets"][row + 1]
+        latitude, longitude = float(arrays["latitude"][row]), float(arrays["longitude"][row])
+        return {
+            "name": arrays["names"][name_start:name_stop].tobytes().decode("utf-8"),
+            "category": self.categories[arrays["category"][row]],
+            "duration": int(arrays["duration"][row]),
+            "cost": float(arrays["cost"][row]),
+            "outdoor": bool(arrays["outdoor"][row]),
+            "latitude": None if np.isnan(latitude) else latitude,
+            "longitude": None if np.isnan(longitude) else longitude,
+        }
+
+    def city(self, city: str) -> Optional[CityCatalog]:
+        return CityCatalog(self, city) if city in self.cities else None
+
+
+class SharedCatalog:
+    """
+    A worker's read-only attachment to the attraction catalog published by publish_catalog.
+    It behaves like the attractions_db mapping (`city in catalog`, `catalog[city]`) and follows
+    new versions: at most every check_interval seconds it looks at the CURRENT pointer and, if
+    a new version was published, maps it and swaps it in with a single reference assignment.
+    A request that took a snapshot keeps using it even if a swap happens meanwhile.
+
+    Attributes:
+        directory (str): The directory the loader publishes to.
+        check_interval (float): Minimum time in seconds between checks for a new version.
+    """
+
+    def __init__(self, directory: str, check_interval: float = 1.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._pointer_path = os.path.join(directory, POINTER_FILE)
+        self._lock = threading.Lock()
+        self._pointer_stat = None
+        self._next_check = 0.0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh()
+        if self._snapshot is None:
+            raise FileNotFoundError(f"No attraction catalog has been published in {directory}")
+
+    @property
+    def version(self) -> int:
+        return self.snapshot().version
+
+    def snapshot(self) -> CatalogSnapshot:
+        """
+        Returns the current catalog version, attaching to a newer one first if it was published.
+        """
+        if time.monotonic() >= self._next_check:
+            self._refresh()
+        return self._snapshot
+
+    def _refresh(self):
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is already checking
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                stat = os.stat(self._pointer_path)
+            except FileNotFoundError:
+                return
+            pointer_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if pointer_stat == self._pointer_stat:
+                return
+            with open(self._pointer_path) as pointer:
+                path = os.path.join(self.directory, pointer.read().strip())
+            if self._snapshot is None or self._snapshot.path != path:
+                snapshot = CatalogSnapshot(path)
+                if self._snapshot is not None:
+                    logger.info("Attraction catalog swapped from version %d to %d", self._snapshot.version, snapshot.version)
+                self._snapshot = snapshot
+            self._pointer_stat = pointer_stat
+        except (OSError, ValueError):
+            logger.exception("Could not attach to the published attraction catalog; keeping the current version")
+        finally:
+            self._lock.release()
+
+    def __contains__(self, city: str) -> bool:
+        return city in self.snapshot().cities
+
+    def __getitem__(self, city: str) -> CityCatalog:
+        view = self.snapshot().city(city)
+        if view is None:
+            raise KeyError(city)
+        return view
+
+    def get(self, city: str, default=None):
+        view = self.snapshot().city(city)
+        return default if view is None else view
+
+    def cities(self) -> List[str]:
+        return list(self.snapshot().cities)
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Deduplicates identical work that is in flight at the same time. The first caller for a key
+    starts the computation as its own task; callers arriving with the same key while it runs
+    await that task instead of starting another. Everyone gets the same result or the same
+    exception, and a waiter that is cancelled (e.g., its client disconnected) does not cancel
+    the computation for the others. Once the task finishes the key is released, so results are
+    never cached beyond the requests that overlapped.
+
+    Callers receive the same result object, so they must not modify it.
+
+    Attributes:
+        name (str): Name reported in the metrics.
+        calls (int): Calls made.
+        coalesced (int): Calls that joined a computation already in flight.
+        errors (int): Computations that raised.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns the result of compute(), sharing it with concurrent calls for the same key.
+
+        Args:
+            key (str): Identifies equivalent work, e.g. a canonical fingerprint of the request.
+            compute (Callable[[], Awaitable[T]]): Starts the work; only called if none is in flight.
+
+        Returns:
+            T: The result of the (possibly shared) computation.
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalescing_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            "errors": self.errors,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Speculation:
+    __slots__ = ("key", "compute", "task", "submitted_at", "finished_at")
+
+    def __init__(self, key: str, compute: Callable[[], Awaitable]):
+        self.key = key
+        self.compute = compute
+        self.task: Optional[asyncio.Task] = None
+        self.submitted_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+
+class Speculator:
+    """
+    Computes results ahead of the request that is likely to ask for them. Work is submitted under
+    a key to a bounded queue and run in the background by a fixed number of workers; the request
+    that needs it claims the key and gets the finished result, or awaits the computation if it is
+    still running. A claim is single use. When the queue is full the oldest queued work is
+    dropped, and work nobody claimed within ttl seconds is cancelled (if still running) or
+    discarded (if finished), so unused speculation never holds on to memory or workers.
+
+    All methods must be called from the event loop thread. State belongs to the loop it was
+    first used on; on a different loop everything starts afresh.
+
+    Attributes:
+        name (str): Name reported in the metrics.
+        max_queue (int): Work allowed to wait for a worker.
+        workers (int): Computations run at once.
+        ttl (float): Seconds submitted work is kept for a claim.
+    """
+
+    def __init__(self, name: str, max_queue: int = 32, workers: int = 2, ttl: float = 120.0):
+        self.name = name
+        self.max_queue = max_queue
+        self.workers = workers
+        self.ttl = ttl
+        self._counters = {name: 0 for name in ("submitted", "dropped", "hits", "misses", "expired", "cancelled", "errors")}
+        self._reset(None)
+
+    def _reset(self, loop: Optional[asyncio.AbstractEventLoop]):
+        self._loop = loop
+        self._entries: Dict[str, _Speculation] = {}
+        self._queue: Deque[str] = deque()
+        self._wakeup = asyncio.Event() if loop else None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._reset(loop)
+        if not self._worker_tasks:
+            self._worker_tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    def submit(self, key: str, compute: Callable[[], Awaitable]) -> bool:
+        """
+        Queues compute() to run in the background, unless work for the key is already known.
+
+        Args:
+            key (str): Identifies the result, e.g. a fingerprint of the request that will claim it.
+            compute (Callable[[], Awaitable]): Starts the work; called when a worker picks it up.
+
+        Returns:
+            bool: True if the work was queued.
+        """
+        self._bind()
+        self._expire()
+        if key in self._entries:
+            return False
+        if len(self._queue) >= self.max_queue:
+            # The oldest queued work is the least likely to still be wanted
+            self._entries.pop(self._queue.popleft(), None)
+            self._counters["dropped"] += 1
+        self._entries[key] = _Speculation(key, compute)
+        self._queue.append(key)
+        self._counters["submitted"] += 1
+        self._wakeup.set()
+        return True
+
+    def claim(self, key: str) -> Optional[asyncio.Task]:
+        """
+        Takes the work for the key: its task (finished or running) or None if there is none, or
+        it has not started yet; queued work is withdrawn so the caller can compute it directly.
+        """
+        self._bind()
+        self._expire()
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.task is None:
+            self._queue.remove(key)
+            entry = None
+        self._counters["hits" if entry else "misses"] += 1
+        return entry.task if entry else None
+
+    def cancel(self, key: str) -> bool:
+        """
+        Withdraws queued work or cancels running work for the key, if it was not claimed.
+        """
+        entry = self._entries.pop(key, None) if self._loop is not None else None
+        if entry is None:
+            return False
+        if entry.task is None:
+            self._queue.remove(key)
+        else:
+            entry.task.cancel()
+        self._counters["cancelled"] += 1
+        return True
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for key, entry in list(self._entries.items()):
+            if entry.finished_at is not None and entry.finished_at < cutoff:
+                del self._entries[key]
+                self._counters["expired"] += 1
+            elif entry.task is None and entry.submitted_at < cutoff:
+                del self._entries[key]
+                self._queue.remove(key)
+                self._counters["expired"] += 1
+
+    async def _work(self):
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            entry = self._entries[self._queue.popleft()]
+            entry.task = asyncio.ensure_future(entry.compute())
+            await asyncio.wait({entry.task}, timeout=self.ttl)
+            if not entry.task.done():
+                if self._entries.get(entry.key) is entry:
+                    # Nobody claimed it in time; a claimed computation keeps running for its claimer
+                    del self._entries[entry.key]
+                    entry.task.cancel()
+                    self._counters["expired"] += 1
+                continue
+            if entry.task.cancelled():
+                continue
+            if entry.task.exception() is not None:
+                self._counters["errors"] += 1
+                logger.warning("Speculative computation for %s failed: %r", entry.key, entry.task.exception())
+                if self._entries.get(entry.key) is entry:
+                    del self._entries[entry.key]  # the claimer computes it again instead
+                continue
+            entry.finished_at = time.monotonic()
+
+    async def close(self):
+        """
+        Stops the workers and cancels all unclaimed work.
+        """
+        if self._loop is not asyncio.get_running_loop():
+            return
+        for key in list(self._entries):
+            self.cancel(key)
+        for worker in self._worker_tasks:
+            worker.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def stats(self) -> Dict:
+        claims = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": round(self._counters["hits"] / claims, 4) if claims else 0.0,
+            "queued": len(self._queue),
+            "running": sum(1 for entry in self._entries.values() if entry.task is not None and entry.finished_at is None),
+            "ready": sum(1 for entry in self._entries.values() if entry.finished_at is not None),
+        }
@@ -0,0 +1,193 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# The trace and span of the request currently being handled. Context variables follow
+# the request across awaits, tasks and asyncio.to_thread calls without being passed around.
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A single timed operation inside a trace (e.g., one agent call).
+
+    Attributes:
+        name (str): The operation name (e.g., 'WeatherAgent.fetch_weather').
+        span_id (str): Identifier of this span, unique within its trace.
+        parent_id (str or None): Identifier of the enclosing span, or None for the root span.
+        attributes (dict): Free-form details recorded on the span.
+    """
+
+    __slots__ = ("name", "span_id", "parent_id", "attributes", "start", "end")
+
+    def __init__(self, name: str, parent_id: Optional[str] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, trace_start: float) -> Dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.start - trace_start) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """
+    All spans recorded while handling one request.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans: List[Span] = []
+        # Spans may finish on worker threads (asyncio.to_thread), so appends are guarded
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "spans": [s.to_dict(self.start) for s in spans],
+        }
+
+
+class Tracer:
+    """
+    Starts a trace per request and keeps the slowest recent ones in a ring buffer.
+
+    Attributes:
+        slow_threshold_ms (float): Requests taking at least this long are kept for inspection.
+        buffer_size (int): How many slow traces are retained; older ones are dropped first.
+    """
+
+    def __init__(self, slow_threshold_ms: float = 500, buffer_size: int = 100):
+        self.slow_threshold_ms = slow_threshold_ms
+        self._slow_traces = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """
+        Opens a new trace with a root span for the duration of the block.
+
+        Args:
+            name (str): The trace name, usually the HTTP method and path.
+            **attributes: Extra details recorded on the root span.
+
+        Yields:
+            Trace: The active trace.
+        """
+        trace = Trace(name)
+        trace_token = _current_trace.set(trace)
+        try:
+            with span(name, **attributes):
+                yield trace
+        finally:
+            trace.end = time.perf_counter()
+            _current_trace.reset(trace_token)
+            if trace.duration_ms >= self.slow_threshold_ms:
+                with self._lock:
+                    self._slow_traces.append(trace)
+
+    def slow_traces(self) -> List[Dict]:
+        """
+        Returns the retained slow traces, most recent first.
+        """
+        with self._lock:
+            traces = list(self._slow_traces)
+        return [trace.to_dict() for trace in reversed(traces)]
+
+
+def current_trace() -> Optional[Trace]:
+    """
+    Returns the trace of the request being handled, or None outside a request.
+    """
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Records a timed span under the current trace. Outside a trace this is a no-op.
+
+    Args:
+        name (str): The operation name.
+        **attributes: Extra details recorded on the span.
+
+    Yields:
+        Span or None: The active span, or None when no trace is active.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else None, attributes)
+    span_token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = repr(e)
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(span_token)
+        trace.add(current)
+
+
+def traced(func):
+    """
+    Decorator that wraps every call of a function or coroutine function in a span
+    named after its qualified name (e.g., 'ItineraryGenerator.generate_itinerary').
+    """
+    name = func.__qualname__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+    return wrapper
@@ -1,41 +1,118 @@
 import streamlit as st
-from utils.api_requests import collect_preferences
-from transformers import pipeline
+from components.itinerary_display import itinerary_display
+from components.map_display import map_display
+from components.weather_display import weather_display
+import requests
+from utils.api_requests import (
+    ConcurrentRequests, collect_preferences, stream_complete_itinerary, generate_ai_summary, suggest_places,
+)
 
-# Load Hugging Face text generation pipeline (using a pre-trained model like GPT-2)
-generator = pipeline("text-generation", model="gpt2")
+# Interest categories offered by the backend attraction catalog
+INTEREST_OPTIONS = ["historical", "food", "relaxing", "shopping"]
 
 # Setting up the app's title and description
 st.title("One-Day Tour Planning Assistant")
 st.markdown("Welcome to the One-Day Tour Planning Assistant! Enter your preferences below to get a personalized plan.")
 
 # Collecting user inputs for tour preferences
-city = st.text_input("City to Visit", help="Enter the city where you want to plan your tour.")
+city_query = st.text_input("City to Visit", help="Start typing the city where you want to plan your tour.")
+# Typeahead: the backend suggests known cities matching what was typed so far
+city_suggestions = [place["name"] for place in suggest_places(city_query.strip(), kind="city")] if city_query.strip() else []
+city = st.selectbox("Matching cities", city_suggestions) if city_suggestions else city_query
+starting_query = st.text_input("Starting Point (optional)",
+                               help="A landmark or neighborhood, or coordinates as 'latitude, longitude'.")
+start_suggestions = [place["name"] for place in suggest_places(starting_query.strip(), city=city)] if starting_query.strip() else []
+starting_point = st.selectbox("Matching places", start_suggestions) if start_suggestions else starting_query.strip()
+tour_date = st.date_input("Date", help="Pick the day of your tour.")
 start_time = st.time_input("Start Time", help="Pick the time you'd like to start your tour.")
+end_time = st.time_input("End Time", help="Pick the time you'd like your tour to end.")
 budget = st.number_input("Budget", min_value=0.0, format="%.2f", help="Enter your budget for the tour in your local currency.")
+interests = st.multiselect("Interests", INTEREST_OPTIONS, help="Pick the kinds of places you'd like to visit.")
 
 # Button to trigger API request
 if st.button("Submit"):
-    # Collecting preferences in a dictionary
+    # Collecting preferences in a dictionary, kept in the session so later reruns still show the plan
     preferences = {
         "city": city,
+        "date": tour_date.isoformat(),
         "start_time": start_time.strftime("%H:%M"),  # Formatting start_time as a string in "HH:MM" format
-        "budget": budget
+        "end_time": end_time.strftime("%H:%M"),
+        "budget": budget,
+        "interests": interests,
+        "starting_point": starting_point or None,
+        "user_id": st.session_state.get("user_id"),
     }
+    # Stored in the backend's memory under this user, so the chat and later plans know them; the backend also
+    # starts precomputing the plan requested below. Planning works without it, just not personalized
+    try:
+        st.session_state.user_id = preferences["user_id"] = collect_preferences(preferences)
+    except requests.RequestException:
+        st.caption("Your preferences could not be saved; this plan is not personalized.")
+    st.session_state.preferences = preferences
 
-    # Calling the API function to process preferences (assuming the API handles the logic of preferences collection)
-    response = collect_preferences(preferences)
+preferences = st.session_state.get("preferences")
+if preferences:
+    # One placeholder per section, in page order, filled in as soon as the section's data arrives
+    sections = {name: st.empty() for name in ("itinerary", "map", "weather", "summary")}
+    for name, placeholder in sections.items():
+        placeholder.caption(f"Loading {name}...")
 
-    # If response from the API is valid, generate a personalized tour plan using Hugging Face model
-    if response:
-        st.subheader("Your One-Day Tour Plan:")
-        st.write(response)
+    prompt = (f"Create a fun and engaging one-day tour plan for {preferences['city']} starting at {preferences['start_time']} "
+              f"with a budget of {preferences['budget']}. Include activities for these interests: {', '.join(preferences['interests'])}.")
 
-        # Generate additional content with Hugging Face (e.g., a creative summary or suggestions)
-        prompt = f"Create a fun and engaging one-day tour plan for {city} starting at {start_time.strftime('%H:%M')} with a budget of {budget}. Here are the preferences: {response}"
-        generated_text = generator(prompt, max_length=200, num_return_sequences=1)
+    def render(name, result, error):
+        container = sections[name].container()
+        if error is not None:
+            container.error(f"Sorry, we couldn't load the {name}. Please try again.")
+            return
+        with container:
+            st.subheader("Tour Plan Summary from AI:")
+            st.write(result)
 
-        st.subheader("Tour Plan Summary from AI:")
-        st.write(generated_text[0]["generated_text"])
-    else:
-        st.error("Sorry, we couldn't generate a tour plan with the provided preferences. Please try again.")
+    with ConcurrentRequests() as requests_in_flight:
+        # The AI summary is memoized and generated in the background while the itinerary streams in;
+        # it is checked for between events, so it shows up as soon as it is ready
+        requests_in_flight.submit("summary", generate_ai_summary, prompt)
+
+        # The backend streams each section as soon as its stage is done; the finished stream is kept
+        # in the session, so reruns with the same preferences replay it without another request
+        finished = st.session_state.get("itinerary_events")
+        replay = finished["events"] if finished and finished["preferences"] == preferences else None
+        events, route = [], []
+        try:
+            for event in replay or stream_complete_itinerary(preferences):
+                for finished_request in requests_in_flight.finished():
+                    render(*finished_request)
+                events.append(event)
+                if event.event == "itinerary":
+                    with sections["itinerary"].container():
+                        itinerary_display(event.itinerary)
+                elif event.event in ("optimized_route", "weather") and event.optimized_route:
+                    # The optimized order replaces the raw itinerary; the weather stage resends it with each stop's forecast
+                    route = event.optimized_route
+                    with sections["itinerary"].container():
+                        itinerary_display(route)
+                    if event.event == "optimized_route":
+                        with sections["map"].container():
+                            map_display(route)
+                if event.event == "weather":
+                    with sections["weather"].container():
+                        weather_display(event.weather_info)
+                elif event.event == "map":
+                    with sections["map"].container():
+                        map_display(route, event.map_link)
+                elif event.event == "done":
+                    for stage, reason in (event.degraded or {}).items():
+                        st.caption(f"{stage.replace('_', ' ').capitalize()}: {reason}")
+                    st.session_state.itinerary_events = {"preferences": preferences, "events": events}
+                elif event.event == "error":
+                    raise RuntimeError(event.detail)
+        except Exception:
+            # Sections that already arrived stay on the page
+            received = {event.event for event in events}
+            for name in ("itinerary", "map", "weather"):
+                if name not in received:
+                    sections[name].error(f"Sorry, we couldn't load the {name}. Please try again.")
+
+        for finished_request in requests_in_flight.as_completed():
+            render(*finished_request)
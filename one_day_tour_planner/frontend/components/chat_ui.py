@@ -1,4 +1,6 @@
+import uuid
 import streamlit as st
+from utils.api_requests import post_to_backend
 
 def chat_ui():
     """
@@ -17,6 +19,10 @@ def chat_ui():
     if 'messages' not in st.session_state:
         st.session_state.messages = []
 
+    # The backend keeps the model context for this conversation; only the new message is sent each turn
+    if 'conversation_id' not in st.session_state:
+        st.session_state.conversation_id = uuid.uuid4().hex
+
     # Displaying chat history
     for message in st.session_state.messages:
         if message['role'] == 'user':
@@ -33,9 +39,9 @@ def chat_ui():
             # Save user message to session state
             st.session_state.messages.append({'role': 'user', 'text': user_message})
 
-            # Here you would typically send the message to the backend (e.g., to OpenAI or other APIs)
-            # In this case, we are simulating a response from the assistant.
-            assistant_response = get_assistant_response(user_message)
+            # Send the message to the backend chat endpoint
+            assistant_response = get_assistant_response(user_message, st.session_state.conversation_id,
+                                                        st.session_state.get('user_id'))
 
             # Save assistant's response to session state
             st.session_state.messages.append({'role': 'assistant', 'text': assistant_response})
@@ -46,16 +52,26 @@ def chat_ui():
             # Refresh the page to display the new message
             st.experimental_rerun()
 
-def get_assistant_response(user_message: str) -> str:
+def get_assistant_response(user_message: str, conversation_id: str, user_id: str = None) -> str:
     """
-    A simple placeholder function that simulates the assistant's response.
-    In a real application, you would replace this with an API call to the backend.
-    
+    Sends the user's message to the backend chat endpoint and returns the assistant's reply.
+    The backend builds the prompt from its own bounded context for the conversation, so the
+    request size does not grow with the chat history.
+
     Args:
         user_message (str): The message input by the user.
+        conversation_id (str): Identifier of the conversation this message belongs to.
+        user_id (str, optional): The user whose stored preferences should inform the reply.
 
     Returns:
-        str: The simulated response from the assistant.
+        str: The response from the assistant, or an error message if the backend is unavailable.
     """
-    # This is where you would integrate with a backend or AI service to get real responses
-    return f"Assistant's response to: {user_message}"
+    try:
+        response = post_to_backend("/chat", {
+            "message": user_message,
+            "conversation_id": conversation_id,
+            "user_id": user_id
+        })
+        return response["response"]
+    except Exception as e:
+        return f"Sorry, the assistant is unavailable right now ({e})."
@@ -6,13 +6,13 @@ def itinerary_display(itinerary):
 
     Args:
         itinerary (list): A list of dictionaries, where each dictionary contains the details of a stop in the itinerary.
-                          Each dictionary should have at least 'name' and 'time' keys, and can optionally include other keys
-                          like 'transport', 'travel_cost', etc.
+                          Each dictionary should have a 'name' key and either 'start_time'/'end_time' or 'time' keys,
+                          and can optionally include other keys like 'transport', 'travel_cost', etc.
 
     Example of itinerary format:
     [
-        {'name': 'Eiffel Tower', 'time': '09:00', 'transport': 'public_transport', 'travel_cost': 2.5},
-        {'name': 'Louvre Museum', 'time': '11:00', 'transport': 'taxi', 'travel_cost': 15.0}
+        {'name': 'Eiffel Tower', 'start_time': '09:00 AM', 'end_time': '11:00 AM', 'transport': 'walking'},
+        {'name': 'Louvre Museum', 'start_time': '11:15 AM', 'end_time': '02:15 PM', 'transport': 'taxi', 'travel_cost': 3.0}
     ]
     """
 
@@ -28,7 +28,10 @@ def itinerary_display(itinerary):
     for i, stop in enumerate(itinerary):
         # Display stop name and time
         st.subheader(f"Stop {i + 1}: {stop['name']}")
-        st.write(f"Time: {stop['time']}")
+        if 'start_time' in stop:
+            st.write(f"Time: {stop['start_time']} - {stop.get('end_time', '')}")
+        else:
+            st.write(f"Time: {stop['time']}")
 
         # Display additional details such as transport mode and travel cost if available
         if 'transport' in stop:
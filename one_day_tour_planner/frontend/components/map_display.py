@@ -0,0 +1,29 @@
+import streamlit as st
+
+def map_display(itinerary, map_link=None):
+    """
+    Displays the itinerary stops on a map, with a link to directions between them.
+
+    Args:
+        itinerary (list): A list of stop dictionaries; stops with 'latitude' and 'longitude' keys are plotted.
+        map_link (str, optional): A directions link for the whole route.
+    """
+
+    # Displaying a title for the map section
+    st.header("Route Map")
+
+    locations = [
+        {"latitude": stop["latitude"], "longitude": stop["longitude"]}
+        for stop in itinerary or []
+        if stop.get("latitude") is not None and stop.get("longitude") is not None
+    ]
+
+    # Check if there is anything to plot
+    if not locations:
+        st.write("No locations available to show on the map.")
+        return
+
+    st.map(locations)
+
+    if map_link:
+        st.markdown(f"[Open route directions]({map_link})")
@@ -0,0 +1,24 @@
+import streamlit as st
+
+def weather_display(weather_info):
+    """
+    Displays the weather forecast for the day of the tour.
+
+    Args:
+        weather_info (dict): The forecast summary returned by the backend, with 'average_temperature',
+                             'condition' and 'recommendation' keys, or an 'error' key if it is unavailable.
+    """
+
+    # Displaying a title for the weather section
+    st.header("Weather Forecast")
+
+    if not weather_info or "error" in weather_info:
+        st.write("Weather information is currently unavailable.")
+        return
+
+    if weather_info.get("average_temperature") is not None:
+        st.metric("Average Temperature", f"{weather_info['average_temperature']:.1f} °C", help=weather_info.get("date"))
+    st.write(f"Conditions: {weather_info.get('condition', 'unknown')}")
+
+    if weather_info.get("recommendation"):
+        st.info(weather_info["recommendation"])
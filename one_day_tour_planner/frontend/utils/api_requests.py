@@ -1,11 +1,23 @@
+import os
 import sys
-sys.path.append("D:\IIT BOMBAY\Placement Prep\Assignments\Attentions.ai\one_day_tour_planner")
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # Project root, for the shared backend schemas
 import requests
-import json
-from huggingface_integration import HuggingFaceIntegration  # Replaced OpenAI integration with Hugging Face
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from utils.huggingface_integration import HuggingFaceIntegration  # Replaced OpenAI integration with Hugging Face
+from utils.config import (
+    BACKEND_URL, BACKEND_TIMEOUT, BACKEND_POOL_SIZE, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, HUGGINGFACE_MODEL_NAME,
+    ITINERARY_CACHE_TTL, WEATHER_CACHE_TTL, CITY_INFO_CACHE_TTL, AI_SUMMARY_CACHE_TTL, PLACES_CACHE_TTL,
+)
+from backend.database.queries import CITY_INFO_QUERY
 from backend.database.schemas.user_preferences import UserPreferences
+from backend.database.schemas.itinerary import ItineraryEvent, parse_event
 from neo4j import GraphDatabase
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 class APIRequests:
     """
@@ -13,16 +25,24 @@ class APIRequests:
     and generating responses based on the preferences provided.
     """
 
-    def __init__(self, neo4j_driver: GraphDatabase, huggingface_integration: HuggingFaceIntegration):
+    def __init__(self, neo4j_driver: GraphDatabase, huggingface_integration: HuggingFaceIntegration,
+                 city_info_ttl: float = 3600, missing_city_ttl: float = 60):
         """
         Initializes the APIRequests instance with the required database driver and HuggingFace integration instance.
 
         Args:
             neo4j_driver (GraphDatabase): A connected Neo4j driver instance to interact with the database.
             huggingface_integration (HuggingFaceIntegration): An instance of HuggingFaceIntegration to generate responses.
+            city_info_ttl (float): Seconds a city's metadata is served from the cache.
+            missing_city_ttl (float): Seconds an unknown city is remembered as missing, so typos do not hit the database repeatedly.
         """
         self.neo4j_driver = neo4j_driver
         self.huggingface_integration = huggingface_integration
+        self.city_info_ttl = city_info_ttl
+        self.missing_city_ttl = missing_city_ttl
+        # City name -> (expiry time, city info or None)
+        self._city_info_cache: Dict[str, Tuple[float, Optional[Dict]]] = {}
+        self._city_info_lock = threading.Lock()
 
     def collect_preferences(self, preferences: Dict[str, str]) -> Optional[str]:
         """
@@ -39,7 +59,7 @@ class APIRequests:
         if not user_preferences:
             return "Invalid input. Please provide complete preferences."
 
-        # Step 2: Check the city and budget in the database (Neo4j)
+        # Step 2: Check the city and budget in the database (Neo4j), served from the city cache when possible
         city_info = self.get_city_info_from_db(user_preferences.city)
         if not city_info:
             return f"Sorry, we don't have information about {user_preferences.city}. Please try a different city."
@@ -70,6 +90,7 @@ class APIRequests:
     def get_city_info_from_db(self, city: str) -> Optional[Dict]:
         """
         Fetches city-related information from the Neo4j database to check for available tours, activities, etc.
+        Results (including misses) are cached for a while, so a session is only opened on a cache miss.
 
         Args:
             city (str): The city name provided by the user.
@@ -77,20 +98,27 @@ class APIRequests:
         Returns:
             Optional[Dict]: The city-related data if found, or None if not found.
         """
-        query = f"""
-        MATCH (c:City {{name: '{city}'}})
-        RETURN c.name AS city, c.description AS description, c.activities AS activities
-        """
+        now = time.monotonic()
+        with self._city_info_lock:
+            cached = self._city_info_cache.get(city)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        city_info = None
         with self.neo4j_driver.session() as session:
-            result = session.run(query)
-            city_info = result.single()
-            if city_info:
-                return {
-                    "city": city_info["city"],
-                    "description": city_info["description"],
-                    "activities": city_info["activities"]
+            # The city name is passed as a parameter, never formatted into the query
+            record = session.run(CITY_INFO_QUERY, city=city).single()
+            if record:
+                city_info = {
+                    "city": record["city"],
+                    "description": record["description"],
+                    "activities": record["activities"]
                 }
-            return None
+
+        ttl = self.city_info_ttl if city_info else self.missing_city_ttl
+        with self._city_info_lock:
+            self._city_info_cache[city] = (now + ttl, city_info)
+        return city_info
 
     def generate_tour_plan(self, preferences: UserPreferences) -> str:
         """
@@ -106,7 +134,7 @@ class APIRequests:
         prompt = f"Create a fun and engaging one-day tour plan for {preferences.city} starting at {preferences.start_time} with a budget of {preferences.budget}. Include activities that align with the user's interests like {', '.join(preferences.interests)}."
 
         # Use Hugging Face to generate a tour plan (using text generation model like GPT-2, T5, etc.)
-        generated_text = self.huggingface_integration.generate_text(prompt)
+        generated_text = self.huggingface_integration.chat_with_model(prompt)
         
         return generated_text
 
@@ -121,6 +149,214 @@ class APIRequests:
             str: The AI-generated activity suggestions.
         """
         prompt = f"Suggest additional activities and hidden gems in {city} for a one-day tour. Include recommendations for local restaurants, landmarks, and unique experiences."
-        generated_suggestions = self.huggingface_integration.generate_text(prompt)
+        generated_suggestions = self.huggingface_integration.chat_with_model(prompt)
         
         return generated_suggestions
+
+
+# Long-lived clients, created once per Streamlit server process and shared by every rerun and session
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Returns a pooled HTTP session for the backend, so reruns reuse keep-alive connections.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=BACKEND_POOL_SIZE, pool_maxsize=BACKEND_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_neo4j_driver():
+    """
+    Returns the shared Neo4j driver; it keeps its own connection pool.
+    """
+    return GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+
+@st.cache_resource
+def get_huggingface_integration() -> HuggingFaceIntegration:
+    """
+    Returns the text generation model, loaded once instead of on every rerun.
+    """
+    return HuggingFaceIntegration(HUGGINGFACE_MODEL_NAME)
+
+@st.cache_resource
+def get_api_requests() -> APIRequests:
+    """
+    Returns the shared APIRequests instance built on the cached clients.
+    """
+    return APIRequests(get_neo4j_driver(), get_huggingface_integration(), city_info_ttl=CITY_INFO_CACHE_TTL)
+
+def post_to_backend(path: str, payload) -> Dict:
+    """
+    Sends a JSON POST request to the backend over the pooled session.
+
+    Args:
+        path (str): The endpoint path (e.g., '/generate_itinerary').
+        payload: The JSON-serializable request body.
+
+    Returns:
+        Dict: The decoded JSON response.
+
+    Raises:
+        requests.RequestException: If the request fails or the backend returns an error status.
+    """
+    response = get_http_session().post(f"{BACKEND_URL}{path}", json=payload, timeout=BACKEND_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def get_from_backend(path: str, params: Dict) -> Dict:
+    """
+    Sends a GET request to the backend over the pooled session.
+
+    Args:
+        path (str): The endpoint path (e.g., '/weather').
+        params (Dict): The query parameters.
+
+    Returns:
+        Dict: The decoded JSON response.
+
+    Raises:
+        requests.RequestException: If the request fails or the backend returns an error status.
+    """
+    response = get_http_session().get(f"{BACKEND_URL}{path}", params=params, timeout=BACKEND_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def stream_from_backend(path: str, payload) -> Iterator[ItineraryEvent]:
+    """
+    Sends a JSON POST request to a streaming backend endpoint and yields its newline-delimited
+    events as they arrive, instead of waiting for the whole response.
+
+    Args:
+        path (str): The endpoint path (e.g., '/generate_complete_itinerary/stream').
+        payload: The JSON-serializable request body.
+
+    Yields:
+        ItineraryEvent: Each event, decoded into its schema model.
+
+    Raises:
+        requests.RequestException: If the request fails or the backend returns an error status.
+    """
+    with get_http_session().post(f"{BACKEND_URL}{path}", json=payload, timeout=BACKEND_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield parse_event(line)
+
+# Memoized calls, keyed by their arguments. Streamlit reruns the script on every widget change;
+# with these, a rerun with unchanged inputs is answered from the cache without any network call.
+
+def collect_preferences(preferences: Dict) -> str:
+    """
+    Stores the preferences in the backend's memory and returns the user ID they were stored under
+    (a new one unless the preferences carry it). Not memoized: every submission is recorded, and
+    the backend starts precomputing the complete itinerary for it.
+
+    Raises:
+        requests.RequestException: If the request fails or the backend returns an error status.
+    """
+    return post_to_backend("/collect_preferences", preferences)["user_id"]
+
+@st.cache_data(ttl=ITINERARY_CACHE_TTL, show_spinner=False)
+def generate_itinerary(preferences: Dict) -> Dict:
+    return post_to_backend("/generate_itinerary", preferences)
+
+@st.cache_data(ttl=ITINERARY_CACHE_TTL, show_spinner=False)
+def generate_map(locations: List[Tuple[float, float]]) -> Dict:
+    return post_to_backend("/generate_map", [list(location) for location in locations])
+
+@st.cache_data(ttl=ITINERARY_CACHE_TTL, show_spinner=False)
+def generate_complete_itinerary(preferences: Dict) -> Dict:
+    return post_to_backend("/generate_complete_itinerary", preferences)
+
+def stream_complete_itinerary(preferences: Dict) -> Iterator[ItineraryEvent]:
+    """
+    Streams the complete itinerary section by section: the itinerary, the optimized route, the
+    weather, the map link and a final "done" event. Not memoized; callers keep the finished events.
+    """
+    return stream_from_backend("/generate_complete_itinerary/stream", preferences)
+
+@st.cache_data(ttl=WEATHER_CACHE_TTL, show_spinner=False)
+def get_weather(city: str, date: str) -> Dict:
+    return get_from_backend("/weather", {"city": city, "date": date})
+
+@st.cache_data(ttl=PLACES_CACHE_TTL, show_spinner=False)
+def suggest_places(query: str, city: Optional[str] = None, kind: Optional[str] = None) -> List[Dict]:
+    """
+    Returns the backend's typeahead suggestions for a place name; none if the backend is unreachable.
+    """
+    params = {key: value for key, value in {"q": query, "city": city, "kind": kind}.items() if value}
+    try:
+        return get_from_backend("/places/autocomplete", params)["places"]
+    except requests.RequestException:
+        return []
+
+@st.cache_data(ttl=AI_SUMMARY_CACHE_TTL, show_spinner=False)
+def generate_ai_summary(prompt: str, max_length: int = 200) -> str:
+    return get_huggingface_integration().chat_with_model(prompt, max_length=max_length)
+
+class ConcurrentRequests:
+    """
+    Runs independent backend calls on a thread pool and hands back their results in the order
+    they finish, so each page section can be rendered as soon as its own data is available.
+    Rendering stays on the script thread; only the network calls run on the workers.
+
+    Usage:
+        with ConcurrentRequests() as requests_in_flight:
+            requests_in_flight.submit("weather", get_weather, city, date)
+            for name, result, error in requests_in_flight.as_completed():
+                ...
+    """
+
+    def __init__(self, max_workers: int = 4):
+        # Workers get the script's run context so st.cache_data works from them
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            initializer=add_script_run_ctx,
+            initargs=(None, get_script_run_ctx()),
+        )
+        self._futures = {}
+
+    def submit(self, name: str, func: Callable, *args):
+        """
+        Starts a call in the background. May also be called while iterating over as_completed,
+        e.g. to issue a request that depends on a result that just arrived.
+
+        Args:
+            name (str): The section the result belongs to.
+            func (Callable): The function performing the request.
+            *args: Arguments passed to func.
+        """
+        self._futures[self._executor.submit(func, *args)] = name
+
+    def as_completed(self) -> Iterator[Tuple[str, Any, Optional[Exception]]]:
+        """
+        Yields (name, result, error) for each call as soon as it finishes, until none are left.
+        """
+        while self._futures:
+            done, _ = wait(self._futures, return_when=FIRST_COMPLETED)
+            yield from self._results(done)
+
+    def finished(self) -> Iterator[Tuple[str, Any, Optional[Exception]]]:
+        """
+        Yields (name, result, error) for the calls that have already finished, without waiting for
+        the others; for polling in between other work, such as reading a stream.
+        """
+        yield from self._results([future for future in list(self._futures) if future.done()])
+
+    def _results(self, done) -> Iterator[Tuple[str, Any, Optional[Exception]]]:
+        for future in done:
+            name = self._futures.pop(future)
+            try:
+                yield name, future.result(), None
+            except Exception as e:
+                yield name, None, e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Do not block the rerun on calls nobody will read anymore
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -12,6 +12,18 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")  # Default password for
 # Hugging Face configuration (no API key required for most models)
 HUGGINGFACE_MODEL_NAME = os.getenv("HUGGINGFACE_MODEL_NAME", "gpt2")  # Default model for text generation
 
+# Backend API configuration
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")  # Base URL of the FastAPI backend
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "30"))  # Seconds to wait for a backend response
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "10"))  # Keep-alive connections kept open to the backend
+
+# Cache lifetimes (in seconds) for memoized responses
+ITINERARY_CACHE_TTL = int(os.getenv("ITINERARY_CACHE_TTL", "600"))
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "1800"))
+CITY_INFO_CACHE_TTL = int(os.getenv("CITY_INFO_CACHE_TTL", "3600"))
+AI_SUMMARY_CACHE_TTL = int(os.getenv("AI_SUMMARY_CACHE_TTL", "3600"))
+PLACES_CACHE_TTL = int(os.getenv("PLACES_CACHE_TTL", "3600"))
+
 # Ensure that critical configurations are provided
 if not NEO4J_PASSWORD:
     raise ValueError("Neo4j Password is missing! Please set the NEO4J_PASSWORD environment variable.")
@@ -0,0 +1,119 @@
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from neo4j import GraphDatabase
+from database.neo4j_setup import apply_schema
+from database.queries import STORE_PREFERENCE_QUERY
+from utils.config import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+
+# The schema of earlier versions: one Preference node per key and value, shared by every user who chose it
+SHARED_STORE_PREFERENCE_QUERY = """
+MERGE (u:User {id: $user_id})
+MERGE (p:Preference {key: $key, value: $value})
+MERGE (u)-[:HAS_PREFERENCE]->(p)
+"""
+
+SCHEMAS = {"shared": SHARED_STORE_PREFERENCE_QUERY, "per-user": STORE_PREFERENCE_QUERY}
+
+# A key no application code uses, so the benchmark never touches real preferences
+BENCHMARK_KEY = "benchmark_city"
+
+CLEANUP_QUERIES = [
+    "MATCH (p:Preference {key: $key}) CALL { WITH p DETACH DELETE p } IN TRANSACTIONS OF 1000 ROWS",
+    "MATCH (p:UserPreference {key: $key}) CALL { WITH p DETACH DELETE p } IN TRANSACTIONS OF 1000 ROWS",
+    "MATCH (u:User) WHERE u.id STARTS WITH $prefix CALL { WITH u DETACH DELETE u } IN TRANSACTIONS OF 1000 ROWS",
+]
+
+def run_writes(driver, query: str, prefix: str, writes: int, workers: int, popularity: float) -> dict:
+    """
+    Stores one preference for each of `writes` new users from `workers` concurrent sessions. A share
+    `popularity` of the users pick the same value (the popular city); the others pick their own.
+
+    Returns:
+        dict: Throughput in writes per second and the median and 95th percentile latency in milliseconds.
+    """
+    popular = int(writes * popularity)
+
+    def write(index: int) -> float:
+        value = "Paris" if index < popular else f"city-{index}"
+        started = time.monotonic()
+        with driver.session() as session:
+            session.execute_write(lambda tx: tx.run(query, user_id=f"{prefix}{index}", key=BENCHMARK_KEY, value=value).consume())
+        return (time.monotonic() - started) * 1000
+
+    # Interleave popular and unique writes so contention is spread over the whole run
+    order = sorted(range(writes), key=lambda index: (index * 7919) % writes)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = sorted(pool.map(write, order))
+    seconds = time.monotonic() - started
+    return {
+        "writes_per_second": writes / seconds,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    }
+
+def cleanup(driver, prefix: str):
+    with driver.session() as session:
+        for query in CLEANUP_QUERIES:
+            session.run(query, key=BENCHMARK_KEY, prefix=prefix).consume()
+
+def benchmark(driver, writes: int, workers: int, popularities: list) -> dict:
+    """
+    Measures concurrent preference writes for both schemas at each popularity.
+
+    Returns:
+        dict: The run_writes results keyed by (schema, popularity).
+    """
+    with driver.session() as session:
+        apply_schema(session)
+        # The shared schema's MERGE looks nodes up by key and value; give it the index it had
+        session.run("CREATE INDEX benchmark_preference_key_value IF NOT EXISTS FOR (p:Preference) ON (p.key, p.value)").consume()
+    results = {}
+    try:
+        for schema, query in SCHEMAS.items():
+            for popularity in popularities:
+                prefix = f"benchmark-{uuid.uuid4().hex[:8]}-"
+                try:
+                    results[schema, popularity] = run_writes(driver, query, prefix, writes, workers, popularity)
+                finally:
+                    cleanup(driver, prefix)
+    finally:
+        with driver.session() as session:
+            session.run("DROP INDEX benchmark_preference_key_value IF EXISTS").consume()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare concurrent preference write throughput of the shared and per-user schemas as one "
+                    "value gets more popular. Run it against a scratch database.")
+    parser.add_argument("--writes", type=int, default=5000, help="Preference writes per run")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent sessions")
+    parser.add_argument("--popularity", type=float, nargs="+", default=[0.0, 0.5, 0.9, 1.0],
+                        help="Shares of writes that pick the popular value")
+    parser.add_argument("--min-ratio", type=float, default=0.8,
+                        help="Fail if the per-user schema's throughput at the highest popularity falls below this "
+                             "share of its throughput at the lowest")
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        results = benchmark(driver, args.writes, args.workers, sorted(args.popularity))
+    finally:
+        driver.close()
+
+    print(f"{'schema':10} {'popularity':>10} {'writes/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for (schema, popularity), result in results.items():
+        print(f"{schema:10} {popularity:10.2f} {result['writes_per_second']:10.0f} "
+              f"{result['p50_ms']:8.1f} {result['p95_ms']:8.1f}")
+
+    lowest, highest = min(args.popularity), max(args.popularity)
+    ratios = {schema: results[schema, highest]["writes_per_second"] / results[schema, lowest]["writes_per_second"]
+              for schema in SCHEMAS}
+    for schema, ratio in ratios.items():
+        print(f"{schema}: throughput at popularity {highest:.2f} is {ratio:.0%} of popularity {lowest:.2f}")
+    sys.exit(0 if ratios["per-user"] >= args.min_ratio else 1)
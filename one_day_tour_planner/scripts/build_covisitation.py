@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from neo4j import GraphDatabase
+from database.queries import FETCH_TRIP_VISITS_PAGE_QUERY, FETCH_PENDING_TRIP_VISITS_QUERY
+from utils.config import (
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+    COVISITATION_PATH, COVISITATION_STATE_PATH, COVISITATION_TOP_N, COVISITATION_MIN_COUNT,
+)
+from utils.covisitation import CoVisitationCounts, publish_neighbors
+
+def count_page(session, counts: CoVisitationCounts, query: str, state_path: str = None, **params) -> list:
+    """
+    Reads one page of trips, adds them to the counts and commits the removal of their pending label.
+    With a state_path the counts are saved before the commit, so a crash can count a page twice
+    but never loses one.
+
+    Returns:
+        list: The ids of the trips read, in the order returned.
+    """
+    with session.begin_transaction() as tx:
+        records = list(tx.run(query, **params))
+        for record in records:
+            counts.add_trip(record["city"], record["attractions"] or [])
+        if state_path and records:
+            counts.save(state_path)
+        tx.commit()
+    return [record["trip_id"] for record in records]
+
+def rebuild(driver, page_size: int) -> CoVisitationCounts:
+    """
+    Counts every trip from scratch, paging through the trips in id order. If it fails, run it again.
+    """
+    counts, after = CoVisitationCounts(), ""
+    with driver.session() as session:
+        while True:
+            trip_ids = count_page(session, counts, FETCH_TRIP_VISITS_PAGE_QUERY, after=after, limit=page_size)
+            if len(trip_ids) < page_size:
+                return counts
+            after = trip_ids[-1]
+
+def update(driver, counts: CoVisitationCounts, state_path: str, page_size: int) -> CoVisitationCounts:
+    """
+    Adds the trips stored since the last run to the saved counts.
+    """
+    with driver.session() as session:
+        while len(count_page(session, counts, FETCH_PENDING_TRIP_VISITS_QUERY, state_path, limit=page_size)) == page_size:
+            pass
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the attraction co-visitation neighbors from trip histories.")
+    parser.add_argument("--full", action="store_true", help="Recount all trips instead of only the new ones")
+    parser.add_argument("--output", default=COVISITATION_PATH or "covisitation.json")
+    parser.add_argument("--state", default=COVISITATION_STATE_PATH or "covisitation-counts.json")
+    parser.add_argument("--top-n", type=int, default=COVISITATION_TOP_N)
+    parser.add_argument("--min-count", type=int, default=COVISITATION_MIN_COUNT)
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        if args.full or not os.path.exists(args.state):
+            counts = rebuild(driver, args.page_size)
+        else:
+            counts = update(driver, CoVisitationCounts.load(args.state), args.state, args.page_size)
+    finally:
+        driver.close()
+    counts.save(args.state)
+    data = publish_neighbors(args.output, counts, args.top_n, args.min_count)
+    attractions = sum(len(neighbors) for neighbors in data["cities"].values())
+    print(f"Published neighbors for {attractions} attractions from {counts.trips} trips "
+          f"to {args.output} in {time.monotonic() - started:.1f} s")
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from neo4j import GraphDatabase
+from database.queries import CATALOG
+from utils.config import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+
+# Plan operators that touch every node of a label (or of the whole graph) instead of using an index
+SCAN_OPERATORS = ("AllNodesScan", "NodeByLabelScan")
+
+def find_scans(plan) -> list:
+    """
+    Walks a query plan tree and collects the operators that scan whole labels.
+
+    Args:
+        plan: The plan (or profile) returned by the driver for an EXPLAIN / PROFILE query.
+
+    Returns:
+        list: Descriptions of the scanning operators, e.g. 'NodeByLabelScan (c:City)'.
+    """
+    if plan is None:
+        return []
+    operator = plan.get("operatorType", "")
+    scans = []
+    if any(operator.startswith(scan) for scan in SCAN_OPERATORS):
+        details = plan.get("args", {}).get("Details", "")
+        rows = plan.get("rows")
+        scans.append(f"{operator} {details}".strip() + (f" ({rows} rows)" if rows is not None else ""))
+    for child in plan.get("children", []):
+        scans.extend(find_scans(child))
+    return scans
+
+def check_query_plans(uri: str, user: str, password: str, profile: bool = False) -> int:
+    """
+    EXPLAINs every query of the catalog (or PROFILEs the read-only ones) and reports plans that
+    scan a whole label, which usually means a missing index or constraint.
+
+    Args:
+        uri (str): The URI of the Neo4j database.
+        user (str): The username to connect to Neo4j.
+        password (str): The password to connect to Neo4j.
+        profile (bool): Run read-only queries with PROFILE to see actual row counts. Write queries
+                        are always only EXPLAINed, so the database is never modified.
+
+    Returns:
+        int: The number of queries with a label scan in their plan.
+    """
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+    flagged = 0
+    try:
+        with driver.session() as session:
+            for name, query in CATALOG.items():
+                use_profile = profile and query.read_only
+                summary = session.run(("PROFILE " if use_profile else "EXPLAIN ") + query.cypher,
+                                      **query.example_parameters).consume()
+                scans = find_scans(summary.profile if use_profile else summary.plan)
+                if scans:
+                    flagged += 1
+                    print(f"[SCAN] {name}: " + "; ".join(scans))
+                else:
+                    print(f"[ OK ] {name}")
+    finally:
+        driver.close()
+
+    print(f"{flagged} of {len(CATALOG)} catalog queries scan a whole label")
+    return flagged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the plans of all catalog Cypher queries for label scans.")
+    parser.add_argument("--uri", default=NEO4J_URI)
+    parser.add_argument("--user", default=NEO4J_USER)
+    parser.add_argument("--password", default=NEO4J_PASSWORD)
+    parser.add_argument("--profile", action="store_true", help="PROFILE read-only queries instead of only EXPLAINing them")
+    args = parser.parse_args()
+    sys.exit(1 if check_query_plans(args.uri, args.user, args.password, args.profile) else 0)
@@ -1,33 +1,60 @@
+import argparse
+import logging
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
 from neo4j import GraphDatabase
+from agents.itinerary_generator import attractions_db
+from database.bulk_loader import BulkLoader
+from utils.config import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
 
-def initialize_db(uri: str, user: str, password: str):
+def sample_sources() -> dict:
     """
-    Initializes the Neo4j database by creating initial nodes and relationships.
-    This function ensures that the database is set up with the required structure.
-    
+    The built-in sample data (the attractions_db cities and one demo user) in the loader's source format.
+    """
+    return {
+        "cities": [("sample/cities", lambda: [{"name": city} for city in attractions_db])],
+        "attractions": [("sample/attractions", lambda: [dict(attraction, city=city)
+                                                        for city, attractions in attractions_db.items()
+                                                        for attraction in attractions])],
+        "users": [("sample/users", lambda: [{"id": "1", "name": "John Doe"}])],
+        "preferences": [("sample/preferences", lambda: [{"user_id": "1", "key": "city", "value": "Paris"}])],
+        "trips": [("sample/trips", lambda: [{"user_id": "1", "trip_id": "1", "destination": "Paris", "date": "2024-12-01"}])],
+    }
+
+def initialize_db(uri: str, user: str, password: str, data_dir: str = None, **loader_options) -> dict:
+    """
+    Creates the schema and loads data into the Neo4j database: the chunked files under data_dir
+    (<data_dir>/<entity>/*.jsonl[.gz] for cities, attractions, users, preferences and trips), or
+    the built-in sample data. Safe to run again; with a checkpoint it resumes an interrupted load.
+
     Args:
         uri (str): The URI of the Neo4j database.
         user (str): The username to connect to Neo4j.
         password (str): The password to connect to Neo4j.
+        data_dir (str, optional): Directory with the chunked files to load.
+        **loader_options: batch_size, workers and checkpoint_path for the BulkLoader.
+
+    Returns:
+        dict: LoadStats per entity.
     """
-    # Connect to the Neo4j database
     driver = GraphDatabase.driver(uri, auth=(user, password))
-    
-    # Create initial nodes and relationships
-    with driver.session() as session:
-        try:
-            # Create sample nodes for User, Preferences, and Trip
-            session.run("""
-            MERGE (u:User {id: '1', name: 'John Doe'})
-            MERGE (p:Preference {key: 'city', value: 'Paris'})
-            MERGE (t:Trip {id: '1', destination: 'Paris', date: '2024-12-01'})
-            MERGE (u)-[:HAS_PREFERENCE]->(p)
-            MERGE (u)-[:HAS_TRIP]->(t)
-            """)
-            print("Database initialized successfully with sample nodes.")
-        
-        except Exception as e:
-            print(f"Error initializing the database: {e}")
-    
-    # Close the connection
-    driver.close()
+    try:
+        loader = BulkLoader(driver, **loader_options)
+        return loader.load_directory(data_dir) if data_dir else loader.load(sample_sources())
+    finally:
+        driver.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load cities, attractions, users, preferences and trips into Neo4j.")
+    parser.add_argument("--data-dir", help="Directory with <entity>/*.jsonl[.gz] chunks (defaults to the built-in sample data)")
+    parser.add_argument("--checkpoint", help="File recording loaded chunks, so an interrupted load can resume")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    stats = initialize_db(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, args.data_dir,
+                          batch_size=args.batch_size, workers=args.workers, checkpoint_path=args.checkpoint)
+    for entity, entity_stats in stats.items():
+        print(f"{entity:12} {entity_stats.rows:10d} rows {entity_stats.seconds:8.1f} s {entity_stats.rows_per_second:10.0f} rows/s")
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from neo4j import GraphDatabase
+from database.neo4j_setup import apply_schema
+from database.queries import MIGRATE_PREFERENCES_PAGE_QUERY, DELETE_ORPHANED_PREFERENCES_QUERY
+from utils.config import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+
+def migrate_users(driver, page_size: int, after: str = "") -> tuple:
+    """
+    Moves every user's preferences from the shared Preference nodes to their own UserPreference
+    nodes, one page of users per transaction, in user id order. Migrated users have no shared
+    preferences left, so the migration is safe to run again or to resume with `after`.
+
+    Returns:
+        tuple: The number of users paged through and of preference keys migrated.
+    """
+    users = migrated = 0
+    with driver.session() as session:
+        while True:
+            records = session.execute_write(
+                lambda tx: list(tx.run(MIGRATE_PREFERENCES_PAGE_QUERY, after=after, limit=page_size)))
+            if not records:
+                return users, migrated
+            users += len(records)
+            migrated += sum(record["migrated"] for record in records)
+            after = records[-1]["user_id"]
+            print(f"Migrated users up to {after!r} ({users} users, {migrated} preferences)")
+
+def delete_orphans(driver, page_size: int) -> int:
+    """
+    Deletes the shared Preference nodes no user refers to anymore, a page at a time.
+    """
+    deleted = 0
+    with driver.session() as session:
+        while True:
+            page = session.execute_write(
+                lambda tx: tx.run(DELETE_ORPHANED_PREFERENCES_QUERY, limit=page_size).single()["deleted"])
+            deleted += page
+            if page < page_size:
+                return deleted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate shared Preference nodes to per-user UserPreference nodes.")
+    parser.add_argument("--after", default="", help="Resume after this user id (printed by an interrupted run)")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--keep-orphans", action="store_true",
+                        help="Leave the shared Preference nodes in place, e.g. while older app versions still run")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        # The UserPreference constraint must exist before the MERGEs, or they scan the label
+        with driver.session() as session:
+            apply_schema(session)
+        users, migrated = migrate_users(driver, args.page_size, args.after)
+        deleted = 0 if args.keep_orphans else delete_orphans(driver, args.page_size)
+    finally:
+        driver.close()
+    print(f"Migrated {migrated} preferences of {users} users and deleted {deleted} shared nodes "
+          f"in {time.monotonic() - started:.1f} s")
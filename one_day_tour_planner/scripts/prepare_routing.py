@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from utils.config import ROUTING_DATA_DIR, ROUTING_CACHE_DIR
+from utils.routing import RoutingEngine, MODE_PROFILES
+
+def prepare_routing(data_dir: str, cache_dir: str, cities: list = None):
+    """
+    Builds and persists the contraction hierarchy of every city and transport mode, so that
+    workers only load them instead of preprocessing on the first request.
+
+    Args:
+        data_dir (str): Directory with one street-graph extract (nodes.csv, edges.csv) per city.
+        cache_dir (str): Where the hierarchies are saved; the backend must use the same ROUTING_CACHE_DIR.
+        cities (list, optional): Only prepare these cities.
+    """
+    engine = RoutingEngine(data_dir, cache_dir)
+    for city in cities or sorted(os.listdir(data_dir)):
+        if not engine.has_city(city):
+            continue
+        router = engine.router(city)
+        for mode in MODE_PROFILES:
+            started = time.perf_counter()
+            router.hierarchy(mode)
+            print(f"{city} / {mode}: {len(router.node_ids)} nodes ready in {time.perf_counter() - started:.1f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess street graphs for the routing engine.")
+    parser.add_argument("--data-dir", default=ROUTING_DATA_DIR)
+    parser.add_argument("--cache-dir", default=ROUTING_CACHE_DIR)
+    parser.add_argument("cities", nargs="*")
+    args = parser.parse_args()
+    if not args.data_dir or not args.cache_dir:
+        parser.error("--data-dir and --cache-dir (or ROUTING_DATA_DIR and ROUTING_CACHE_DIR) are required")
+    prepare_routing(args.data_dir, args.cache_dir, args.cities)
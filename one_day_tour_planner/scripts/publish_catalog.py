@@ -0,0 +1,43 @@
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from agents.itinerary_generator import attractions_db
+from utils.config import ATTRACTION_CATALOG_DIR, EMBEDDING_MODEL_NAME, EMBEDDINGS_FLOAT16, EMBEDDINGS_ANN_THRESHOLD
+from utils.shared_catalog import publish_catalog
+
+def load_attractions(path: str = None) -> dict:
+    """
+    Loads the attractions to publish: a JSON file in the attractions_db format, or the built-in sample data.
+    """
+    if not path:
+        return attractions_db
+    with open(path) as source:
+        return json.load(source)
+
+def compute_embeddings(attractions_by_city: dict, model_name: str) -> dict:
+    """
+    Embeds every attraction once, so workers can build their interest indexes without the encoder.
+    """
+    from utils.embeddings import HuggingFaceEmbedder, InterestMatcher
+
+    embedder = HuggingFaceEmbedder(model_name)
+    return {
+        city: embedder.encode([InterestMatcher.attraction_text(a) for a in attractions])
+        for city, attractions in attractions_by_city.items()
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish a new version of the shared attraction catalog.")
+    parser.add_argument("--directory", default=ATTRACTION_CATALOG_DIR or "/dev/shm/attractions")
+    parser.add_argument("--source", help="JSON file with attractions per city (defaults to the built-in catalog)")
+    parser.add_argument("--embeddings", action="store_true", help="Precompute attraction embeddings with EMBEDDING_MODEL_NAME")
+    parser.add_argument("--keep-versions", type=int, default=2)
+    args = parser.parse_args()
+
+    attractions = load_attractions(args.source)
+    embeddings = compute_embeddings(attractions, EMBEDDING_MODEL_NAME) if args.embeddings else None
+    version = publish_catalog(args.directory, attractions, embeddings, keep_versions=args.keep_versions,
+                              use_float16=EMBEDDINGS_FLOAT16, ann_threshold=EMBEDDINGS_ANN_THRESHOLD)
+    print(f"Published catalog version {version} ({sum(map(len, attractions.values()))} attractions) to {args.directory}")
@@ -0,0 +1,140 @@
+import time
+import unittest
+from fastapi.testclient import TestClient
+from agents.itinerary_generator import ItineraryGenerator
+from agents.optimization_agent import OptimizationAgent
+from agents.map_generator import MapGenerator
+from main import (
+    app, get_itinerary_generator, get_optimization_agent, get_weather_agent, get_map_generator, get_gazetteer,
+    get_speculator,
+)
+from database.schemas.itinerary import parse_event, merge_events
+from utils.gazetteer import Gazetteer
+
+
+class FakeWeatherAgent:
+    def fetch_weather(self, city: str, date: str, deadline=None) -> dict:
+        return {"date": date, "average_temperature": 20.0, "condition": "clear sky"}
+
+    def fetch_weather_for_itinerary(self, city: str, date: str, itinerary: list, deadline=None) -> list:
+        for stop in itinerary:
+            stop["weather"] = {"temperature": 20.0, "condition": "clear sky"}
+        return itinerary
+
+
+class StalledWeatherAgent(FakeWeatherAgent):
+    """Behaves like a weather service that does not answer before the deadline."""
+
+    def fetch_weather(self, city: str, date: str, deadline=None) -> dict:
+        time.sleep(deadline.remaining())
+        deadline.mark_degraded("weather", "Forecast unavailable: read timed out")
+        return {"error": "Failed to retrieve weather data: read timed out"}
+
+
+class TestFullFlow(unittest.TestCase):
+    gazetteer = Gazetteer.from_catalog(ItineraryGenerator().catalog)
+
+    def setUp(self):
+        # Real in-process agents, fake weather; no Neo4j or network needed
+        app.dependency_overrides[get_itinerary_generator] = lambda: ItineraryGenerator()
+        app.dependency_overrides[get_optimization_agent] = lambda: OptimizationAgent()
+        app.dependency_overrides[get_weather_agent] = FakeWeatherAgent
+        app.dependency_overrides[get_map_generator] = lambda: MapGenerator()
+        app.dependency_overrides[get_gazetteer] = lambda: self.gazetteer
+        app.dependency_overrides[get_speculator] = lambda: None
+        self.client = TestClient(app)
+        self.preferences = {
+            "city": "Rome",
+            "start_time": "09:00",
+            "end_time": "17:00",
+            "budget": 50.0,
+            "interests": ["historical"],
+        }
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def test_generate_itinerary(self):
+        response = self.client.post("/generate_itinerary", json=self.preferences)
+        self.assertEqual(response.status_code, 200)
+        names = [stop["name"] for stop in response.json()["itinerary"]]
+        self.assertEqual(names, ["Colosseum", "Roman Forum", "Pantheon"])
+        metrics = self.client.get("/admin/metrics").json()
+        self.assertGreaterEqual(metrics["singleflight"]["generate_itinerary"]["calls"], 1)
+
+    def test_generate_complete_itinerary(self):
+        response = self.client.post("/generate_complete_itinerary", json=self.preferences)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body["optimized_route"]), len(body["itinerary"]))
+        self.assertEqual(body["weather_info"]["condition"], "clear sky")
+        self.assertIn("X-Trace-Id", response.headers)
+        self.assertIsNone(body["degraded"])
+
+    def test_stream_complete_itinerary(self):
+        response = self.client.post("/generate_complete_itinerary/stream", json=self.preferences)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        events = [parse_event(line) for line in response.text.splitlines()]
+        self.assertEqual([event.event for event in events], ["itinerary", "optimized_route", "weather", "map", "done"])
+        self.assertEqual([event.elapsed_ms for event in events], sorted(event.elapsed_ms for event in events))
+        # The admission slot was held while the body streamed and released at its end
+        self.assertEqual(self.client.get("/admin/metrics").json()["admission"]["in_flight"], 0)
+
+        # The merged stream is the same itinerary the non-streaming endpoint returns
+        complete = self.client.post("/generate_complete_itinerary", json=self.preferences).json()
+        merged = merge_events(events)
+        self.assertEqual(merged["itinerary"], [{key: value for key, value in stop.items() if value is not None}
+                                               for stop in complete["itinerary"]])
+        self.assertEqual(merged["optimized_route"][0]["weather"]["condition"], "clear sky")
+        self.assertEqual(merged["weather_info"], complete["weather_info"])
+
+    def test_stream_complete_itinerary_as_server_sent_events(self):
+        app.dependency_overrides[get_weather_agent] = StalledWeatherAgent
+        response = self.client.post("/generate_complete_itinerary/stream", json=self.preferences,
+                                    headers={"Accept": "text/event-stream", "X-Deadline-Ms": "50"})
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        messages = [dict(line.split(": ", 1) for line in message.splitlines())
+                    for message in response.text.strip().split("\n\n")]
+        events = [parse_event(message["data"]) for message in messages]
+        self.assertEqual([message["event"] for message in messages], [event.event for event in events])
+        self.assertIsNone(events[2].optimized_route)  # no forecast, so the route is not resent
+        self.assertEqual(set(events[-1].degraded), {"weather", "map"})
+
+    def test_optimize_route_with_alternatives(self):
+        itinerary = self.client.post("/generate_itinerary", json=self.preferences).json()["itinerary"]
+        response = self.client.post("/optimize_route?alternatives=2",
+                                    json={"preferences": self.preferences, "itinerary": itinerary})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body["optimized_route"]), 3)
+        self.assertTrue(1 <= len(body["alternatives"]) <= 2)
+
+    def test_place_typeahead_and_starting_point(self):
+        response = self.client.get("/places/autocomplete", params={"q": "spa", "city": "Rome"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([place["name"] for place in response.json()["places"]], ["Spanish Steps"])
+
+        preferences = dict(self.preferences, interests=["historical", "relaxing"], starting_point="Spanish Steps")
+        body = self.client.post("/generate_complete_itinerary", json=preferences).json()
+        self.assertEqual(body["starting_point"]["kind"], "landmark")
+        self.assertEqual(body["optimized_route"][0]["name"], "Spanish Steps")
+
+        preferences["starting_point"] = "Atlantis"
+        body = self.client.post("/generate_complete_itinerary", json=preferences).json()
+        self.assertIn("starting_point", body["degraded"])
+        self.assertEqual(len(body["optimized_route"]), 5)
+
+    def test_stalled_weather_degrades_instead_of_failing(self):
+        app.dependency_overrides[get_weather_agent] = StalledWeatherAgent
+        response = self.client.post("/generate_complete_itinerary", json=self.preferences,
+                                    headers={"X-Deadline-Ms": "50"})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(set(body["degraded"]), {"weather", "map"})
+        self.assertEqual(len(body["optimized_route"]), 3)
+        self.assertIsNone(body["optimized_route"][0]["weather"])
+
+
+if __name__ == "__main__":
+    unittest.main()
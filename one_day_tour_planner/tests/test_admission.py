@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+from utils.admission import AdmissionController, AdmissionRejected, RequestClass
+
+CLASSES = {
+    "read": RequestClass(priority=0, max_concurrent=10),
+    "planning": RequestClass(priority=2, max_concurrent=1),
+}
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_queued_reads_are_served_before_planning(self):
+        controller = AdmissionController(CLASSES, max_concurrent=1, max_queue=10, max_wait=1.0)
+        order = []
+
+        async def request(name, label):
+            async with controller.admit(name):
+                order.append(label)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            first = asyncio.ensure_future(request("planning", "first"))
+            await asyncio.sleep(0)
+            queued = [asyncio.ensure_future(request("planning", "planning")),
+                      asyncio.ensure_future(request("read", "read"))]
+            await asyncio.gather(first, *queued)
+
+        asyncio.run(run())
+        self.assertEqual(order, ["first", "read", "planning"])
+        self.assertEqual(controller.stats()["classes"]["read"]["admitted"], 1)
+
+    def test_class_limit_leaves_room_for_other_classes(self):
+        controller = AdmissionController(CLASSES, max_concurrent=4, max_queue=10, max_wait=0.05)
+
+        async def run():
+            async with controller.admit("planning"):
+                # Planning is at its limit of one, but reads still start right away
+                await asyncio.wait_for(controller.acquire("read"), 0.01)
+                controller.release("read")
+                with self.assertRaises(AdmissionRejected):
+                    await controller.acquire("planning")
+
+        asyncio.run(run())
+        self.assertEqual(controller.stats()["classes"]["planning"]["rejected"], 1)
+
+    def test_full_queue_sheds_lowest_priority_first(self):
+        controller = AdmissionController(CLASSES, max_concurrent=1, max_queue=1, max_wait=1.0)
+
+        async def run():
+            await controller.acquire("read")
+            planning = asyncio.ensure_future(controller.acquire("planning"))
+            await asyncio.sleep(0)
+            read = asyncio.ensure_future(controller.acquire("read"))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected) as rejected:
+                await planning
+            self.assertGreaterEqual(rejected.exception.retry_after, 1)
+            controller.release("read")
+            await read
+
+        asyncio.run(run())
+        stats = controller.stats()
+        self.assertEqual((stats["in_flight"], stats["queue_depth"]), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
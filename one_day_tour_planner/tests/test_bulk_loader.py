@@ -0,0 +1,151 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from database.bulk_loader import BulkLoader, find_chunks
+from database.queries import (
+    SCHEMA_QUERIES, LIST_PLAIN_INDEXES_QUERY, BATCH_STORE_PREFERENCES_QUERY, LOCK_PROFILE_SOURCES_PAGE_QUERY,
+    BATCH_WRITE_PROFILES_QUERY, LOAD_USERS_QUERY,
+)
+from database.schemas.memory import InterestProfile
+
+
+class FakeDriver:
+    """Records statements and batches; rows of the UNWIND queries are kept per query."""
+
+    def __init__(self, fail_on=None):
+        self.lock = threading.Lock()
+        self.statements, self.rows, self.profiles = [], {}, {}
+        self.in_flight, self.conflicts = set(), set()
+        self.fail_on = fail_on
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, work, *args):
+        return work(self, *args)
+
+    execute_read = execute_write
+
+    def run(self, query, **params):
+        driver = self.driver
+        with driver.lock:
+            driver.statements.append(query)
+            if query == LIST_PLAIN_INDEXES_QUERY:
+                return FakeResult([{"name": "index_1", "labels": ["User"], "properties": ["id"]},
+                                   {"name": "index_2", "labels": ["Preference"], "properties": ["key", "value"]}])
+            if query == LOCK_PROFILE_SOURCES_PAGE_QUERY:
+                users = sorted(row["id"] for row in driver.rows.get(LOAD_USERS_QUERY, []) if row["id"] > params["after"])
+                preferences = driver.rows.get(BATCH_STORE_PREFERENCES_QUERY, [])
+                return FakeResult([{"user_id": user, "trips": [],
+                                    "preferences": [p for p in preferences if p["user_id"] == user]}
+                                   for user in users[:params["limit"]]])
+            if query == BATCH_WRITE_PROFILES_QUERY:
+                driver.profiles.update({row["user_id"]: row["profile"] for row in params["rows"]})
+                return FakeResult([])
+            if "rows" not in params:
+                return FakeResult([])
+            if driver.fail_on and any(driver.fail_on(row) for row in params["rows"]):
+                raise RuntimeError("transaction failed")
+            driver.rows.setdefault(query, []).extend(params["rows"])
+            # A user node locked by two transactions at the same time (preferences and trips both lock it)
+            keys = {row["user_id"] for row in params["rows"] if "user_id" in row}
+            driver.conflicts |= keys & driver.in_flight
+            driver.in_flight |= keys
+        time.sleep(0.001)
+        with driver.lock:
+            driver.in_flight -= keys
+        return FakeResult([])
+
+
+class FakeResult(list):
+    def consume(self):
+        return None
+
+
+def write_chunk(path, rows, compress=False):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with (gzip.open(path, "wt") if compress else open(path, "w")) as output:
+        output.write("\n".join(json.dumps(row) for row in rows) + "\n")
+
+
+class TestBulkLoader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_dir = self.directory.name
+        write_chunk(os.path.join(self.data_dir, "users", "part-0.jsonl"), [{"id": i, "name": f"user {i}"} for i in range(10)])
+        for part in range(3):
+            write_chunk(os.path.join(self.data_dir, "preferences", f"part-{part}.jsonl.gz"),
+                        [{"user_id": user, "key": "interests", "value": ["food", "historical"][(user + part) % 2]}
+                         for user in range(10)], compress=True)
+        self.checkpoint = os.path.join(self.data_dir, "checkpoint.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_loads_chunks_in_batches_after_creating_the_schema(self):
+        driver = FakeDriver()
+        stats = BulkLoader(driver, batch_size=4, workers=3).load_directory(self.data_dir)
+
+        self.assertEqual(len(find_chunks(self.data_dir, "preferences")), 3)
+        self.assertEqual(driver.statements[1:3], ["DROP INDEX `index_1` IF EXISTS", "DROP INDEX `index_2` IF EXISTS"])
+        self.assertEqual(driver.statements[3:3 + len(SCHEMA_QUERIES)], SCHEMA_QUERIES)
+        self.assertEqual((stats["users"].rows, stats["preferences"].rows, stats["trips"].rows), (10, 30, 0))
+        self.assertGreater(stats["preferences"].rows_per_second, 0)
+        self.assertEqual(sorted(row["id"] for row in driver.rows[LOAD_USERS_QUERY]), sorted(str(i) for i in range(10)))
+        # Rows locking the same user go to one partition, whose batches never overlap
+        self.assertEqual(driver.conflicts, set())
+        # Profiles are rebuilt from everything that was loaded
+        self.assertEqual(stats["profiles"].rows, 10)
+        self.assertEqual(InterestProfile.from_json(driver.profiles["0"]).observations, 3)
+
+    def test_trips_of_a_user_are_written_by_one_session(self):
+        write_chunk(os.path.join(self.data_dir, "trips", "part-0.jsonl"),
+                    [{"user_id": trip % 3, "trip_id": f"t{trip}", "city": "Rome"} for trip in range(60)])
+        driver = FakeDriver()
+        stats = BulkLoader(driver, batch_size=2, workers=4).load_directory(self.data_dir)
+        self.assertEqual(stats["trips"].rows, 60)
+        self.assertEqual(driver.conflicts, set())
+
+    def test_batches_of_a_partition_commit_in_the_order_they_were_read(self):
+        write_chunk(os.path.join(self.data_dir, "preferences", "part-3.jsonl"),
+                    [{"user_id": 0, "key": "city", "value": f"city-{index}"} for index in range(40)])
+        driver = FakeDriver()
+        BulkLoader(driver, batch_size=1, workers=2).load_directory(self.data_dir, rebuild_profiles=False)
+        written = [row["value"] for row in driver.rows[BATCH_STORE_PREFERENCES_QUERY] if row["key"] == "city"]
+        self.assertEqual(written, [f"city-{index}" for index in range(40)])
+
+    def test_interrupted_load_resumes_after_the_last_finished_chunk(self):
+        failing = FakeDriver(fail_on=lambda row: row.get("value") == "historical" and row["user_id"] == "9")
+        with self.assertRaises(RuntimeError):
+            BulkLoader(failing, batch_size=5, workers=2, checkpoint_path=self.checkpoint).load_directory(self.data_dir)
+        with open(self.checkpoint) as source:
+            done = json.load(source)["chunks"]
+        self.assertIn(os.path.join("users", "part-0.jsonl"), done)
+
+        driver = FakeDriver()
+        stats = BulkLoader(driver, batch_size=5, workers=2, checkpoint_path=self.checkpoint).load_directory(self.data_dir)
+        self.assertEqual(stats["users"].rows, 0)
+        self.assertEqual(stats["preferences"].rows + sum(v for k, v in done.items() if k.startswith("preferences")), 30)
+
+        # A completed load does nothing when run again
+        stats = BulkLoader(FakeDriver(), checkpoint_path=self.checkpoint).load_directory(self.data_dir)
+        self.assertEqual(sum(entity.rows for entity in stats.values()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from utils.conversation import ConversationManager, truncate_to_tokens
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+class TestConversationManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = ConversationManager(count_tokens=count_words, max_prompt_tokens=120,
+                                           summary_tokens=30, preference_tokens=15)
+
+    def test_prompt_stays_within_budget_over_long_conversations(self):
+        for i in range(200):
+            prompt, tokens = self.manager.build_prompt("c1", f"Message number {i}. Tell me more about the Colosseum please.")
+            self.manager.record_reply("c1", f"Reply number {i}. The Colosseum opens at nine and tickets cost fifteen euros.")
+            self.assertLessEqual(tokens, 120)
+
+        # The latest turn is verbatim, older ones only survive as summary lines
+        self.assertIn("User: Message number 199.", prompt)
+        self.assertIn("Earlier in the conversation:", prompt)
+        self.assertNotIn("Message number 0.", prompt)
+        self.assertTrue(prompt.endswith("Assistant:"))
+
+    def test_preferences_are_loaded_once_and_injected(self):
+        calls = []
+
+        def load_preferences():
+            calls.append(1)
+            return {"city": "Rome", "budget": "50"}
+
+        self.manager.build_prompt("c2", "Where should I start?", load_preferences)
+        prompt, _ = self.manager.build_prompt("c2", "And after that?", load_preferences)
+
+        self.assertEqual(len(calls), 1)
+        self.assertIn("User preferences: city: Rome; budget: 50", prompt)
+
+    def test_oversized_message_is_truncated(self):
+        prompt, tokens = self.manager.build_prompt("c3", "word " * 1000)
+        self.assertLessEqual(tokens, 120)
+
+    def test_least_recently_used_conversations_are_evicted(self):
+        manager = ConversationManager(count_tokens=count_words, max_conversations=2)
+        for conversation_id in ("a", "b", "c"):
+            manager.build_prompt(conversation_id, "hello")
+        self.assertNotIn("a", manager._conversations)
+
+    def test_tokens_are_not_counted_until_the_first_prompt(self):
+        counted = []
+        manager = ConversationManager(count_tokens=lambda text: counted.append(text) or count_words(text))
+        self.assertEqual(counted, [])
+        manager.build_prompt("c4", "hello")
+        self.assertIn(ConversationManager.SYSTEM_LINE, counted)
+
+    def test_truncate_to_tokens(self):
+        self.assertEqual(truncate_to_tokens("one two three", 5, count_words), "one two three")
+        self.assertEqual(truncate_to_tokens("one two three four", 2, count_words), "one two...")
+
+
+if __name__ == "__main__":
+    unittest.main()
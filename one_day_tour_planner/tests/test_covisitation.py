@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from agents.itinerary_generator import ItineraryGenerator
+from utils.covisitation import CoVisitationCounts, CoVisitationIndex, publish_neighbors
+
+TRIPS = [
+    ("Rome", ["Colosseum", "Roman Forum", "Pantheon"]),
+    ("Rome", ["Colosseum", "Roman Forum"]),
+    ("Rome", ["Trevi Fountain", "Spanish Steps", "Colosseum"]),
+    ("Rome", ["Trevi Fountain", "Spanish Steps"]),
+    ("Paris", ["Eiffel Tower", "Seine River Cruise"]),
+]
+
+
+class TestCoVisitation(unittest.TestCase):
+    def test_neighbors_are_weighted_by_cosine(self):
+        counts = CoVisitationCounts()
+        for city, attractions in TRIPS:
+            counts.add_trip(city, attractions + attractions[:1])  # repeats within a trip count once
+        self.assertEqual(counts.count("Rome", "Roman Forum", "Colosseum"), 2)
+
+        neighbors = counts.top_neighbors(top_n=2)
+        # 2 shared trips / sqrt(3 Colosseum trips * 2 Roman Forum trips)
+        self.assertEqual(neighbors["Rome"]["Colosseum"][0], ("Roman Forum", round(2 / 6 ** 0.5, 6)))
+        self.assertEqual(len(neighbors["Rome"]["Colosseum"]), 2)
+        self.assertNotIn("Colosseum", dict(neighbors["Paris"]))
+
+    def test_incremental_update_matches_full_rebuild(self):
+        full = CoVisitationCounts()
+        for city, attractions in TRIPS:
+            full.add_trip(city, attractions)
+
+        with tempfile.TemporaryDirectory() as directory:
+            state_path = os.path.join(directory, "counts.json")
+            first = CoVisitationCounts()
+            for city, attractions in TRIPS[:2]:
+                first.add_trip(city, attractions)
+            first.save(state_path)
+            resumed = CoVisitationCounts.load(state_path)
+            for city, attractions in TRIPS[2:]:
+                resumed.add_trip(city, attractions)
+
+        self.assertEqual(resumed.to_dict(), full.to_dict())
+        self.assertEqual(resumed.top_neighbors(), full.top_neighbors())
+
+    def test_index_follows_the_published_file(self):
+        counts = CoVisitationCounts()
+        counts.add_trip(*TRIPS[0])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "covisitation.json")
+            index = CoVisitationIndex(path, check_interval=0)
+            self.assertEqual(index.neighbors("Rome", "Colosseum"), {})
+
+            publish_neighbors(path, counts)
+            self.assertEqual(index.weight("Rome", "Pantheon", "Colosseum"), 1.0)
+            for city, attractions in TRIPS[1:]:
+                counts.add_trip(city, attractions)
+            publish_neighbors(path, counts)
+            self.assertLess(index.weight("Rome", "Pantheon", "Colosseum"), 1.0)
+
+    def test_generator_ranks_attractions_visited_together_first(self):
+        counts = CoVisitationCounts()
+        for city, attractions in TRIPS:
+            counts.add_trip(city, attractions)
+        generator = ItineraryGenerator(covisitation=CoVisitationIndex.from_neighbors(counts.top_neighbors()))
+
+        itinerary = generator.generate_itinerary("Rome", ["historical", "relaxing"], "09:00")
+        self.assertEqual([stop["name"] for stop in itinerary][:2], ["Colosseum", "Roman Forum"])
+        ranked = generator.rank_attractions("Rome", generator.filter_attractions("Rome", ["historical", "relaxing"]),
+                                            anchors=["Spanish Steps"])
+        self.assertEqual(ranked[0]["name"], "Trevi Fountain")
+        # Without co-visitation data the catalog order is kept
+        self.assertEqual([stop["name"] for stop in ItineraryGenerator().generate_itinerary("Rome", ["historical"], "09:00")],
+                         ["Colosseum", "Roman Forum", "Pantheon"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from agents.itinerary_generator import attractions_db
+from utils.gazetteer import Gazetteer, Place, normalize
+
+PLACES = [
+    Place("Paris", "city", "Paris", 48.8566, 2.3522, 100),
+    Place("Parma", "city", "Parma", 44.8015, 10.3279, 10),
+    Place("Le Marais", "neighborhood", "Paris", 48.8590, 2.3620),
+    Place("Parc des Buttes-Chaumont", "landmark", "Paris", 48.8809, 2.3828),
+    Place("Eiffel Tower", "landmark", "Paris", 48.8584, 2.2945),
+    Place("Trastevere", "neighborhood", "Rome", 41.8897, 12.4695),
+    Place("Café de Flore", "landmark", "Paris", 48.8541, 2.3326),
+]
+
+
+class TestGazetteer(unittest.TestCase):
+    def setUp(self):
+        self.gazetteer = Gazetteer(PLACES, precomputed_length=2)
+
+    def names(self, places):
+        return [place.name for place in places]
+
+    def test_prefix_search_ranks_cities_and_matches_inner_words(self):
+        self.assertEqual(self.names(self.gazetteer.search("par"))[:2], ["Paris", "Parma"])
+        self.assertEqual(self.names(self.gazetteer.search("tow")), ["Eiffel Tower"])
+        self.assertEqual(self.names(self.gazetteer.search("buttes ch")), ["Parc des Buttes-Chaumont"])
+        self.assertEqual(self.names(self.gazetteer.search("CAFE")), ["Café de Flore"])
+        self.assertEqual(self.gazetteer.search("  "), [])
+
+    def test_precomputed_short_prefixes_agree_with_a_full_scan(self):
+        unprecomputed = Gazetteer(PLACES, precomputed_length=0)
+        for prefix in ("p", "pa", "t", "e"):
+            self.assertEqual(self.gazetteer.search(prefix, limit=5), unprecomputed.search(prefix, limit=5), prefix)
+
+    def test_filters_by_city_and_kind(self):
+        self.assertEqual(self.names(self.gazetteer.search("pa", city="paris")),
+                         ["Paris", "Parc des Buttes-Chaumont"])
+        self.assertEqual(self.names(self.gazetteer.search("pa", kind="city")), ["Paris", "Parma"])
+
+    def test_resolves_starting_points(self):
+        self.assertEqual(self.gazetteer.resolve("le marais", "Paris").kind, "neighborhood")
+        self.assertEqual(self.gazetteer.resolve("Eiffel", "Paris").name, "Eiffel Tower")
+        place = self.gazetteer.resolve(" 41.9, 12.48 ", "Rome")
+        self.assertEqual((place.kind, place.latitude, place.longitude), ("coordinates", 41.9, 12.48))
+        self.assertEqual(self.gazetteer.resolve("Trastevere", "Paris").city, "Rome")  # exact names win over the city
+        self.assertIsNone(self.gazetteer.resolve("Atlantis", "Paris"))
+        self.assertIsNone(self.gazetteer.resolve("95, 12", "Rome"))
+
+    def test_loads_from_csv_and_catalog(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "places.csv")
+            with open(path, "w") as output:
+                output.write("name,kind,city,latitude,longitude,importance\nPantheon,landmark,Rome,41.8986,12.4769,\n")
+            self.assertEqual(Gazetteer.from_csv(path).resolve("pantheon").city, "Rome")
+
+        gazetteer = Gazetteer.from_catalog(attractions_db)
+        self.assertEqual(len(gazetteer), len(attractions_db) + sum(map(len, attractions_db.values())))
+        rome = gazetteer.resolve("Rome")
+        self.assertEqual(rome.kind, "city")
+        self.assertAlmostEqual(rome.latitude, 41.898, places=2)
+        self.assertEqual(normalize("Trevi-Fountain "), "trevi fountain")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+from agents.itinerary_generator import ItineraryGenerator
+from database.schemas.memory import InterestProfile
+from utils.deadline import Deadline
+from utils.embeddings import InterestMatcher, VectorIndex
+
+# Toy embedding space: texts mentioning these words point along the same axis
+TOPICS = {"histor": 0, "museum": 0, "food": 1, "relax": 2, "shop": 3}
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        vectors = np.full((len(texts), len(set(TOPICS.values()))), 0.01, dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word, axis in TOPICS.items():
+                if word in text.lower():
+                    vectors[row, axis] = 1.0
+        return vectors
+
+
+class TestItineraryGenerator(unittest.TestCase):
+    def test_exact_category_matching_without_matcher(self):
+        itinerary = ItineraryGenerator().generate_itinerary("Rome", ["food"], "09:00")
+        self.assertEqual([stop["name"] for stop in itinerary], ["Piazza Navona"])
+        self.assertEqual(itinerary[0]["start_time"], "09:00 AM")
+
+    def test_similar_interests_match_related_categories(self):
+        generator = ItineraryGenerator(InterestMatcher(FakeEmbedder(), min_score=0.9))
+        names = [a["name"] for a in generator.filter_attractions("Paris", ["History"])]
+        self.assertEqual(names, ["Eiffel Tower", "Louvre Museum", "Notre Dame"])
+
+    def test_attractions_and_interests_are_embedded_once(self):
+        embedder = FakeEmbedder()
+        generator = ItineraryGenerator(InterestMatcher(embedder))
+        generator.filter_attractions("Rome", ["history", "food"])
+        generator.filter_attractions("Rome", ["history", "food"])
+        self.assertEqual(len(embedder.encoded), 6 + 2)
+
+    def test_interest_profile_puts_favorite_categories_first(self):
+        profile = InterestProfile()
+        profile.add_interests(["relaxing"])
+        profile.add_interests(["relaxing", "food"])
+
+        class Profiles:
+            def fetch_profile(self, user_id, deadline=None):
+                return profile if user_id == "u1" else None
+
+        generator = ItineraryGenerator(profiles=Profiles())
+        interests = ["historical", "food", "relaxing"]
+        without = [stop["name"] for stop in generator.generate_itinerary("Rome", interests, "09:00")]
+        with_profile = [stop["name"] for stop in generator.generate_itinerary("Rome", interests, "09:00", user_id="u1")]
+        self.assertEqual(without[:3], ["Colosseum", "Roman Forum", "Pantheon"])
+        self.assertEqual(with_profile, ["Trevi Fountain", "Spanish Steps", "Piazza Navona",
+                                        "Colosseum", "Roman Forum", "Pantheon"])
+        self.assertEqual(generator.generate_itinerary("Rome", interests, "09:00", user_id="u2"),
+                         generator.generate_itinerary("Rome", interests, "09:00"))
+
+    def test_exact_matches_are_kept_when_the_matcher_fails(self):
+        class BrokenEmbedder:
+            def encode(self, texts):
+                raise ImportError("No module named 'transformers'")
+
+        generator = ItineraryGenerator(InterestMatcher(BrokenEmbedder()))
+        deadline = Deadline(5.0)
+        with self.assertLogs("agents.itinerary_generator", "ERROR") as logs:
+            itinerary = generator.generate_itinerary("Rome", ["food"], "09:00", deadline=deadline)
+            generator.generate_itinerary("Rome", ["food"], "09:00")
+        self.assertEqual([stop["name"] for stop in itinerary], ["Piazza Navona"])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("interest_matching", deadline.degraded)
+
+    def test_unknown_city(self):
+        self.assertIn("error", ItineraryGenerator().generate_itinerary("Atlantis", ["food"], "09:00")[0])
+
+
+class TestVectorIndex(unittest.TestCase):
+    def test_approximate_index_agrees_with_exact_search(self):
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(2000, 16))
+        queries = rng.normal(size=(1, 16))
+        queries /= np.linalg.norm(queries)
+
+        exact_positions, _ = VectorIndex(vectors).search(queries, 5)
+        approx_positions, approx_scores = VectorIndex(vectors, use_float16=True, n_lists=20, n_probe=20).search(queries, 5)
+
+        self.assertEqual(list(approx_positions), list(exact_positions))
+        self.assertTrue(np.all(np.diff(approx_scores) <= 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
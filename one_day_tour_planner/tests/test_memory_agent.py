@@ -0,0 +1,227 @@
+import threading
+import time
+import unittest
+from agents.memory_agent import MemoryAgent, LOCK_AND_READ_PROFILE_QUERY, WRITE_PROFILE_QUERY
+from agents.memory_write_buffer import WriteBehindBuffer, WriteBufferFullError, BufferedWrite
+from neo4j.exceptions import ClientError, TransientError
+from database.queries import BATCH_LOCK_AND_READ_PROFILES_QUERY, BATCH_STORE_PREFERENCES_QUERY, BATCH_WRITE_PROFILES_QUERY
+from database.schemas.memory import InterestProfile
+
+
+class FakeResult:
+    def __init__(self, record=None, records=None):
+        self.record = record
+        self.records = records or []
+
+    def single(self):
+        return self.record
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class FakeDriver:
+    """Keeps only the user profiles, which is all the profile maintenance reads and writes."""
+
+    def __init__(self):
+        self.profiles = {}
+        self.versions = {}
+        self.queries = []
+
+    def session(self):
+        return self
+
+    def begin_transaction(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute_write(self, work, *args):
+        return work(self, *args)
+
+    def run(self, query, **params):
+        self.queries.append(query)
+        if query == BATCH_LOCK_AND_READ_PROFILES_QUERY:
+            # The batch has merged every user node already
+            for user_id in params["user_ids"]:
+                self.versions[user_id] = self.versions.get(user_id, 0) + 1
+            return FakeResult(records=[{"user_id": user_id, "profile": self.profiles.get(user_id),
+                                        "profile_version": self.versions[user_id]} for user_id in params["user_ids"]])
+        if query == BATCH_WRITE_PROFILES_QUERY:
+            for row in params["rows"]:
+                self.profiles[row["user_id"]] = row["profile"]
+        elif query == LOCK_AND_READ_PROFILE_QUERY:
+            return FakeResult({"profile": self.profiles.get(params["user_id"])})
+        if query == WRITE_PROFILE_QUERY:
+            self.profiles[params["user_id"]] = params["profile"]
+        elif "RETURN u.profile" in query:
+            return FakeResult({"profile": self.profiles.get(params["user_id"]),
+                               "profile_version": self.versions.get(params["user_id"])})
+        return FakeResult()
+
+
+class TestMemoryAgent(unittest.TestCase):
+    def setUp(self):
+        self.agent = MemoryAgent.__new__(MemoryAgent)
+        self.agent.driver = FakeDriver()
+        self.agent.write_buffer = None
+
+    def test_profile_is_updated_incrementally_on_writes(self):
+        self.agent.store_preference("u1", "interests", ["historical", "food"])
+        self.agent.store_preference("u1", "budget", 60.0)
+        self.agent.store_trip_history("u1", "t1", {"destination": "Rome", "categories": "historical", "start_time": "09:30"})
+
+        summary = self.agent.fetch_profile("u1").summary()
+        self.assertGreater(summary["category_weights"]["historical"], summary["category_weights"]["food"])
+        self.assertEqual(summary["budget_percentiles"]["p50"], 75.0)
+        self.assertEqual(summary["typical_start_time"], "09:00")
+
+    def test_no_profile_for_unknown_user(self):
+        self.assertIsNone(self.agent.fetch_profile("nobody"))
+
+
+class BlockingDriver(FakeDriver):
+    """Holds every flush until released, to fill the write buffer."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def begin_transaction(self):
+        self.release.wait()
+        return super().begin_transaction()
+
+
+class FailingDriver(FakeDriver):
+    """Rejects every transaction that contains one of the `rejected` values with `error`."""
+
+    def __init__(self, error, rejected=None):
+        super().__init__()
+        self.error = error
+        self.rejected = rejected
+        self.attempts = 0
+
+    def execute_write(self, work, *args):
+        raise AssertionError("execute_write retries on its own; the buffer must use a plain transaction")
+
+    def run(self, query, **params):
+        if query == BATCH_STORE_PREFERENCES_QUERY:
+            self.attempts += 1
+            if self.rejected is None or any(row["value"] in self.rejected for row in params["rows"]):
+                raise self.error
+        return super().run(query, **params)
+
+
+class ReadOnCommitDriver(FakeDriver):
+    """Calls `on_commit` right after each commit, before the buffer drops the writes from its overlay."""
+
+    def __init__(self):
+        super().__init__()
+        self.on_commit = None
+
+    def commit(self):
+        if self.on_commit:
+            self.on_commit()
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    def setUp(self):
+        self.agent = MemoryAgent.__new__(MemoryAgent)
+        self.agent.driver = FakeDriver()
+        self.agent.write_buffer = WriteBehindBuffer(self.agent.driver, batch_size=10, flush_interval=0.05)
+        self.addCleanup(self.agent.write_buffer.close)
+
+    def test_buffered_writes_are_read_back_before_and_after_the_flush(self):
+        self.agent.store_preference("u1", "interests", ["historical"])
+        self.agent.store_preference("u1", "budget", 60.0)
+        self.agent.store_trip_history("u1", "t1", {"destination": "Rome", "start_time": "09:30"})
+
+        expected = self.agent.fetch_profile("u1").summary()
+        self.assertEqual(expected["budget_percentiles"]["p50"], 75.0)
+        self.agent.write_buffer.flush()
+
+        self.assertEqual(self.agent.write_buffer.pending_writes("u1"), [])
+        self.assertEqual(self.agent.fetch_profile("u1").summary(), expected)
+        # All three writes land in one batch with a single profile read and write
+        self.assertEqual(self.agent.driver.queries.count(BATCH_WRITE_PROFILES_QUERY), 1)
+
+    def test_a_read_right_after_the_commit_does_not_count_the_write_twice(self):
+        self.agent.driver = driver = ReadOnCommitDriver()
+        self.agent.write_buffer = WriteBehindBuffer(driver, batch_size=10, flush_interval=0.01)
+        self.addCleanup(self.agent.write_buffer.close)
+        observations = []
+        driver.on_commit = lambda: observations.append(self.agent.fetch_profile("u1").observations)
+
+        self.agent.store_preference("u1", "budget", 60.0)
+        self.agent.write_buffer.flush()
+        self.assertEqual(observations, [1])
+
+    def test_full_buffer_pushes_back(self):
+        driver = BlockingDriver()
+        buffer = WriteBehindBuffer(driver, max_queue_size=1, batch_size=1, flush_interval=0.01)
+        buffer.submit(BufferedWrite.preference("u1", "budget", 10))
+        while buffer.queue_depth():  # wait until the (blocked) flusher has taken it
+            time.sleep(0.001)
+        buffer.submit(BufferedWrite.preference("u1", "budget", 20))  # fills the queue
+        with self.assertRaises(WriteBufferFullError):
+            buffer.submit(BufferedWrite.preference("u1", "budget", 30))
+        self.assertEqual(len(buffer.pending_writes("u1")), 2)
+
+        driver.release.set()
+        buffer.close()
+        self.assertEqual(InterestProfile.from_json(driver.profiles["u1"]).observations, 2)
+
+    def test_transient_failures_are_retried_a_limited_number_of_times(self):
+        driver = FailingDriver(TransientError("deadlock detected"))
+        buffer = WriteBehindBuffer(driver, batch_size=10, flush_interval=0.01, max_attempts=3, retry_backoff=0)
+        buffer.submit(BufferedWrite.preference("u1", "budget", 10))
+        buffer.flush()
+        buffer.close()
+        self.assertEqual((driver.attempts, buffer.dropped_writes), (3, 1))
+        self.assertEqual(buffer.pending_writes("u1"), [])
+
+    def test_a_rejected_write_is_dropped_without_blocking_the_others(self):
+        driver = FailingDriver(ClientError("property values can only be of primitive types"), rejected={"bad"})
+        buffer = WriteBehindBuffer(driver, batch_size=10, flush_interval=0.05, max_attempts=3, retry_backoff=0)
+        for user, value in (("u1", 10), ("u2", "bad"), ("u3", 30), ("u4", 40)):
+            buffer.submit(BufferedWrite.preference(user, "budget", value))
+        buffer.flush()
+        buffer.submit(BufferedWrite.preference("u5", "budget", 50))  # the flusher is still running
+        buffer.close()
+        self.assertEqual(buffer.dropped_writes, 1)
+        self.assertEqual(sorted(driver.profiles), ["u1", "u3", "u4", "u5"])
+
+
+class TestInterestProfile(unittest.TestCase):
+    def test_recent_interests_weigh_more(self):
+        profile = InterestProfile()
+        profile.add_interests(["shopping"])
+        profile.add_interests(["food"])
+        weights = profile.normalized_weights()
+        self.assertGreater(weights["food"], weights["shopping"])
+        self.assertAlmostEqual(sum(weights.values()), 1.0)
+
+    def test_budget_percentiles(self):
+        profile = InterestProfile()
+        for budget in (20, 40, 45, 120, 900):
+            profile.add_budget(budget)
+        self.assertEqual(profile.budget_percentile(0.25), 50.0)
+        self.assertEqual(profile.budget_percentile(0.5), 50.0)
+        self.assertEqual(profile.budget_percentile(1.0), 900.0)
+
+    def test_round_trips_through_json(self):
+        profile = InterestProfile()
+        profile.add_preference("interests", "art, history")
+        profile.add_preference("start_time", "10:15 AM")
+        self.assertEqual(InterestProfile.from_json(profile.to_json()), profile)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from agents.itinerary_generator import ItineraryGenerator
+from agents.optimization_agent import OptimizationAgent
+from utils.deadline import Deadline
+
+
+class TestOptimizationAgent(unittest.TestCase):
+    def setUp(self):
+        self.agent = OptimizationAgent()
+        # Visit Rome's sights in a zigzag order, so that a shorter order exists
+        stops = ItineraryGenerator().generate_itinerary("Rome", ["historical", "relaxing", "food"], "09:00")
+        self.itinerary = OptimizationAgent.reschedule([stops[i] for i in (0, 5, 2, 1, 3, 4)])
+
+    def route_length(self, stops):
+        return sum(self.agent.estimate_distance(a, b) for a, b in zip(stops, stops[1:]))
+
+    def test_order_is_improved_and_retimed(self):
+        stops, complete = self.agent.improve_order([dict(stop) for stop in self.itinerary])
+        self.assertTrue(complete)
+        self.assertEqual(stops[0]["name"], "Colosseum")
+        self.assertLess(self.route_length(stops), self.route_length(self.itinerary))
+        self.assertEqual(stops[0]["start_time"], "09:00 AM")
+        self.assertEqual(stops[1]["start_time"], "10:45 AM")  # 90 minutes at the Colosseum plus the buffer
+
+    def test_expired_deadline_returns_best_order_so_far(self):
+        deadline = Deadline(0)
+        route = self.agent.optimize_route([dict(stop) for stop in self.itinerary], 50, deadline)
+        self.assertEqual(len(route), len(self.itinerary))
+        self.assertLessEqual(self.route_length(route), self.route_length(self.itinerary))
+        self.assertIn("optimization", deadline.degraded)
+
+    def test_stops_without_coordinates_keep_their_order(self):
+        stops = [{"name": name} for name in "abc"]
+        route = self.agent.optimize_route(stops, 50)
+        self.assertEqual([stop["name"] for stop in route], ["a", "b", "c"])
+        self.assertEqual(route[1]["distance_from_previous"], 2)
+
+    def test_route_leaves_from_the_starting_point(self):
+        # Starting next to the Spanish Steps, at the far end of the zigzag from the Colosseum
+        route = self.agent.optimize_route([dict(stop) for stop in self.itinerary], 50, start=(41.9058, 12.4823))
+        self.assertEqual(len(route), len(self.itinerary))
+        self.assertEqual(route[0]["name"], "Spanish Steps")
+        self.assertEqual(route[0]["start_time"], "09:00 AM")
+        self.assertLess(route[0]["distance_from_previous"], 0.1)
+        self.assertNotIn("Starting point", [stop["name"] for stop in route])
+
+    def test_alternatives_are_diverse_and_best_first(self):
+        routes = self.agent.optimize_alternatives([dict(stop) for stop in self.itinerary], 50, k=3, min_difference=0.4)
+        self.assertEqual(len(routes), 3)
+        # The restarts can only find a shorter best route than the single-route search
+        best, _ = self.agent.improve_order([dict(stop) for stop in self.itinerary])
+        self.assertLessEqual(self.route_length(routes[0]), self.route_length(best))
+
+        lengths = [self.route_length(route) for route in routes]
+        self.assertEqual(lengths, sorted(lengths))
+        legs = [{frozenset((a["name"], b["name"])) for a, b in zip(route, route[1:])} for route in routes]
+        for i in range(len(legs)):
+            for j in range(i):
+                self.assertGreaterEqual(len(legs[i] - legs[j]), 2)
+        # Each alternative is its own timed copy
+        self.assertIsNot(routes[0][1], routes[1][1])
+        self.assertEqual(routes[1][0]["start_time"], "09:00 AM")
+
+
+if __name__ == "__main__":
+    unittest.main()
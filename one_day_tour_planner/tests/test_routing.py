@@ -0,0 +1,133 @@
+import heapq
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+import numpy as np
+from agents.optimization_agent import OptimizationAgent
+from utils.deadline import Deadline
+from utils.routing import ContractionHierarchy, RoutingEngine, MODE_PROFILES
+
+
+def dijkstra(node_count, edges, source):
+    adjacency = [[] for _ in range(node_count)]
+    for u, v, w in edges:
+        adjacency[u].append((v, w))
+    distances = [float("inf")] * node_count
+    distances[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > distances[u]:
+            continue
+        for v, w in adjacency[u]:
+            if d + w < distances[v]:
+                distances[v] = d + w
+                heapq.heappush(heap, (d + w, v))
+    return distances
+
+
+def write_grid(city_dir, size=6, spacing=0.002):
+    """A size x size street grid near (41.89, 12.47); the first row is a one-way street going east."""
+    os.makedirs(city_dir)
+    with open(os.path.join(city_dir, "nodes.csv"), "w") as nodes:
+        nodes.write("id,lat,lon\n")
+        for r in range(size):
+            for c in range(size):
+                nodes.write(f"n{r}_{c},{41.89 + r * spacing},{12.47 + c * spacing}\n")
+    with open(os.path.join(city_dir, "edges.csv"), "w") as edges:
+        edges.write("source,target,length_m,highway,oneway\n")
+        for r in range(size):
+            for c in range(size):
+                if c + 1 < size:
+                    edges.write(f"n{r}_{c},n{r}_{c + 1},160,residential,{'yes' if r == 0 else 'no'}\n")
+                if r + 1 < size:
+                    edges.write(f"n{r}_{c},n{r + 1}_{c},220,{'footway' if c == 2 else 'residential'},no\n")
+
+
+class TestContractionHierarchy(unittest.TestCase):
+    def test_many_to_many_matches_dijkstra(self):
+        rng = random.Random(7)
+        node_count = 60
+        edges = [(rng.randrange(node_count), rng.randrange(node_count), rng.uniform(1, 10)) for _ in range(240)]
+        hierarchy = ContractionHierarchy.build(node_count, edges)
+        sources, targets = rng.sample(range(node_count), 8), rng.sample(range(node_count), 8)
+        matrix = hierarchy.many_to_many(sources, targets)
+        for row, source in enumerate(sources):
+            expected = dijkstra(node_count, edges, source)
+            for column, target in enumerate(targets):
+                self.assertAlmostEqual(float(matrix[row, column]), expected[target], places=3)
+
+
+class TestRoutingEngine(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        write_grid(os.path.join(self.data_dir, "Gridville"))
+        self.points = [(41.89, 12.47), (41.89, 12.48), (41.9, 12.47)]
+
+    def test_travel_times_per_mode(self):
+        engine = RoutingEngine(self.data_dir, self.cache_dir)
+        walking = engine.travel_times("Gridville", self.points, "walking")
+        taxi = engine.travel_times("Gridville", self.points, "taxi")
+        self.assertEqual(walking.dtype, np.float32)
+        self.assertAlmostEqual(float(walking[0, 1]), 5 * 160 / (5 / 3.6), places=1)
+        # The taxi may drive east on the one-way street but has to detour going back west
+        self.assertAlmostEqual(float(taxi[0, 1]), 5 * 160 / (40 / 3.6), places=1)
+        self.assertGreater(taxi[1, 0], taxi[0, 1])
+
+    def test_matrices_and_hierarchies_are_reused_from_disk(self):
+        RoutingEngine(self.data_dir, self.cache_dir).travel_times("Gridville", self.points, "walking")
+        files = os.listdir(os.path.join(self.cache_dir, "Gridville"))
+        self.assertEqual(len([f for f in files if f.startswith("matrix-walking")]), 1)
+        self.assertEqual(len([f for f in files if f.startswith("ch-walking")]), 1)
+
+        engine = RoutingEngine(self.data_dir, self.cache_dir)
+        reordered = engine.travel_times("Gridville", self.points[::-1], "walking")
+        self.assertNotIn("walking", engine.router("Gridville")._hierarchies)  # served from the stored matrix
+        self.assertAlmostEqual(float(reordered[2, 1]), 5 * 160 / (5 / 3.6), places=1)
+
+    def test_optimizer_reports_network_travel_times(self):
+        engine = RoutingEngine(self.data_dir, self.cache_dir)
+        for mode in MODE_PROFILES:
+            engine.router("Gridville").hierarchy(mode)
+        agent = OptimizationAgent(engine)
+        stops = [{"name": str(i), "latitude": lat, "longitude": lon} for i, (lat, lon) in enumerate(self.points)]
+        route = agent.optimize_route([dict(stop) for stop in stops], 50, city="Gridville")
+        self.assertGreater(route[1]["travel_minutes"], 0)
+        self.assertNotIn("travel_minutes", agent.optimize_route([dict(stop) for stop in stops], 50)[1])
+
+    def test_unprepared_street_graph_is_built_in_the_background(self):
+        engine = RoutingEngine(self.data_dir, self.cache_dir)
+        agent = OptimizationAgent(engine)
+        stops = [{"name": str(i), "latitude": lat, "longitude": lon} for i, (lat, lon) in enumerate(self.points)]
+        deadline = Deadline(5.0)
+        route = agent.optimize_route([dict(stop) for stop in stops], 50, deadline, city="Gridville")
+        self.assertNotIn("travel_minutes", route[1])
+        self.assertIn("routing", deadline.degraded)
+
+        engine.router("Gridville")._builder.join()
+        route = agent.optimize_route([dict(stop) for stop in stops], 50, city="Gridville")
+        self.assertGreater(route[1]["travel_minutes"], 0)
+
+    def test_concurrent_writers_of_a_cached_matrix_do_not_collide(self):
+        engine = RoutingEngine(self.data_dir, self.cache_dir)
+        router = engine.router("Gridville")
+        matrix = np.arange(9, dtype=np.float32).reshape(3, 3)
+        threads = [threading.Thread(target=engine._store_matrix, args=(router, "walking", "digest", matrix))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        files = os.listdir(router.cache_dir)
+        self.assertEqual(files, ["matrix-walking-digest.npy"])
+        np.testing.assert_array_equal(np.load(os.path.join(router.cache_dir, files[0])), matrix)
+
+
+if __name__ == "__main__":
+    unittest.main()
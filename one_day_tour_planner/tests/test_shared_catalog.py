@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from agents.itinerary_generator import ItineraryGenerator, attractions_db
+from utils.embeddings import InterestMatcher
+from utils.shared_catalog import SharedCatalog, publish_catalog, current_version
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+class TestSharedCatalog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        publish_catalog(self.directory, attractions_db)
+        self.catalog = SharedCatalog(self.directory, check_interval=0)
+
+    def test_views_match_the_source_catalog(self):
+        self.assertEqual(sorted(self.catalog.cities()), ["Paris", "Rome"])
+        self.assertEqual(list(self.catalog["Rome"]), attractions_db["Rome"])
+        self.assertNotIn("Berlin", self.catalog)
+        self.assertEqual(list(self.catalog["Paris"].positions_for_category("historical")), [0, 1, 3])
+
+    def test_columns_are_read_only_views_of_the_mapping(self):
+        arrays = self.catalog.snapshot().arrays
+        self.assertFalse(arrays["duration"].flags.writeable)
+        self.assertFalse(arrays["duration"].flags.owndata)
+
+    def test_itineraries_are_the_same_as_from_the_built_in_catalog(self):
+        for city in attractions_db:
+            self.assertEqual(ItineraryGenerator(catalog=self.catalog).generate_itinerary(city, ["historical", "food"], "09:00"),
+                             ItineraryGenerator().generate_itinerary(city, ["historical", "food"], "09:00"))
+
+    def test_new_versions_are_swapped_in_and_old_ones_pruned(self):
+        held = self.catalog["Rome"]
+        updated = dict(attractions_db, Rome=attractions_db["Rome"][:2])
+        publish_catalog(self.directory, updated, keep_versions=1)
+        publish_catalog(self.directory, updated, keep_versions=1)
+
+        self.assertEqual(current_version(self.directory), 3)
+        self.assertEqual(self.catalog.version, 3)
+        self.assertEqual(len(self.catalog["Rome"]), 2)
+        # A view taken before the swap keeps reading its own version
+        self.assertEqual(len(held), 6)
+        self.assertEqual(held[5]["name"], "Spanish Steps")
+        self.assertEqual(len([f for f in os.listdir(self.directory) if f.endswith(".bin")]), 1)
+
+    def test_published_embeddings_are_used_instead_of_encoding(self):
+        embeddings = {city: np.eye(len(a), 4, dtype=np.float32) for city, a in attractions_db.items()}
+        publish_catalog(self.directory, attractions_db, embeddings)
+        embedder = CountingEmbedder()
+        generator = ItineraryGenerator(InterestMatcher(embedder), catalog=self.catalog)
+        generator.filter_attractions("Rome", ["food"])
+        self.assertEqual(embedder.encoded, ["food"])
+
+    def test_published_embeddings_are_indexed_without_copying(self):
+        rng = np.random.default_rng(0)
+        embeddings = {city: rng.normal(size=(len(a), 4)) for city, a in attractions_db.items()}
+        publish_catalog(self.directory, attractions_db, embeddings, ann_threshold=4)
+        rome = self.catalog["Rome"]
+        index = InterestMatcher(CountingEmbedder()).index_for("Rome", rome)
+        self.assertTrue(np.shares_memory(index.vectors, rome.vectors))
+        self.assertTrue(np.shares_memory(index.centroids, self.catalog.snapshot().arrays["centroids"]))
+        self.assertEqual(index.vectors.dtype, np.float16)
+        np.testing.assert_allclose(np.linalg.norm(index.vectors.astype(np.float32), axis=1), 1.0, atol=1e-3)
+        self.assertEqual(sorted(np.concatenate(index.lists)), list(range(len(rome))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+from utils.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_duplicates_share_one_computation(self):
+        flights = SingleFlight("test")
+        computed = []
+
+        async def compute():
+            computed.append(1)
+            await asyncio.sleep(0.01)
+            return {"itinerary": ["Colosseum"]}
+
+        async def run():
+            results = await asyncio.gather(*(flights.do("paris", compute) for _ in range(5)),
+                                           flights.do("rome", compute))
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(len(computed), 2)
+        self.assertTrue(all(result is results[0] for result in results[:5]))
+        self.assertEqual(flights.stats(), {"calls": 6, "coalesced": 4, "coalescing_rate": 0.6667,
+                                           "errors": 0, "in_flight": 0})
+
+    def test_errors_reach_every_waiter_and_are_not_cached(self):
+        flights = SingleFlight("test")
+        attempts = []
+
+        async def fail():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("no data")
+
+        async def run():
+            first = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+            second = await asyncio.gather(flights.do("key", fail), return_exceptions=True)
+            return first + second
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(flights.errors, 2)
+
+    def test_cancelled_waiter_does_not_cancel_the_others(self):
+        flights = SingleFlight("test")
+
+        async def compute():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def run():
+            first = asyncio.ensure_future(flights.do("key", compute))
+            second = asyncio.ensure_future(flights.do("key", compute))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(run()), "done")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import time
+import unittest
+from utils.speculation import Speculator
+
+
+class TestSpeculator(unittest.TestCase):
+    def test_claim_returns_finished_and_running_work(self):
+        speculator = Speculator("test", workers=2)
+
+        async def compute(value, gate=None):
+            if gate:
+                await gate.wait()
+            return value
+
+        async def run():
+            gate = asyncio.Event()
+            speculator.submit("fast", lambda: compute("fast"))
+            speculator.submit("slow", lambda: compute("slow", gate))
+            await asyncio.sleep(0.01)
+            finished = speculator.claim("fast")
+            running = speculator.claim("slow")
+            self.assertTrue(finished.done())
+            self.assertFalse(running.done())
+            gate.set()
+            await asyncio.wait({running})
+            self.assertIsNone(speculator.claim("fast"))  # a claim is single use
+            await speculator.close()
+            return finished.result(), running.result()
+
+        self.assertEqual(asyncio.run(run()), ("fast", "slow"))
+        stats = speculator.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+
+    def test_full_queue_drops_the_oldest_work(self):
+        speculator = Speculator("test", max_queue=2, workers=1)
+        started = []
+
+        async def compute(key):
+            started.append(key)
+            await asyncio.sleep(0.01)
+            return key
+
+        async def run():
+            for key in ("a", "b", "c", "d"):
+                self.assertTrue(speculator.submit(key, lambda key=key: compute(key)))
+            self.assertFalse(speculator.submit("d", lambda: compute("d")))
+            # Nothing started yet, so claiming withdraws the queued work for the caller to compute itself
+            self.assertIsNone(speculator.claim("c"))
+            await asyncio.sleep(0.05)
+            await speculator.close()
+
+        asyncio.run(run())
+        self.assertEqual(started, ["d"])
+        self.assertEqual(speculator.stats()["dropped"], 2)
+
+    def test_unclaimed_work_expires_and_is_cancelled(self):
+        speculator = Speculator("test", workers=1, ttl=0.05)
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            speculator.submit("slow", slow)
+            speculator.submit("fast", lambda: asyncio.sleep(0, "done"))
+            await asyncio.sleep(0.1)
+            # The stuck computation was cancelled at the ttl and the worker moved on
+            self.assertEqual(speculator.stats()["ready"], 1)
+            time.sleep(0.06)
+            self.assertIsNone(speculator.claim("fast"))
+            await speculator.close()
+
+        asyncio.run(run())
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(speculator.stats()["expired"], 2)
+
+    def test_failed_work_is_not_returned(self):
+        speculator = Speculator("test")
+
+        async def fail():
+            raise RuntimeError("weather service down")
+
+        async def run():
+            speculator.submit("key", fail)
+            await asyncio.sleep(0.01)
+            self.assertIsNone(speculator.claim("key"))
+            await speculator.close()
+
+        asyncio.run(run())
+        self.assertEqual(speculator.stats()["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
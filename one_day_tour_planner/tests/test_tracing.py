@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+import unittest
+from utils.tracing import Tracer, span, traced, current_trace
+from utils.profiling import SamplingProfiler
+
+
+class Agent:
+    @traced
+    def work(self):
+        with span("inner"):
+            return "done"
+
+    @traced
+    async def async_work(self):
+        return await asyncio.to_thread(self.work)
+
+
+class TestTracing(unittest.TestCase):
+    def test_spans_are_nested_under_request_trace(self):
+        tracer = Tracer(slow_threshold_ms=0)
+        with tracer.trace("GET /test") as trace:
+            self.assertEqual(Agent().work(), "done")
+
+        spans = {s.name: s for s in trace.spans}
+        self.assertEqual(spans["inner"].parent_id, spans["Agent.work"].span_id)
+        self.assertEqual(spans["Agent.work"].parent_id, spans["GET /test"].span_id)
+        self.assertIsNone(current_trace())
+
+    def test_context_follows_async_and_worker_threads(self):
+        tracer = Tracer(slow_threshold_ms=0)
+
+        async def handle():
+            with tracer.trace("POST /async") as trace:
+                await Agent().async_work()
+            return trace
+
+        trace = asyncio.run(handle())
+        self.assertEqual({s.name for s in trace.spans}, {"POST /async", "Agent.async_work", "Agent.work", "inner"})
+
+    def test_only_slow_traces_are_kept_in_ring_buffer(self):
+        tracer = Tracer(slow_threshold_ms=20, buffer_size=2)
+        with tracer.trace("fast"):
+            pass
+        for name in ("slow-1", "slow-2", "slow-3"):
+            with tracer.trace(name):
+                time.sleep(0.025)
+
+        self.assertEqual([t["name"] for t in tracer.slow_traces()], ["slow-3", "slow-2"])
+
+    def test_span_without_trace_is_noop(self):
+        with span("orphan") as s:
+            self.assertIsNone(s)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_profile_returns_collapsed_stacks(self):
+        stop = threading.Event()
+
+        def busy_loop():
+            while not stop.is_set():
+                sum(range(1000))
+
+        worker = threading.Thread(target=busy_loop, name="busy")
+        worker.start()
+        try:
+            dump = SamplingProfiler(interval=0.001).profile(0.1)
+        finally:
+            stop.set()
+            worker.join()
+
+        busy_lines = [line for line in dump.splitlines() if line.startswith("busy;")]
+        self.assertTrue(busy_lines)
+        stack, count = busy_lines[0].rsplit(" ", 1)
+        self.assertIn("busy_loop", stack)
+        self.assertGreater(int(count), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
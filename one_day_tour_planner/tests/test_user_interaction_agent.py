@@ -1,5 +1,14 @@
 import unittest
-from agents.user_interaction_agent import UserPreferences
+from agents.user_interaction_agent import UserInteractionAgent, UserPreferences
+
+
+class FakeMemoryAgent:
+    def __init__(self):
+        self.preferences = {}
+
+    def store_preference(self, user_id, key, value):
+        self.preferences.setdefault(user_id, {})[key] = value
+
 
 class TestUserInteractionAgent(unittest.TestCase):
     def test_preferences(self):
@@ -47,6 +56,22 @@ class TestUserInteractionAgent(unittest.TestCase):
 
         self.assertNotEqual(user_pref_1, user_pref_2)
 
+    def test_users_with_the_same_preferences_get_their_own_ids(self):
+        # Test: User IDs are not derived from the preferences, and a returned ID is reused
+        memory_agent = FakeMemoryAgent()
+        agent = UserInteractionAgent(memory_agent)
+        user_pref = UserPreferences(city="Paris", start_time="09:00", end_time="17:00", budget=100.0, interests=["Art"])
+
+        first = agent.collect_preferences(user_pref)["user_id"]
+        second = agent.collect_preferences(user_pref)["user_id"]
+        self.assertNotEqual(first, second)
+
+        returning = agent.collect_preferences(user_pref.copy(update={"user_id": first, "budget": 80.0}))["user_id"]
+        self.assertEqual(returning, first)
+        self.assertEqual(len(memory_agent.preferences), 2)
+        self.assertEqual(memory_agent.preferences[first]["budget"], 80.0)
+        self.assertNotIn("user_id", memory_agent.preferences[first])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,66 @@
+import calendar
+import unittest
+from datetime import datetime
+from agents.weather_agent import WeatherAgent, ForecastIndex
+from utils.deadline import Deadline
+
+
+def forecast_entry(dt_txt: str, temp: float, description: str) -> dict:
+    dt = calendar.timegm(datetime.strptime(dt_txt, "%Y-%m-%d %H:%M:%S").timetuple())
+    return {"dt": dt, "dt_txt": dt_txt, "main": {"temp": temp}, "weather": [{"description": description}]}
+
+
+FORECAST = {
+    "city": {"name": "Rome", "timezone": 3600},
+    "list": [
+        forecast_entry("2024-12-01 06:00:00", 8.0, "clear sky"),
+        forecast_entry("2024-12-01 09:00:00", 14.0, "clear sky"),
+        forecast_entry("2024-12-01 12:00:00", 17.0, "light rain"),
+        forecast_entry("2024-12-01 15:00:00", 15.0, "light rain"),
+        forecast_entry("2024-12-02 09:00:00", 10.0, "overcast clouds"),
+    ],
+}
+
+
+class TestWeatherAgent(unittest.TestCase):
+    def setUp(self):
+        self.agent = WeatherAgent(api_key="test")
+        self.index = ForecastIndex.from_forecast(FORECAST)
+
+    def test_extract_weather_for_date(self):
+        summary = self.agent.extract_weather_for_date(FORECAST, "2024-12-01")
+        self.assertEqual(summary["date"], "2024-12-01")
+        self.assertAlmostEqual(summary["average_temperature"], 13.5)
+        self.assertIn(summary["condition"], ("clear sky", "light rain"))
+
+    def test_interpolates_between_forecast_entries(self):
+        # 11:30 local is 10:30 UTC, halfway between the 09:00 and 12:00 UTC entries
+        weather = self.index.at(datetime(2024, 12, 1, 11, 30))
+        self.assertAlmostEqual(weather["temperature"], 15.5)
+        self.assertEqual(weather["condition"], "light rain")
+
+    def test_times_outside_forecast_are_unknown(self):
+        self.assertIsNone(self.index.at(datetime(2024, 11, 30, 12, 0)))
+
+    def test_annotate_itinerary_flags_outdoor_stops_in_rain(self):
+        itinerary = [
+            {"name": "Colosseum", "start_time": "10:00 AM", "outdoor": True},
+            {"name": "Pantheon", "start_time": "02:00 PM", "outdoor": False},
+            {"name": "Trevi Fountain", "start_time": "03:00 PM", "outdoor": True},
+        ]
+        self.agent.annotate_itinerary(self.index, "2024-12-01", itinerary)
+
+        self.assertEqual(itinerary[0]["weather"]["condition"], "clear sky")
+        self.assertNotIn("weather_warning", itinerary[0])
+        self.assertNotIn("weather_warning", itinerary[1])
+        self.assertIn("umbrella", itinerary[2]["weather_warning"])
+
+    def test_no_fetch_once_the_deadline_has_passed(self):
+        deadline = Deadline(0)
+        weather = self.agent.fetch_weather("Rome", "2024-12-01", deadline)
+        self.assertIn("error", weather)
+        self.assertIn("weather", deadline.degraded)
+
+
+if __name__ == "__main__":
+    unittest.main()